@@ -13,7 +13,7 @@ import os
 from datetime import datetime
 from pathlib import Path
 
-from decouple import config
+from decouple import config, Csv
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -47,6 +47,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'store.middleware.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -133,6 +134,13 @@ LOGGING = {
             "backupCount": 5,
             "formatter": "simple",
         },
+        "perf_file": {
+            "class": "logging.handlers.RotatingFileHandler",
+            "filename": os.path.join(LOG_DIR, "perf.log"),
+            "maxBytes": 2_000_000,
+            "backupCount": 5,
+            "formatter": "simple",
+        },
     },
     "formatters": {
         "simple": {"format": "%(asctime)s [%(levelname)s] %(name)s: %(message)s"}
@@ -140,9 +148,49 @@ LOGGING = {
     "loggers": {
         "econt": {"handlers": ["econt_file", "console"], "level": "INFO"},
         "payments": {"handlers": ["payments_file", "console"], "level": "INFO"},
+        "perf": {"handlers": ["perf_file"], "level": "INFO"},
+        "stock": {"handlers": ["payments_file", "console"], "level": "INFO"},
     },
 }
 
+# Cache for rendered fragments and listings (weight modal, recipe list, ...).
+# Locmem is per gunicorn worker, so invalidation only reaches the worker that
+# handled the save – entries also expire on their own. For a shared cache set
+# e.g. CACHE_BACKEND=django.core.cache.backends.db.DatabaseCache and
+# CACHE_LOCATION=django_cache (then run `manage.py createcachetable`).
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='sakarela'),
+    }
+}
+
+# Request instrumentation (store.middleware.ServerTimingMiddleware)
+SERVER_TIMING_ENABLED = config('SERVER_TIMING_ENABLED', default=True, cast=bool)
+# Fraction of requests that get the full SQL/template/integration breakdown
+SERVER_TIMING_SAMPLE_RATE = config('SERVER_TIMING_SAMPLE_RATE', default=0.1, cast=float)
+# Requests slower than this are written to logs/perf.log
+SLOW_REQUEST_THRESHOLD_MS = config('SLOW_REQUEST_THRESHOLD_MS', default=800, cast=int)
+
+# How long a card order holds its stock while the customer is on myPOS.
+# Expired holds are returned by `manage.py release_expired_reservations` (cron).
+STOCK_RESERVATION_MINUTES = config('STOCK_RESERVATION_MINUTES', default=30, cast=int)
+
+# Neighbours kept per product in the "bought together" table
+# (refreshed by `manage.py build_copurchases`, see store/copurchase.py).
+COPURCHASE_TOP_K = config('COPURCHASE_TOP_K', default=12, cast=int)
+
+# How many of the top sellers of the last 30 days get the "Най-продаван" badge
+BESTSELLER_COUNT = config('BESTSELLER_COUNT', default=3, cast=int)
+
+# Session storage (the cart id and the checkout form live in the session), see store/sessions.py:
+#   django.contrib.sessions.backends.db               one UPDATE per change (default)
+#   store.sessions                                    cached_db, database written at most every
+#                                                     SESSION_DB_WRITE_INTERVAL s (needs a shared cache)
+#   django.contrib.sessions.backends.signed_cookies   no rows at all, for small carts
+SESSION_ENGINE = config('SESSION_ENGINE', default='django.contrib.sessions.backends.db')
+SESSION_DB_WRITE_INTERVAL = config('SESSION_DB_WRITE_INTERVAL', default=60, cast=int)
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
@@ -168,6 +216,18 @@ STATIC_VERSION = datetime.now().strftime("%Y%m%d%H%M%S")
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Marketing pages pre-rendered to disk and sent by nginx via X-Accel-Redirect
+# (`manage.py prerender_site`, sakarela/prerender.py). Needs the internal
+# PRERENDER_URL location from deploy/nginx.conf; keep off without nginx.
+PRERENDER_ENABLED = config('PRERENDER_ENABLED', default=False, cast=bool)
+PRERENDER_ROOT = config('PRERENDER_ROOT', default=os.path.join(BASE_DIR, 'prerendered'))
+PRERENDER_URL = '/_prerendered/'
+
+# Responsive image derivatives (store/images.py, `manage.py generate_image_variants`)
+IMAGE_VARIANT_WIDTHS = config('IMAGE_VARIANT_WIDTHS', default='320,640,960,1280', cast=Csv(int))
+# AVIF is ~20% smaller than WebP but much slower to encode
+IMAGE_VARIANT_AVIF = config('IMAGE_VARIANT_AVIF', default=False, cast=bool)
+
 EMAIL_BACKEND = config('EMAIL_BACKEND')
 EMAIL_HOST = config('EMAIL_HOST')
 EMAIL_PORT = config('EMAIL_PORT', cast=int)
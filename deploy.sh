@@ -72,6 +72,7 @@ if curl -fsS -H 'Host: dev.sakarela.com' http://127.0.0.1:8000/ -o /dev/null; th
 else
   echo "Upstream check FAILED"
 fi
+$PY manage.py warm_caches || echo "Cache warming FAILED (first requests will be slower)"
 if [ -n "$STATIC_DIR" ]; then
   echo "STATIC at: $STATIC_DIR"
   ls -ld "$STATIC_DIR" || true
@@ -0,0 +1,25 @@
+# deploy/gunicorn.conf.py
+#
+#   gunicorn --config deploy/gunicorn.conf.py --preload Sakarela_DJANGO.wsgi:application
+#
+# With --preload the app is imported once in the master. when_ready() then
+# warms the caches there (store/warmup.py) before any worker is forked, so
+# every worker starts with the compiled templates, the Econt city list and
+# the locmem cache already in memory (shared copy-on-write).
+# Without --preload the hook does nothing; with a shared cache (Redis /
+# Memcached) run `manage.py warm_caches` instead.
+
+
+def when_ready(server):
+    if not server.cfg.preload_app:
+        return
+
+    from django.db import connections
+
+    from store.warmup import warm_caches
+
+    try:
+        warm_caches(log=server.log.info)
+    finally:
+        # workers must not inherit the master's database connections
+        connections.close_all()
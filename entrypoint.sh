@@ -23,9 +23,23 @@ echo "Running migrations..."
 echo "Collecting static files..."
 python manage.py collectstatic --noinput
 
+echo "Pre-rendering marketing pages..."
+# a no-op unless PRERENDER_ENABLED (env or .env) is set
+python manage.py prerender_site || echo "prerender_site failed; pages will be served by gunicorn"
+
 echo "Starting Gunicorn..."
 # Run Gunicorn in the foreground without exec to keep container alive
+# GUNICORN_PRELOAD=1 warms the caches in the master before forking
+# (deploy/gunicorn.conf.py); otherwise warm them from a separate process,
+# which only helps a shared CACHE_BACKEND (warm_caches skips locmem).
+if [ -n "$GUNICORN_PRELOAD" ]; then
+    PRELOAD="--preload"
+else
+    PRELOAD=""
+    (sleep 5; python manage.py warm_caches || echo "warm_caches failed") &
+fi
 gunicorn Sakarela_DJANGO.wsgi:application \
+    --config deploy/gunicorn.conf.py $PRELOAD \
     --bind 127.0.0.1:8000 \
     --workers 3 \
     --threads 2 \
@@ -0,0 +1,99 @@
+# sakarela/caching.py
+"""
+Keys and tags of the marketing-page caches (see store/cachetags.py).
+
+    pages        any sakarela model change (every cached page)
+    recipes      recipe list: recipes and the products they hang under
+    recipe:<id>  one recipe with its ingredients and steps
+"""
+import hashlib
+from functools import wraps
+
+from django.http import HttpResponse
+
+from store.cachetags import bump_tags, is_shared, tag_version, tagged_get, tagged_set
+
+from .prerender import accel_path
+
+PAGES_TAG = "pages"
+RECIPES_TAG = "recipes"
+
+
+def recipe_tag(recipe_id):
+    return f"recipe:{recipe_id}"
+
+
+# Whole recipe listing (views.recipe_list)
+RECIPE_LIST_KEY = "sakarela:recipe_list"
+RECIPE_LIST_TIMEOUT = 60 * 15
+
+
+# Full-page cache for the marketing pages. Every sakarela model change bumps
+# the "pages" tag, which makes all cached pages stale at once – in every
+# worker only with a shared cache, so pages are not cached without one.
+PAGE_TIMEOUT = 60 * 60
+
+
+def page_version():
+    return tag_version(PAGES_TAG)
+
+
+def bump_page_version():
+    bump_tags(PAGES_TAG)
+
+
+def page_key(request, params=()):
+    """
+    Key of the page: the path plus the query parameters the view reads
+    (`params`); any other query string (utm_*, fbclid, ...) shares the entry.
+    """
+    query = sorted((name, request.GET.getlist(name)) for name in params if name in request.GET)
+    path = hashlib.md5(f"{request.path}?{query}".encode()).hexdigest()
+    return f"sakarela:page:{path}"
+
+
+def cached_page(view=None, *, params=()):
+    """
+    Serve GET responses of `view` from the cache. Only for pages whose HTML
+    is the same for every visitor – the header cart is fetched separately
+    (store.views.mini_cart). Responses that set cookies (e.g. a CSRF token)
+    or are not 200 are never stored. Views that read query parameters list
+    them: @cached_page(params=("type",)).
+
+    Skipped unless the cache is shared (store.cachetags.is_shared): a
+    per-process cache would keep the old page in every worker but the one
+    that saved the change.
+    """
+    if view is None:
+        return lambda view: cached_page(view, params=params)
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method != "GET" or request.headers.get("HX-Request"):
+            return view(request, *args, **kwargs)
+
+        # pre-rendered copy on disk: let nginx send it (sakarela/prerender.py)
+        accel = accel_path(request)
+        if accel:
+            response = HttpResponse(content_type="text/html; charset=utf-8")
+            response["X-Accel-Redirect"] = accel
+            return response
+
+        if not is_shared():
+            return view(request, *args, **kwargs)
+
+        key = page_key(request, params)
+        cached = tagged_get(key, [PAGES_TAG])
+        if cached is not None:
+            content, content_type = cached
+            response = HttpResponse(content, content_type=content_type)
+            response["X-Page-Cache"] = "hit"
+            return response
+
+        response = view(request, *args, **kwargs)
+        if response.status_code == 200 and not response.streaming and not response.cookies:
+            tagged_set(key, (response.content, response["Content-Type"]), [PAGES_TAG], PAGE_TIMEOUT)
+            response["X-Page-Cache"] = "miss"
+        return response
+
+    return wrapper
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from sakarela.prerender import brotli, current_manifest, enabled, prerender_site, root
+
+
+class Command(BaseCommand):
+    help = (
+        "Render the marketing pages (home, about, products, recipes) to HTML files "
+        "with .gz/.br copies for nginx to serve via X-Accel-Redirect. Run after a "
+        "deploy, and from cron with --if-stale: a content change only drops the "
+        "current build (PRERENDER_ENABLED), the next run renders a new one."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--if-stale", action="store_true",
+                            help="Do nothing while the current build is still valid.")
+
+    def handle(self, *args, **options):
+        if not enabled():
+            # nothing would serve the files (sakarela/caching.py checks the same setting)
+            self.stdout.write("PRERENDER_ENABLED is off: nothing to render.")
+            return
+        if options["if_stale"] and current_manifest() is not None:
+            self.stdout.write("Current build is up to date.")
+            return
+        manifest = prerender_site()
+        if manifest is None:
+            self.stdout.write("Content changed while rendering; build discarded, run again.")
+            return
+        self.stdout.write(
+            f"Rendered {len(manifest['files'])} page(s) into {root()}/{manifest['build']}"
+            + ("" if brotli else " (brotli not installed: .gz only)")
+        )
@@ -0,0 +1,43 @@
+# Generated by Django 5.1.1 on 2026-10-19 00:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_cards(apps, schema_editor):
+    Product = apps.get_model('sakarela', 'Product')
+    ProductCard = apps.get_model('sakarela', 'ProductCard')
+    ProductCard.objects.bulk_create([
+        ProductCard(
+            product_id=p.pk, title=p.title, type=p.type, image=p.image.name,
+            image_variants=p.image_variants, badge=p.badge.name or '',
+            store_product_id=p.store_product_id,
+        )
+        for p in Product.objects.all()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sakarela', '0013_product_image_variants_recipe_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductCard',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='card', serialize=False, to='sakarela.product')),
+                ('title', models.CharField(max_length=100)),
+                ('type', models.CharField(max_length=20)),
+                ('image', models.ImageField(editable=False, upload_to='products/')),
+                ('image_variants', models.JSONField(blank=True, default=dict, editable=False)),
+                ('badge', models.ImageField(blank=True, editable=False, upload_to='badges/')),
+                ('store_product_id', models.PositiveIntegerField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['type', 'title'], name='sakarela_pr_type_c03df9_idx')],
+            },
+        ),
+        migrations.RunPython(build_cards, migrations.RunPython.noop),
+    ]
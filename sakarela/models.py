@@ -1,5 +1,11 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.urls import reverse
+from store.images import refresh_variants
+from store.cachetags import invalidate_on_change
+from .caching import PAGES_TAG, RECIPES_TAG, bump_page_version, recipe_tag
+from .prerender import schedule_invalidate
 from store.models import Product as StoreProduct
 
 
@@ -16,6 +22,7 @@ class Product(models.Model):
     title = models.CharField(max_length=100)
     description = models.TextField()
     image = models.ImageField(upload_to='products/')
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     badge = models.ImageField(upload_to='badges/', blank=True, null=True)
     type = models.CharField(max_length=20, choices=PRODUCT_TYPES, default='other', help_text="Тип на продукта")
 
@@ -31,15 +38,16 @@ class Product(models.Model):
         related_name='main_product',
         help_text="If set, shows a ‘Buy online’ button"
     )
-    
+    updated_at = models.DateTimeField(auto_now=True)
+
     def __str__(self):
         return self.title
     
     def get_store_url(self):
-        if not self.store_product:
+        if not self.store_product_id:
             return None
         # assumes you have a URL pattern named 'store:product_detail'
-        return reverse('store:product_detail', args=[self.store_product.pk])
+        return reverse('store:product_detail', args=[self.store_product_id])
 
 
 class Nutrition(models.Model):
@@ -66,10 +74,12 @@ class Recipe(models.Model):
     )
     title = models.CharField(max_length=200)
     image = models.ImageField(upload_to='recipes/')
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     short_description = models.TextField(max_length=300, help_text="Brief description of the recipe")
     cook_time = models.PositiveIntegerField(help_text="Time in minutes")
     servings = models.PositiveIntegerField(default=4, help_text="Number of servings")
     appliance = models.CharField(max_length=200, help_text="Cooking equipment/appliances needed")
+    updated_at = models.DateTimeField(auto_now=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
@@ -86,6 +96,7 @@ class RecipeIngredient(models.Model):
     product = models.CharField(max_length=200, help_text="Name of the ingredient/product")
     amount = models.CharField(max_length=100, help_text="Amount/quantity of the ingredient")
     order = models.PositiveIntegerField(default=0, help_text="Order of the ingredient (1, 2, 3, etc.)")
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['order']
@@ -104,9 +115,102 @@ class RecipeStep(models.Model):
     step_name = models.CharField(max_length=100, help_text="Example: Step 1, Step 2, etc.")
     step_content = models.TextField(help_text="The content/instructions for this step")
     order = models.PositiveIntegerField(default=0, help_text="Order of the step (1, 2, 3, etc.)")
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['order']
     
     def __str__(self):
         return f"{self.recipe.title} - {self.step_name}"
+
+
+class ProductCard(models.Model):
+    """
+    Read model for the marketing product cards (home, products,
+    "Други продукти"): only the fields the cards render, kept in sync with
+    Product by the signals below, so listings are one narrow query with a
+    LIMIT and no join to store.Product.
+    """
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='card')
+    title = models.CharField(max_length=100)
+    type = models.CharField(max_length=20)
+    image = models.ImageField(upload_to='products/', editable=False)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
+    badge = models.ImageField(upload_to='badges/', blank=True, editable=False)
+    # plain id (no FK) – the online store link is built without loading store.Product
+    store_product_id = models.PositiveIntegerField(blank=True, null=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['type', 'title'])]
+
+    def __str__(self):
+        return self.title
+
+    def get_store_url(self):
+        if not self.store_product_id:
+            return None
+        return reverse('store:product_detail', args=[self.store_product_id])
+
+    @classmethod
+    def from_product(cls, product):
+        return cls(
+            product_id=product.pk,
+            title=product.title,
+            type=product.type,
+            image=product.image.name,
+            image_variants=product.image_variants,
+            badge=product.badge.name or '',
+            store_product_id=product.store_product_id,
+        )
+
+    @classmethod
+    def refresh(cls, product):
+        cls.from_product(product).save()
+
+    @classmethod
+    def rebuild(cls):
+        """Re-create every card (after bulk_create / queryset updates on Product)."""
+        products = Product.objects.only('title', 'type', 'image', 'image_variants', 'badge', 'store_product_id')
+        with transaction.atomic():
+            cls.objects.all().delete()
+            cls.objects.bulk_create([cls.from_product(p) for p in products.iterator()], batch_size=1000)
+            transaction.on_commit(bump_page_version)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Recipe)
+def _image_variants(sender, instance, raw=False, **kwargs):
+    if not raw:
+        refresh_variants(instance, "image", "image_variants")
+
+
+# registered after _image_variants so the card gets the fresh manifest
+@receiver(post_save, sender=Product)
+def _refresh_product_card(sender, instance, raw=False, **kwargs):
+    if not raw:
+        ProductCard.refresh(instance)
+
+
+@receiver(post_delete, sender=StoreProduct)
+def _unlink_product_cards(sender, instance, **kwargs):
+    # on_delete=SET_NULL is a queryset update, so Product's post_save never fires
+    if ProductCard.objects.filter(store_product_id=instance.pk).update(store_product_id=None):
+        transaction.on_commit(bump_page_version)
+        schedule_invalidate()
+
+
+# cache tags (sakarela/caching.py)
+# (PAGES_TAG is bumped on every save anyway, below; it is listed for the
+# image manifests, which are written with queryset updates)
+invalidate_on_change(Product, lambda p: [PAGES_TAG, RECIPES_TAG])
+invalidate_on_change(Recipe, lambda r: [PAGES_TAG, RECIPES_TAG, recipe_tag(r.pk)])
+invalidate_on_change(RecipeIngredient, lambda i: [recipe_tag(i.recipe_id)])
+invalidate_on_change(RecipeStep, lambda s: [recipe_tag(s.recipe_id)])
+
+
+@receiver([post_save, post_delete])
+def _invalidate_cached_pages(sender, raw=False, **kwargs):
+    # any sakarela model may appear on a cached marketing page
+    if not raw and sender._meta.app_label == "sakarela":
+        transaction.on_commit(bump_page_version)
+        schedule_invalidate()
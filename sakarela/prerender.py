@@ -0,0 +1,203 @@
+# sakarela/prerender.py
+"""
+Marketing pages rendered to disk for nginx.
+
+`manage.py prerender_site` renders the pages below into a new build directory
+
+    PRERENDER_ROOT/<build>/recipes/12/index.html  (+ .gz, + .br when brotli is installed)
+
+and then points PRERENDER_ROOT/current.json at it. The @cached_page views
+answer a matching GET with an empty response carrying
+
+    X-Accel-Redirect: PRERENDER_URL<build>/recipes/12/index.html
+
+so nginx sends the file (gzip_static) and the gunicorn worker is free again
+after a stat() – no template, no query.
+
+With PRERENDER_ENABLED, a sakarela model change removes current.json on
+commit (and stamps the "changed" file), so every worker stops redirecting
+at once and gunicorn renders the pages again. Nothing is rendered inside
+the request that saved; cron re-renders with
+
+    python manage.py prerender_site --if-stale
+
+A build that was running while content changed is thrown away instead of
+published. Older builds are pruned (the previous one is kept for requests
+still in flight).
+"""
+import gzip
+import inspect
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.db import transaction
+from django.test import RequestFactory
+from django.urls import resolve, reverse
+
+try:
+    import brotli
+except ImportError:  # optional: .br siblings are skipped without it
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "current.json"
+CHANGED = "changed"
+KEEP_BUILDS = 2
+
+_manifest_cache = {"mtime": None, "manifest": None}
+
+
+def enabled():
+    return getattr(settings, "PRERENDER_ENABLED", False)
+
+
+def root():
+    return str(getattr(settings, "PRERENDER_ROOT", os.path.join(settings.BASE_DIR, "prerendered")))
+
+
+def page_urls():
+    """Every pre-rendered URL: the static pages plus one per product / recipe."""
+    from .models import Product, Recipe
+
+    urls = [reverse("home"), reverse("about"), reverse("products"), reverse("recipe_list")]
+    urls += [reverse("product_detail", args=[pk]) for pk in Product.objects.values_list("pk", flat=True)]
+    urls += [reverse("recipe_detail", args=[pk]) for pk in Recipe.objects.values_list("pk", flat=True)]
+    return urls
+
+
+def file_for(url):
+    return url.strip("/") + "/index.html" if url.strip("/") else "index.html"
+
+
+def render_url(url):
+    """
+    HTML of `url` as an anonymous GET, past every caching decorator (the
+    page cache would answer with an empty X-Accel-Redirect response).
+    """
+    request = RequestFactory().get(url)
+    request.user = AnonymousUser()
+    match = resolve(url)
+    view = inspect.unwrap(match.func)
+    response = view(request, *match.args, **match.kwargs)
+    if response.status_code != 200:
+        raise ValueError(f"{url} -> {response.status_code}")
+    if not response.content:
+        raise ValueError(f"{url} -> empty body")
+    return response.content
+
+
+def _write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as fh:
+        fh.write(content)
+    with open(path + ".gz", "wb") as fh:
+        fh.write(gzip.compress(content, compresslevel=9, mtime=0))
+    if brotli is not None:
+        with open(path + ".br", "wb") as fh:
+            fh.write(brotli.compress(content))
+
+
+def prerender_site():
+    """
+    Render every page into a new build and switch to it. Returns the
+    manifest, or None when content changed while rendering (the build is
+    discarded and current.json stays absent for the next run).
+    """
+    started = time.time()
+    build = time.strftime("%Y%m%d%H%M%S") + "-" + uuid.uuid4().hex[:8]
+    build_dir = os.path.join(root(), build)
+    files = {}
+    for url in page_urls():
+        try:
+            content = render_url(url)
+        except Exception as exc:
+            # one broken page must not take the others down; it falls back to gunicorn
+            logger.warning("Prerender of %s failed: %s", url, exc)
+            continue
+        files[url] = file_for(url)
+        _write(os.path.join(build_dir, files[url]), content)
+
+    if last_change() >= started:
+        logger.info("Content changed during prerender build %s; discarded", build)
+        shutil.rmtree(build_dir, ignore_errors=True)
+        return None
+
+    manifest = {"build": build, "started": started, "files": files}
+    os.makedirs(root(), exist_ok=True)
+    tmp = os.path.join(root(), MANIFEST + ".tmp")
+    with open(tmp, "w") as fh:
+        json.dump(manifest, fh)
+    os.replace(tmp, os.path.join(root(), MANIFEST))
+    _prune(keep=build)
+    return manifest
+
+
+def _prune(keep):
+    builds = sorted(
+        name for name in os.listdir(root())
+        if os.path.isdir(os.path.join(root(), name))
+    )
+    for name in builds[:-KEEP_BUILDS]:
+        if name != keep:
+            shutil.rmtree(os.path.join(root(), name), ignore_errors=True)
+
+
+def invalidate():
+    """Stop serving the current build and record when content changed."""
+    os.makedirs(root(), exist_ok=True)
+    with open(os.path.join(root(), CHANGED), "w") as fh:
+        fh.write(repr(time.time()))
+    try:
+        os.remove(os.path.join(root(), MANIFEST))
+    except FileNotFoundError:
+        pass
+
+
+def last_change():
+    """Time of the last invalidate() (0 when content never changed)."""
+    try:
+        with open(os.path.join(root(), CHANGED)) as fh:
+            return float(fh.read())
+    except (OSError, ValueError):
+        return 0.0
+
+
+def current_manifest():
+    """current.json, re-read only when its mtime changes (one stat per call)."""
+    path = os.path.join(root(), MANIFEST)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    if _manifest_cache["mtime"] != mtime:
+        try:
+            with open(path) as fh:
+                _manifest_cache["manifest"] = json.load(fh)
+        except (OSError, ValueError):
+            return None
+        _manifest_cache["mtime"] = mtime
+    return _manifest_cache["manifest"]
+
+
+def accel_path(request):
+    """X-Accel-Redirect target for `request`, or None to render normally."""
+    if not enabled() or request.GET:
+        return None
+    manifest = current_manifest()
+    if not manifest or request.path not in manifest["files"]:
+        return None
+    prefix = getattr(settings, "PRERENDER_URL", "/_prerendered/")
+    return f"{prefix}{manifest['build']}/{manifest['files'][request.path]}"
+
+
+def schedule_invalidate():
+    """Signal trigger: drop the build once the change is committed."""
+    if enabled():
+        transaction.on_commit(invalidate)
@@ -0,0 +1,16 @@
+# sakarela/suggestions.py
+from store.suggestions import get_pool, in_order, pick
+
+from .models import Recipe
+
+RECIPE_POOL_KEY = "suggest:recipes"
+
+
+def _recipes():
+    return Recipe.objects.order_by().values_list("id", "product_id")
+
+
+def suggest_recipes(recipe, k=4):
+    """Other recipes for the same product first, then random ones."""
+    ids = pick(get_pool(RECIPE_POOL_KEY, _recipes), k, [recipe.product_id], [recipe.pk])
+    return in_order(Recipe.objects.all(), ids)
@@ -1,3 +1,281 @@
-from django.test import TestCase
+import gzip
+import io
+import os
+import shutil
+import tempfile
+from unittest.mock import patch
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from sakarela.models import Product, ProductCard, Recipe, RecipeStep
+from sakarela.prerender import current_manifest, invalidate, prerender_site
+from sakarela.suggestions import suggest_recipes
+from store.tests import QueryCountTestMixin, fill_cart, seed_catalog
+
+
+@override_settings(SERVER_TIMING_ENABLED=False)
+class MarketingPagesQueryCountTestCase(QueryCountTestMixin, TestCase):
+    """Marketing pages must not issue per-product or per-recipe queries."""
+
+    def measure_catalog(self, url_for, max_queries, data=None):
+        # measure the uncached cost
+        seed_catalog(self.small)
+        cache.clear()
+        small_count = self.count_queries("get", url_for(), data)
+        seed_catalog(self.large - self.small, start=self.small)
+        cache.clear()
+        large_count = self.count_queries("get", url_for(), data)
+        self.assertQueriesFlat(url_for(), small_count, large_count, max_queries)
+
+    def test_home(self):
+        self.measure_catalog(lambda: reverse("home"), 1)
+
+    def test_about(self):
+        self.measure_catalog(lambda: reverse("about"), 2)
+
+    def test_contact(self):
+        self.measure_catalog(lambda: reverse("contact"), 2)
+
+    def test_products(self):
+        self.measure_catalog(lambda: reverse("products"), 1)
+
+    def test_products_by_type(self):
+        self.measure_catalog(lambda: reverse("products"), 1, {"type": "sirene"})
+
+    def test_product_detail(self):
+        self.measure_catalog(lambda: reverse("product_detail", args=[Recipe.objects.first().product_id]), 3)
+
+    def test_recipe_list(self):
+        self.measure_catalog(lambda: reverse("recipe_list"), 2)
+
+    def test_recipe_detail(self):
+        # 2 of them for the ETag (sakarela.views._recipe_state)
+        self.measure_catalog(lambda: reverse("recipe_detail", args=[Recipe.objects.first().pk]), 7)
+
+
+class ProductCardTestCase(TestCase):
+    def setUp(self):
+        self.store_product = seed_catalog(1)[0]
+        self.product = Product.objects.get(store_product=self.store_product)
+
+    def test_card_follows_product(self):
+        self.product.title = "Кашкавал"
+        self.product.type = "kashkaval"
+        self.product.save()
+        card = ProductCard.objects.get(pk=self.product.pk)
+        self.assertEqual((card.title, card.type), ("Кашкавал", "kashkaval"))
+        self.assertEqual(card.get_store_url(), self.product.get_store_url())
+
+    def test_store_product_delete_unlinks_card(self):
+        with patch("sakarela.models.schedule_invalidate") as schedule_invalidate:
+            self.store_product.delete()
+        self.assertIsNone(ProductCard.objects.get(pk=self.product.pk).get_store_url())
+        # the prerendered pages link the card to the store too
+        schedule_invalidate.assert_called_once_with()
+
+    def test_rebuild(self):
+        ProductCard.objects.all().delete()
+        ProductCard.rebuild()
+        self.assertEqual(ProductCard.objects.count(), Product.objects.count())
+
+    def test_home_renders_from_cards(self):
+        response = self.client.get(reverse("home"))
+        self.assertContains(response, self.product.title)
+
+
+class RecipeListTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        seed_catalog(2)
+
+    def test_listing_is_cached_and_invalidated(self):
+        url = reverse("recipe_list")
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(url)
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+        recipe = Recipe.objects.first()
+        recipe.title = "Баница със сирене"
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.save()
+        self.assertContains(self.client.get(url), "Баница със сирене")
+
+    def test_empty_slots_use_annotated_count(self):
+        response = self.client.get(reverse("recipe_list"))
+        # seed_catalog gives every product 2 recipes -> 2 filler cards each
+        self.assertContains(response, "recipe-card empty-card", count=4)
+
+
+
+class RecipeSuggestionsTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        seed_catalog(3)
+
+    def test_same_product_first_without_current(self):
+        recipe = Recipe.objects.first()
+        sibling = Recipe.objects.filter(product=recipe.product).exclude(pk=recipe.pk).get()
+        suggested = suggest_recipes(recipe, 4)
+        self.assertEqual(suggested[0], sibling)
+        self.assertEqual(len(suggested), 4)
+        self.assertNotIn(recipe, suggested)
+
+
+def shared_cache(test):
+    """Run `test` as if the cache were shared by all workers (Redis / Memcached)."""
+    for target in ("sakarela.caching.is_shared", "sakarela.views.is_shared"):
+        test = patch(target, new=lambda: True)(test)
+    return test
+
+
+@override_settings(SERVER_TIMING_ENABLED=False)
+class PageCacheTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.store_product = seed_catalog(2)[0]
+        packaging = self.store_product.packaging_options.all()[0]
+        fill_cart(self.client, [packaging], 3)
+
+    @shared_cache
+    def test_pages_are_served_from_cache(self):
+        for url in (reverse("home"), reverse("products"), reverse("recipe_list"),
+                    reverse("recipe_detail", args=[Recipe.objects.first().pk])):
+            response = self.client.get(url)
+            self.assertEqual(response["X-Page-Cache"], "miss")
+            self.assertNotContains(response, self.store_product.name)  # no cart in the shell
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(url)
+            self.assertEqual(response["X-Page-Cache"], "hit")
+            self.assertEqual(len(ctx.captured_queries), 0, url)
+
+    @shared_cache
+    def test_query_string_is_keyed_on_the_view_parameters(self):
+        url = reverse("products")
+        self.client.get(url, {"type": "sirene"})
+        self.assertEqual(self.client.get(url, {"type": "sirene", "utm_source": "fb"})["X-Page-Cache"], "hit")
+        self.assertEqual(self.client.get(url, {"type": "kashkaval"})["X-Page-Cache"], "miss")
+        self.client.get(url)
+        self.assertEqual(self.client.get(url, {"fbclid": "x1"})["X-Page-Cache"], "hit")
+
+    def test_pages_are_not_cached_per_process(self):
+        # a "pages" bump would reach only the worker that saved
+        url = reverse("home")
+        self.client.get(url)
+        self.assertNotIn("X-Page-Cache", self.client.get(url))
+
+    @shared_cache
+    def test_model_change_invalidates_pages(self):
+        url = reverse("recipe_detail", args=[Recipe.objects.first().pk])
+        self.client.get(url)
+        recipe = Recipe.objects.first()
+        recipe.title = "Сирене по шопски"
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.save()
+        response = self.client.get(url)
+        self.assertEqual(response["X-Page-Cache"], "miss")
+        self.assertContains(response, "Сирене по шопски")
+
+    def test_recipe_detail_not_modified(self):
+        url = reverse("recipe_detail", args=[Recipe.objects.first().pk])
+        etag = self.client.get(url)["ETag"]
+        self.assertEqual(self.client.get(url, headers={"If-None-Match": etag}).status_code, 304)
+        recipe = Recipe.objects.first()
+        recipe.title = "Сирене по шопски"
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.save()
+        self.assertEqual(self.client.get(url, headers={"If-None-Match": etag}).status_code, 200)
+
+    def test_recipe_etag_follows_the_database(self):
+        # changes made through another worker bump nothing in this one's cache
+        recipe = Recipe.objects.first()
+        url = reverse("recipe_detail", args=[recipe.pk])
+        etag = self.client.get(url)["ETag"]
+        RecipeStep.objects.filter(recipe=recipe).update(step_content="Нова стъпка", updated_at=timezone.now())
+        self.assertEqual(self.client.get(url, headers={"If-None-Match": etag}).status_code, 200)
+        etag = self.client.get(url)["ETag"]
+        Recipe.objects.exclude(pk=recipe.pk).delete()
+        self.assertEqual(self.client.get(url, headers={"If-None-Match": etag}).status_code, 200)
+
+    def test_mini_cart(self):
+        response = self.client.get(reverse("store:mini_cart"))
+        self.assertContains(response, self.store_product.name)
+        self.assertContains(response, "x3")
+        self.assertIn("private", response["Cache-Control"])
+
+
+@override_settings(SERVER_TIMING_ENABLED=False, PRERENDER_ENABLED=True)
+class PrerenderTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        settings_override = override_settings(PRERENDER_ROOT=self.root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        seed_catalog(1)
+        self.recipe = Recipe.objects.first()
+
+    def test_command_writes_pages_and_app_redirects_to_them(self):
+        call_command("prerender_site", stdout=io.StringIO())
+        manifest = current_manifest()
+        url = reverse("recipe_detail", args=[self.recipe.pk])
+        path = os.path.join(self.root, manifest["build"], manifest["files"][url])
+        with open(path + ".gz", "rb") as fh:
+            self.assertIn(self.recipe.title, gzip.decompress(fh.read()).decode())
+
+        response = self.client.get(url)
+        self.assertEqual(response["X-Accel-Redirect"],
+                         f"/_prerendered/{manifest['build']}/recipes/{self.recipe.pk}/index.html")
+        self.assertEqual(response.content, b"")
+        # filtered listings are not pre-rendered
+        response = self.client.get(reverse("products"), {"type": "sirene"})
+        self.assertNotIn("X-Accel-Redirect", response)
+
+    def test_content_change_drops_the_build_until_the_next_run(self):
+        call_command("prerender_site", stdout=io.StringIO())
+        old_build = current_manifest()["build"]
+        self.recipe.title = "Пържени филийки"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.save()
+            self.recipe.save()
+        # nothing is rendered in the saving request
+        self.assertIsNone(current_manifest())
+        url = reverse("recipe_detail", args=[self.recipe.pk])
+        self.assertNotIn("X-Accel-Redirect", self.client.get(url))
+
+        call_command("prerender_site", "--if-stale", stdout=io.StringIO())
+        manifest = current_manifest()
+        self.assertNotEqual(manifest["build"], old_build)
+        with open(os.path.join(self.root, manifest["build"], manifest["files"][url]), encoding="utf-8") as fh:
+            self.assertIn("Пържени филийки", fh.read())
+        call_command("prerender_site", "--if-stale", stdout=io.StringIO())
+        self.assertEqual(current_manifest()["build"], manifest["build"])
+
+    def test_second_run_renders_full_pages(self):
+        # with a build live, the cached views answer with an empty X-Accel-Redirect
+        call_command("prerender_site", stdout=io.StringIO())
+        call_command("prerender_site", stdout=io.StringIO())
+        manifest = current_manifest()
+        url = reverse("recipe_detail", args=[self.recipe.pk])
+        self.assertIn(url, manifest["files"])
+        for name in manifest["files"].values():
+            self.assertGreater(os.path.getsize(os.path.join(self.root, manifest["build"], name)), 0)
+
+    @override_settings(PRERENDER_ENABLED=False)
+    def test_command_is_a_no_op_when_disabled(self):
+        out = io.StringIO()
+        call_command("prerender_site", stdout=out)
+        self.assertIn("PRERENDER_ENABLED is off", out.getvalue())
+        self.assertEqual(os.listdir(self.root), [])
+
+    def test_build_is_discarded_when_content_changes_meanwhile(self):
+        with patch("sakarela.prerender.page_urls", side_effect=lambda: invalidate() or [reverse("about")]):
+            self.assertIsNone(prerender_site())
+        self.assertIsNone(current_manifest())
\ No newline at end of file
@@ -1,31 +1,47 @@
 # Create your views here.
 from django.conf import settings
 from django.core.mail import EmailMessage
+from django.db.models import Count, Max, Prefetch
 from django.shortcuts import get_object_or_404
 from django.shortcuts import render
 
-from sakarela.models import Product, Recipe
+from sakarela.models import Product, ProductCard, Recipe
+from store.conditional import conditional_page
+from store.timing import timed
+from store.cachetags import is_shared, tagged_get, tagged_get_or_set, tagged_set
+from .caching import (
+    PAGE_TIMEOUT, PAGES_TAG, RECIPE_LIST_KEY, RECIPE_LIST_TIMEOUT, RECIPES_TAG,
+    cached_page, recipe_tag,
+)
 from .forms import ContactForm
+from .suggestions import suggest_recipes
 
 
+HOME_PRODUCTS = 4
+
+
+@cached_page
 def home(request):
-    products = Product.objects.all().order_by('-id')  # Show latest products first
+    # Latest products first; the template only shows HOME_PRODUCTS cards
+    products = ProductCard.objects.order_by('-product_id')[:HOME_PRODUCTS]
     return render(request, 'home.html', {'products': products})
 
 
+@cached_page
 def about(request):
     return render(request, 'about.html')
 
 
+@cached_page(params=("type",))
 def products(request):
     # Get the type filter from URL parameters
     product_type = request.GET.get('type', '')
     
     # Filter products by type if specified
     if product_type:
-        products = Product.objects.filter(type=product_type).order_by('title')
+        products = ProductCard.objects.filter(type=product_type).order_by('title')
     else:
-        products = Product.objects.all().order_by('type', 'title')
+        products = ProductCard.objects.order_by('type', 'title')
     
     # Get all available product types for the filter dropdown
     product_types = Product.PRODUCT_TYPES
@@ -56,7 +72,8 @@ def contact_view(request):
                 to=recipient_list,
                 reply_to=[form.cleaned_data['email']],
             )
-            email.send(fail_silently=False)
+            with timed("email"):
+                email.send(fail_silently=False)
 
             success = True
             form = ContactForm()
@@ -65,9 +82,10 @@ def contact_view(request):
     return render(request, 'contact.html', {'form': form, 'success': success})
 
 
+@cached_page
 def product_detail(request, pk):
     product = get_object_or_404(Product, pk=pk)
-    other_products = Product.objects.exclude(pk=pk)[:4]
+    other_products = ProductCard.objects.exclude(pk=pk)[:4]
     # Grab only recipes for this product
     recipes = product.recipes.all()
     return render(request, 'product_detail.html', {
@@ -77,15 +95,75 @@ def product_detail(request, pk):
     })
 
 
+@cached_page
 def recipe_list(request):
-    # Get products that have recipes
-    products_with_recipes = Product.objects.filter(recipes__isnull=False).distinct().prefetch_related('recipes')
+    # Products that have recipes, with recipe_count annotated (GROUP BY instead
+    # of DISTINCT over the join) and only the card fields of each recipe.
+    # The evaluated list is cached; recipe/product saves invalidate it.
+    products_with_recipes = tagged_get(RECIPE_LIST_KEY, [RECIPES_TAG])
+    if products_with_recipes is None:
+        recipes = Recipe.objects.only(
+            'id', 'product_id', 'title', 'image', 'image_variants', 'cook_time', 'servings',
+        ).order_by('id')
+        products_with_recipes = list(
+            Product.objects.only('id', 'title')
+            .annotate(recipe_count=Count('recipes'))
+            .filter(recipe_count__gt=0)
+            .order_by('id')
+            .prefetch_related(Prefetch('recipes', queryset=recipes))
+        )
+        tagged_set(RECIPE_LIST_KEY, products_with_recipes, [RECIPES_TAG], RECIPE_LIST_TIMEOUT)
     return render(request, 'recipe_list.html', {'products_with_recipes': products_with_recipes})
 
 
+def _recipe_state(pk):
+    """
+    Database state the recipe page depends on: newest updated_at and row
+    count of all recipes (this one and the suggested ones; the counts show
+    deletions), and of this recipe's ingredients and steps.
+    """
+    recipes = Recipe.objects.aggregate(newest=Max('updated_at'), count=Count('pk'))
+    own = Recipe.objects.filter(pk=pk).aggregate(
+        ingredients=Max('recipe_ingredients__updated_at'),
+        steps=Max('recipe_steps__updated_at'),
+        ingredient_count=Count('recipe_ingredients', distinct=True),
+        step_count=Count('recipe_steps', distinct=True),
+    )
+    modified = max(filter(None, (recipes['newest'], own['ingredients'], own['steps'])), default=None)
+    return modified, recipes['count'], own['ingredient_count'], own['step_count']
+
+
+def _recipe_page_state(request, pk):
+    """
+    Like store.conditional.catalog_last_modified: read from the database
+    (cached only when every worker sees the same cache), once per request.
+    """
+    state = getattr(request, '_recipe_state', None)
+    if state is None:
+        if is_shared():
+            state = tagged_get_or_set(
+                f"sakarela:recipe_state:{pk}", lambda: _recipe_state(pk),
+                [PAGES_TAG, recipe_tag(pk)], PAGE_TIMEOUT,
+            )
+        else:
+            state = _recipe_state(pk)
+        request._recipe_state = state
+    return state
+
+
+def _recipe_modified(request, pk):
+    return _recipe_page_state(request, pk)[0]
+
+
+def _recipe_etag(request, pk):
+    return (*_recipe_page_state(request, pk), pk)
+
+
+@conditional_page(_recipe_etag, _recipe_modified)
+@cached_page
 def recipe_detail(request, pk):
     recipe = get_object_or_404(Recipe, pk=pk)
-    other_recipes = Recipe.objects.exclude(pk=pk).order_by('?')[:4]  # Random 4 other recipes
+    other_recipes = suggest_recipes(recipe, 4)  # same product first, then random
     return render(request, 'recipe_detail.html', {
         'recipe': recipe,
         'other_recipes': other_recipes
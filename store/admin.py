@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import Product, Nutrition, Order, OrderItem, Category, Brand, PackagingOption, Store
+from .models import Product, Nutrition, Order, OrderItem, Category, Brand, PackagingOption, Store, StockReservation
 from django import forms
 from django.templatetags.static import static
 from django.utils.html import format_html
@@ -231,3 +231,10 @@ class StoreAdmin(admin.ModelAdmin):
 
 
 admin.site.register(Product, ProductAdmin)
+
+
+@admin.register(StockReservation)
+class StockReservationAdmin(admin.ModelAdmin):
+    list_display = ('order', 'packaging', 'quantity', 'created_at', 'expires_at')
+    list_select_related = ('order', 'packaging')
+    readonly_fields = ('created_at',)
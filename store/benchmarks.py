@@ -0,0 +1,283 @@
+# store/benchmarks.py
+"""
+Benchmark cases for the catalog, cart, checkout and payment hot paths,
+and the session backends (store/sessions.py).
+
+`build_cases()` lists the cases without touching the database; each one
+is built by its `bench_*` factory only when it runs (`run_case`), inside a
+transaction that is rolled back, so the cart lines, sessions and orders the
+cases write never stay behind. The runner (manage.py run_benchmarks) stores
+the numbers as JSON. External integrations (Econt, e-mail) are stubbed so
+the numbers measure our code only.
+"""
+import statistics
+import time
+import uuid
+from collections import OrderedDict
+from decimal import Decimal
+from functools import partial
+from unittest import mock
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.messages.storage.fallback import FallbackStorage
+from django.contrib.sessions.backends.db import SessionStore
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.utils.module_loading import import_string
+
+from store.cart_utils import CART_VERSION, SESSION_KEY, Cart
+from store.models import PackagingOption
+
+STORE_HOME_FILTERS = OrderedDict([
+    ("plain", {}),
+    ("search", {"q": "ка"}),
+    ("price", {"min_price": "5", "max_price": "30"}),
+    ("category", {"category": "__first_category__"}),
+    ("badge", {"badge": "БДС"}),
+    ("combined", {"q": "ка", "min_price": "5", "max_price": "30", "badge": "БДС"}),
+])
+CART_SIZES = (1, 5, 20, 50)
+SESSION_ENGINES = OrderedDict([
+    ("db", "django.contrib.sessions.backends.db"),
+    ("cached_db", "django.contrib.sessions.backends.cached_db"),
+    ("coalesced", "store.sessions"),
+    ("signed_cookies", "django.contrib.sessions.backends.signed_cookies"),
+])
+ORDER_POST = {
+    "full_name": "Иван", "last_name": "Иванов", "email": "bench@example.com",
+    "phone": "0888123456", "country": "България", "state": "Ямбол", "city": "Ямбол",
+    "address1": "ул. Първа 1", "post_code": "8600", "payment_method": "card",
+}
+
+_factory = RequestFactory()
+
+
+def make_request(method="get", path="/", data=None, cart=None, htmx=False):
+    """Build a request with a session and messages, as the middleware would."""
+    headers = {"HX-Request": "true"} if htmx else {}
+    request = getattr(_factory, method)(path, data or {}, headers=headers)
+    request.session = SessionStore()
+    request.user = AnonymousUser()
+    request._messages = FallbackStorage(request)
+    if cart is not None:
+        request.session[SESSION_KEY] = {"v": CART_VERSION, "id": cart}
+    return request
+
+
+def cart_of_size(n):
+    """
+    Id of a cart with `n` distinct packaging lines (CartLine rows, written
+    once here so the cases time only the reads; rolled back with the case).
+    """
+    cart_id = uuid.uuid5(uuid.NAMESPACE_URL, f"bench-cart-{n}").hex
+    Cart(make_request(cart=cart_id)).replace(
+        dict.fromkeys(PackagingOption.objects.order_by("pk").values_list("pk", flat=True)[:n], 1),
+    )
+    return cart_id
+
+
+def measure(fn, repeat, warmup):
+    """Run `fn` warmup + repeat times; return timing stats in ms + queries of one run."""
+    for _ in range(warmup):
+        fn()
+    with CaptureQueriesContext(connection) as ctx:
+        fn()
+    queries = len(ctx.captured_queries)
+
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "runs": repeat,
+        "min_ms": round(samples[0], 3),
+        "median_ms": round(statistics.median(samples), 3),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3),
+        "mean_ms": round(statistics.fmean(samples), 3),
+        "queries": queries,
+    }
+
+
+# ---- cases ----
+
+def bench_store_home(params, htmx=False):
+    from store.models import Category
+    from store.views import store_home
+
+    if params.get("category") == "__first_category__":
+        first = Category.objects.order_by("pk").first()
+        params = {**params, "category": str(first.pk) if first else ""}
+
+    def run():
+        return store_home(make_request(path="/store/", data=params, htmx=htmx))
+
+    return run
+
+
+def bench_cart_items_and_total(size):
+    cart_id = cart_of_size(size)
+
+    def run():
+        cart = Cart.of(make_request(cart=cart_id))
+        return cart.items(), cart.total()
+
+    return run
+
+
+def bench_order_info_post(size):
+    """order_info POST (order + item snapshot) inside a rolled-back transaction."""
+    from store.views import order_info
+
+    cart = cart_of_size(size)
+
+    def run():
+        with mock.patch("store.views.econt_shipping_preview_for_cart", return_value=Decimal("6.00")), \
+                transaction.atomic():
+            response = order_info(make_request("post", "/store/order/", ORDER_POST, cart=cart))
+            transaction.set_rollback(True)
+        return response
+
+    return run
+
+
+def bench_cart_click(size):
+    """add_to_cart on a line already in a cart of `size` lines (one F() UPDATE)."""
+    request = make_request(cart=cart_of_size(size))
+    packaging = PackagingOption.objects.order_by("pk").first()
+
+    def run():
+        return Cart.of(request).add(packaging, 1)
+
+    return run
+
+
+def bench_session_write(engine, flush=False):
+    """
+    One session write against a session backend (the checkout form, which
+    order_start / order_info_recalc keep in the session): load the session by
+    its cookie, change a field, save. Returns (case, {"cookie_bytes": n}).
+
+    The coalesced backend (store.sessions) defers most writes; flush=True
+    times the write that does reach the database (one per
+    SESSION_DB_WRITE_INTERVAL per session), so both costs are reported.
+    """
+    store_class = import_string(f"{engine}.SessionStore")
+    session = store_class()
+    session[SESSION_KEY] = {"v": CART_VERSION, "id": "0" * 32}
+    session["order_form_data"] = dict(ORDER_POST)
+    session.save()
+    state = {"key": session.session_key}
+    methods = ["card", "cash"]
+
+    def run():
+        session = store_class(state["key"])
+        if flush:
+            session._cache.delete(session._db_marker())
+        data = session["order_form_data"]
+        data["payment_method"] = methods[data["payment_method"] == "card"]
+        session["order_form_data"] = data
+        session.save()
+        state["key"] = session.session_key  # the cookie value (the data itself for signed cookies)
+        return session
+
+    return run, {"cookie_bytes": len(state["key"])}
+
+
+def bench_sign_params(n_items):
+    from store.views import sign_params_in_post_order
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.TraditionalOpenSSL,
+        serialization.NoEncryption(),
+    )
+    params = OrderedDict([
+        ("IPCmethod", "IPCPurchase"), ("IPCVersion", "1.4"), ("IPCLanguage", "EN"),
+        ("SID", "000000000000010"), ("walletnumber", "61938166610"), ("Amount", "99.90"),
+        ("Currency", "BGN"), ("OrderID", "O000123ABCDEF0123456789"),
+        ("URL_OK", "https://example.com/ok"), ("URL_Cancel", "https://example.com/cancel"),
+        ("URL_Notify", "https://example.com/notify"), ("CardTokenRequest", "0"),
+        ("KeyIndex", "1"), ("PaymentParametersRequired", "1"),
+        ("customeremail", "bench@example.com"), ("customerfirstnames", "Иван"),
+        ("customerfamilyname", "Иванов"), ("customerphone", "+359888123456"),
+        ("customercountry", "BGR"), ("customercity", "Ямбол"), ("customerzipcode", "8600"),
+        ("customeraddress", "ул. Първа 1"), ("Note", ""), ("CartItems", str(n_items)),
+    ])
+    for idx in range(1, n_items + 1):
+        params[f"Article_{idx}"] = f"Кашкавал {idx}"
+        params[f"Quantity_{idx}"] = "1"
+        params[f"Price_{idx}"] = "9.99"
+        params[f"Currency_{idx}"] = "BGN"
+        params[f"Amount_{idx}"] = "9.99"
+
+    def run():
+        return sign_params_in_post_order(params, pem)
+
+    return run
+
+
+def fake_econt_cities(n=5000):
+    return [
+        {"name": f"Град {i}", "nameEn": f"Town {i}", "postCode": f"{1000 + i}"}
+        for i in range(n)
+    ]
+
+
+def bench_econt_city_suggestions(term, cities):
+    from store.views import econt_city_suggestions
+
+    def run():
+        with mock.patch("store.views.econt_get_cities", return_value=cities):
+            return econt_city_suggestions(make_request(path="/store/econt-cities/", data={"q": term}))
+
+    return run
+
+
+def build_cases():
+    """
+    Return [(name, params, setup)] for every benchmark case. `setup()` builds
+    the case (writing its fixtures) and returns the callable to time, or
+    (callable, extra params); nothing is built until run_case() calls it.
+    """
+    cases = []
+    for label, params in STORE_HOME_FILTERS.items():
+        cases.append(("store_home", {"filter": label}, partial(bench_store_home, params)))
+    cases.append(("store_home", {"filter": "search", "htmx": True},
+                  partial(bench_store_home, STORE_HOME_FILTERS["search"], htmx=True)))
+    for size in CART_SIZES:
+        cases.append(("cart_items_and_total", {"cart_size": size}, partial(bench_cart_items_and_total, size)))
+    for size in CART_SIZES:
+        cases.append(("order_info_post", {"cart_size": size}, partial(bench_order_info_post, size)))
+    for size in CART_SIZES:
+        cases.append(("cart_click", {"cart_size": size}, partial(bench_cart_click, size)))
+    for label, engine in SESSION_ENGINES.items():
+        cases.append(("session_write", {"engine": label}, partial(bench_session_write, engine)))
+        if engine == "store.sessions":
+            cases.append(("session_write", {"engine": label, "write": "flush"},
+                          partial(bench_session_write, engine, flush=True)))
+    for n_items in (1, 10, 50):
+        cases.append(("sign_params_in_post_order", {"items": n_items}, partial(bench_sign_params, n_items)))
+    cities = fake_econt_cities()
+    for term in ("", "town 12", "няма такъв"):
+        cases.append(("econt_city_suggestions", {"q": term}, partial(bench_econt_city_suggestions, term, cities)))
+    return cases
+
+
+def run_case(setup, repeat, warmup):
+    """
+    Build a case with `setup` and time it; everything it wrote (fixtures and
+    the timed runs, e.g. cart_click's quantity increments) is rolled back.
+    Returns (extra params, stats).
+    """
+    with transaction.atomic():
+        built = setup()
+        run, extra = built if isinstance(built, tuple) else (built, {})
+        stats = measure(run, repeat, warmup)
+        transaction.set_rollback(True)
+    return extra, stats
@@ -0,0 +1,234 @@
+# store/cachetags.py
+"""
+Tag-versioned cache entries, shared by store and sakarela.
+
+Every tag ("catalog", "product:12", "recipe:3", "pages", ...) has a version
+number in the cache. An entry is stored under a plain key together with the
+versions of the tags it depends on:
+
+    tagged_set("store:related:12", related, tags=["catalog"], timeout=3600)
+    tagged_get("store:related:12", tags=["catalog"])
+
+A read fetches the entry and the current tag versions in one get_many(); if
+any tag was bumped since the entry was stored, the entry is stale and the
+read is a miss. So an admin edit invalidates every entry that depends on the
+edited object with one incr, without knowing their keys.
+
+Tags are bumped by `bump_tags()`, and automatically for models registered
+with `invalidate_on_change(Model, tags_for)`: on post_save / post_delete the
+tags of the instance are bumped right away and again on commit (so a request
+that read the old rows while the transaction was open cannot keep them).
+Code that writes such a model with a queryset update calls
+`invalidate_instance(obj)` to do the same.
+
+Versions start from the clock, so a restarted cache never reuses an old
+version – they end up in ETags (store/conditional.py).
+
+Counters (hit / miss / stale / set per key prefix) are kept per process and
+added to the shared cache every STATS_FLUSH_EVERY operations, see
+`cache_stats()` and `manage.py cache_stats`.
+"""
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+TAG_PREFIX = "cachetags:tag:"
+STATS_PREFIX = "cachetags:stats:"
+STATS_NAMES_KEY = "cachetags:stats_names"
+STATS_FLUSH_EVERY = 100
+STATS_FLUSH_SECONDS = 30
+
+_stats = Counter()
+_last_flush = [time.monotonic()]
+
+# model -> tags_for, filled by invalidate_on_change()
+_tags_for = {}
+
+
+# backends whose entries (and tag bumps) live in one process only
+PER_PROCESS_BACKENDS = ("LocMemCache", "DummyCache")
+
+
+def is_shared():
+    """
+    True when every worker sees the same cache. With a per-process cache a
+    bump reaches only the worker that made the change, so entries that must
+    not be stale in any worker are not cached there at all.
+    """
+    return not settings.CACHES["default"]["BACKEND"].endswith(PER_PROCESS_BACKENDS)
+
+
+def _tag_key(tag):
+    return TAG_PREFIX + tag
+
+
+def tag_versions(tags):
+    """{tag: version} for `tags`, seeding missing ones from the clock."""
+    tags = list(tags)
+    found = cache.get_many([_tag_key(t) for t in tags])
+    versions = {}
+    for tag in tags:
+        version = found.get(_tag_key(tag))
+        if version is None:
+            cache.add(_tag_key(tag), int(time.time()), None)
+            version = cache.get(_tag_key(tag), int(time.time()))
+        versions[tag] = version
+    return versions
+
+
+def tag_version(tag):
+    return tag_versions([tag])[tag]
+
+
+def bump_tags(*tags):
+    for tag in tags:
+        try:
+            cache.incr(_tag_key(tag))
+        except ValueError:
+            cache.set(_tag_key(tag), int(time.time()), None)
+
+
+def _stats_name(key):
+    # "store:related:12" -> "store:related"
+    return ":".join(key.split(":")[:2])
+
+
+def _count(key, outcome):
+    _stats[(_stats_name(key), outcome)] += 1
+    if (
+        sum(_stats.values()) >= STATS_FLUSH_EVERY
+        or time.monotonic() - _last_flush[0] >= STATS_FLUSH_SECONDS
+    ):
+        flush_stats()
+
+
+def tagged_get(key, tags=(), default=None):
+    """The value stored under `key` if none of `tags` was bumped since, else `default`."""
+    tags = list(tags)
+    found = cache.get_many([key, *(_tag_key(t) for t in tags)])
+    entry = found.get(key)
+    if not isinstance(entry, tuple) or len(entry) != 2:  # absent (or an untagged value)
+        _count(key, "miss")
+        return default
+    stored_versions, value = entry
+    current = {t: found.get(_tag_key(t)) for t in tags}
+    if stored_versions != current:
+        _count(key, "stale")
+        return default
+    _count(key, "hit")
+    return value
+
+
+def tagged_set(key, value, tags=(), timeout=None, versions=None):
+    """
+    Store `value` under `key`. Pass `versions` read with tag_versions() before
+    computing the value: a bump during the computation then leaves it stale.
+    """
+    cache.set(key, (versions if versions is not None else tag_versions(tags), value), timeout)
+    _count(key, "set")
+
+
+def tagged_get_or_set(key, compute, tags=(), timeout=None):
+    """`tagged_get`, falling back to `compute()` (stored unless it returns None)."""
+    value = tagged_get(key, tags)
+    if value is None:
+        value = compute()
+        if value is not None:
+            tagged_set(key, value, tags, timeout)
+    return value
+
+
+def invalidate_on_change(model, tags_for):
+    """Bump `tags_for(instance)` whenever an instance of `model` is saved or deleted."""
+    def receiver(sender, instance, raw=False, **kwargs):
+        if raw:
+            return
+        invalidate_instance(instance)
+
+    _tags_for[model] = tags_for
+    uid = f"cachetags:{model._meta.label}"
+    post_save.connect(receiver, sender=model, weak=False, dispatch_uid=uid)
+    post_delete.connect(receiver, sender=model, weak=False, dispatch_uid=uid)
+
+
+def invalidate_instance(instance):
+    """
+    Bump the tags registered for `instance`'s model, now and on commit – for
+    changes written with queryset updates, which send no signals.
+    """
+    tags_for = _tags_for.get(type(instance))
+    if tags_for is None:
+        return
+    tags = list(tags_for(instance))
+    bump_tags(*tags)
+    transaction.on_commit(lambda: bump_tags(*tags))
+
+
+def flush_stats():
+    """Add this process' counters to the shared totals."""
+    pending = dict(_stats)
+    _stats.clear()
+    _last_flush[0] = time.monotonic()
+    if not pending:
+        return
+    names = {name for name, _ in pending}
+    known = cache.get(STATS_NAMES_KEY, set())
+    if not names <= known:
+        cache.set(STATS_NAMES_KEY, known | names, None)
+    for (name, outcome), n in pending.items():
+        key = f"{STATS_PREFIX}{name}:{outcome}"
+        cache.add(key, 0, None)
+        try:
+            cache.incr(key, n)
+        except ValueError:  # evicted between add() and incr()
+            cache.set(key, n, None)
+
+
+def cache_stats():
+    """
+    {"entries": {prefix: {"hit": n, "miss": n, "stale": n, "set": n, "hit_ratio": r}},
+     "evictions": n or None} over all processes.
+    """
+    flush_stats()
+    outcomes = ("hit", "miss", "stale", "set")
+    names = sorted(cache.get(STATS_NAMES_KEY, set()))
+    totals = cache.get_many([f"{STATS_PREFIX}{n}:{o}" for n in names for o in outcomes])
+    stats = {}
+    for name in names:
+        row = {o: totals.get(f"{STATS_PREFIX}{name}:{o}", 0) for o in outcomes}
+        reads = row["hit"] + row["miss"] + row["stale"]
+        row["hit_ratio"] = round(row["hit"] / reads, 3) if reads else None
+        stats[name] = row
+    return {"entries": stats, "evictions": backend_evictions()}
+
+
+def reset_stats():
+    _stats.clear()
+    names = cache.get(STATS_NAMES_KEY, set())
+    cache.delete_many(
+        [f"{STATS_PREFIX}{n}:{o}" for n in names for o in ("hit", "miss", "stale", "set")]
+        + [STATS_NAMES_KEY]
+    )
+
+
+def backend_evictions():
+    """
+    Entries the cache server dropped for lack of memory, when it keeps
+    count (Redis, Memcached); None for locmem / database / file caches.
+    """
+    client = getattr(cache, "_cache", None)
+    try:
+        if hasattr(client, "get_client"):  # django.core.cache.backends.redis
+            return int(client.get_client().info("stats").get("evicted_keys", 0))
+        if hasattr(client, "get_stats"):  # pylibmc
+            return sum(int(s.get("evictions", 0)) for _, s in client.get_stats())
+        if hasattr(client, "stats"):  # pymemcache
+            stats = client.stats()
+            return int(stats.get(b"evictions", stats.get("evictions", 0)))
+    except Exception:
+        return None
+    return None
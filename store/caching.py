@@ -0,0 +1,57 @@
+# store/caching.py
+"""
+Keys and tags of the store caches (see store/cachetags.py).
+
+    catalog        every Product / PackagingOption change, stock and sales
+    product:<id>   changes of that product or its packaging options
+    cart:<id>      every change of that cart's lines (store/cart_utils.py)
+"""
+from .cachetags import bump_tags
+
+CATALOG_TAG = "catalog"
+
+
+def product_tag(product_id):
+    return f"product:{product_id}"
+
+
+# Per-product "choose weight" modal (views.weight_modal)
+WEIGHT_MODAL_TIMEOUT = 60 * 10
+
+
+def weight_modal_key(product_id):
+    return f"store:weight_modal:{product_id}"
+
+
+def invalidate_weight_modal(*product_ids):
+    bump_tags(*(product_tag(pk) for pk in product_ids))
+
+
+# Related products on product_detail, tagged with the catalog: the cards
+# show other products' names and prices, so any edit may change them.
+RELATED_PRODUCTS_TIMEOUT = 60 * 60
+
+
+def bump_catalog_version():
+    bump_tags(CATALOG_TAG)
+
+
+def related_products_key(product_id):
+    return f"store:related:{product_id}"
+
+
+# Priced cart (lines with unit prices, weights, total) per cart id, tagged
+# with the catalog and the cart: re-priced only when either moves. Only
+# cached with a shared cache backend, and never used for checkout.
+# Not kept in the session: a price change would have to reach every
+# session holding it (a tag bump here drops them all at once), and storing
+# it would turn cart reads into session writes (store/sessions.py).
+PRICED_CART_TIMEOUT = 60 * 60
+
+
+def cart_tag(cart_id):
+    return f"cart:{cart_id.hex}"
+
+
+def priced_cart_key(cart_id):
+    return f"store:cart:{cart_id.hex}"
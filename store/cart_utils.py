@@ -1,47 +1,314 @@
-# store/cart_utils.py
+import logging
+import uuid
+from dataclasses import dataclass
 from decimal import Decimal
-from typing import List, Tuple
-from store.models import Product, PackagingOption
+from typing import Dict, List, Optional, Tuple
 
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
 
-def get_session_cart(request) -> dict:
-    return request.session.get("cart", {}) or {}
+from store.cachetags import bump_tags, is_shared, tag_versions, tagged_get, tagged_set
+from store.caching import CATALOG_TAG, PRICED_CART_TIMEOUT, cart_tag, priced_cart_key
+from store.models import CartLine, PackagingOption, Product
 
+logger = logging.getLogger(__name__)
 
-def set_session_cart(request, cart_dict: dict) -> None:
-    request.session["cart"] = cart_dict
-    request.session.modified = True
+# Session layout of the cart, under SESSION_KEY:
+#   v2  {"v": 2, "id": "<hex>"}   the lines are CartLine rows of that id
+#   v1  {"<product_id>_<packaging_id>": qty}   moved into CartLine on first access
+# (between the two, the id was kept as a bare "cart_id" session key)
+SESSION_KEY = "cart"
+CART_VERSION = 2
+UNVERSIONED_ID_KEY = "cart_id"
+# най-голямото количество на един ред (пази PositiveIntegerField от препълване)
+MAX_QUANTITY = 999
 
 
-def cart_items_and_total(request) -> Tuple[list, Decimal]:
+class InvalidCartUpdate(Exception):
+    """A batch update was rejected; `errors` is {packaging_id: message}."""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__("; ".join(f"{pk}: {msg}" for pk, msg in errors.items()))
+
+
+@dataclass
+class CartItem:
+    """One cart line; `packaging` comes with its product loaded."""
+    packaging: PackagingOption
+    quantity: int
+    price: Optional[Decimal] = None  # unit price it was priced at
+
+    def __post_init__(self):
+        if self.price is None:
+            self.price = self.packaging.current_price
+
+    @property
+    def product(self) -> Product:
+        return self.packaging.product
+
+    @property
+    def weight_kg(self) -> Decimal:
+        return Decimal(str(self.packaging.weight or 0))
+
+    @property
+    def subtotal(self) -> Decimal:
+        return self.price * self.quantity
+
+    line_total = subtotal  # name used by the header cart templates
+
+
+class Cart:
     """
-    Returns (items, total) from session cart.
-    items: [{product, packaging, quantity, price, subtotal}]
+    The session's cart – the one way to read or change it.
+
+    Lines are CartLine rows keyed by packaging option (the packaging implies
+    the product), so every change is a single-row statement and concurrent
+    clicks are all counted. `Cart.of(request)` is shared by the views and the
+    context processor of one request, so the lines are loaded once.
+
+    With a shared cache the priced lines are also cached per cart id, tagged
+    with the catalog and the cart (store/caching.py): pages re-price the cart
+    only after it changed or a product / packaging option was edited. A
+    per-process cache would keep serving the old lines in the other workers,
+    so there they are loaded once per request. Checkout reads them with
+    items(fresh=True), never from the cache.
     """
-    cart = get_session_cart(request)
-    items: List[dict] = []
-    total = Decimal("0.00")
 
-    for cart_key, qty in cart.items():
+    def __init__(self, request):
+        self.session = request.session
+        self._id = self._read_id()
+        self._items = None
+
+    @classmethod
+    def of(cls, request) -> "Cart":
+        cart = getattr(request, "_cart", None)
+        if cart is None:
+            cart = request._cart = cls(request)
+        return cart
+
+    # ---- session schema ----
+
+    def _read_id(self) -> Optional[uuid.UUID]:
+        data = self.session.get(SESSION_KEY)
+        if isinstance(data, dict) and data.get("v") == CART_VERSION:
+            return uuid.UUID(data["id"])
+        # older layouts: upgrade once, the session is saved with the new one
+        cart_id = self.session.pop(UNVERSIONED_ID_KEY, None)
+        cart_id = uuid.UUID(cart_id) if cart_id else None
+        if data:
+            cart_id = cart_id or uuid.uuid4()
+            _import_v1(cart_id, data)
+        if data is not None or cart_id is not None:
+            self._write_id(cart_id)
+        return cart_id
+
+    def _write_id(self, cart_id) -> None:
+        if cart_id is None:
+            self.session.pop(SESSION_KEY, None)
+        else:
+            self.session[SESSION_KEY] = {"v": CART_VERSION, "id": cart_id.hex}
+
+    @property
+    def id(self) -> Optional[uuid.UUID]:
+        return self._id
+
+    def _ensure_id(self) -> uuid.UUID:
+        if self._id is None:
+            self._id = uuid.uuid4()
+            self._write_id(self._id)
+        return self._id
+
+    def _lines(self):
+        return CartLine.objects.filter(cart_id=self._id)
+
+    # ---- reading ----
+
+    def _tags(self):
+        return [CATALOG_TAG, cart_tag(self._id)]
+
+    def _changed(self) -> None:
+        self._items = None
+        bump_tags(cart_tag(self._id))
+
+    def _load(self) -> List[CartItem]:
+        return [
+            CartItem(line.packaging, line.quantity)
+            for line in self._lines().select_related("packaging__product").order_by("pk")
+        ]
+
+    def items(self, fresh=False) -> List[CartItem]:
+        """
+        The lines in the order they were added (cached, else one query).
+        With a shared cache the priced lines are kept per cart id, not in the
+        session (see PRICED_CART_TIMEOUT in store/caching.py).
+        fresh=True re-reads lines and prices from the database – for the
+        order, the stock it takes and the amounts shown before it.
+        """
+        if fresh:
+            self._items = self._load() if self._id is not None else []
+        elif self._items is None:
+            if self._id is None:
+                self._items = []
+            elif not is_shared():
+                self._items = self._load()
+            else:
+                key, tags = priced_cart_key(self._id), self._tags()
+                items = tagged_get(key, tags)
+                if items is None:
+                    # versions first: a change while we query leaves the entry stale
+                    versions = tag_versions(tags)
+                    items = self._load()
+                    tagged_set(key, items, tags, PRICED_CART_TIMEOUT, versions=versions)
+                self._items = items
+        return self._items
+
+    def total(self) -> Decimal:
+        return sum((item.subtotal for item in self.items()), Decimal("0.00"))
+
+    def quantities(self) -> Dict[int, int]:
+        """{packaging_id: quantity}."""
+        return {item.packaging.pk: item.quantity for item in self.items()}
+
+    def is_empty(self) -> bool:
+        return not self.items()
+
+    # ---- changing ----
+
+    def add(self, packaging: PackagingOption, quantity: int) -> None:
+        """Add `quantity` of `packaging`: one UPDATE, or one INSERT for a new line."""
+        self._ensure_id()
+        line = self._lines().filter(packaging_id=packaging.pk)
+        if line.update(quantity=F("quantity") + quantity, updated_at=timezone.now()):
+            self._changed()
+            return
         try:
-            product_id, packaging_id = cart_key.split('_')
-            product = Product.objects.get(pk=product_id)
-            packaging = PackagingOption.objects.get(pk=packaging_id)
-            price = packaging.current_price  # Decimal
-            subtotal = price * int(qty)
-            items.append({
-                "product": product,
-                "packaging": packaging,
-                "quantity": int(qty),
-                "price": price,
-                "subtotal": subtotal,
-            })
-            total += subtotal
-        except (Product.DoesNotExist, PackagingOption.DoesNotExist, ValueError):
+            with transaction.atomic():
+                CartLine.objects.create(
+                    cart_id=self._id, product_id=packaging.product_id,
+                    packaging=packaging, quantity=quantity,
+                )
+        except IntegrityError:
+            # a concurrent click created the line first
+            line.update(quantity=F("quantity") + quantity, updated_at=timezone.now())
+        self._changed()
+
+    def change(self, packaging_id: int, delta: int) -> None:
+        """+1 / -1 on one line; a line that would drop to zero is removed."""
+        if self._id is None:
+            return
+        line = self._lines().filter(packaging_id=packaging_id)
+        if delta > 0:
+            line.update(quantity=F("quantity") + delta, updated_at=timezone.now())
+        elif not line.filter(quantity__gt=-delta).update(
+            quantity=F("quantity") + delta, updated_at=timezone.now()
+        ):
+            # conditional, so a concurrent increment is not deleted with it
+            line.filter(quantity__lte=-delta).delete()
+        self._changed()
+
+    def remove(self, product_id: int, packaging_id: Optional[int] = None) -> None:
+        """Remove one line, or every packaging of the product (one indexed DELETE)."""
+        if self._id is None:
+            return
+        lines = self._lines().filter(product_id=product_id)
+        if packaging_id is not None:
+            lines = lines.filter(packaging_id=packaging_id)
+        lines.delete()
+        self._changed()
+
+    def set_quantities(self, quantities: Dict[int, int]) -> None:
+        """
+        Apply {packaging_id: quantity} in one transaction (0 removes the line,
+        lines not mentioned stay). Every entry is checked first – the packaging
+        exists and has that much stock – and if any fails nothing is changed
+        and InvalidCartUpdate is raised.
+        """
+        packagings = PackagingOption.objects.in_bulk(list(quantities))
+        errors = {}
+        for pk, qty in quantities.items():
+            packaging = packagings.get(pk)
+            if packaging is None:
+                errors[pk] = "Несъществуващ грамаж."
+            elif qty < 0 or qty > MAX_QUANTITY:
+                errors[pk] = "Невалидно количество."
+            elif qty and packaging.stock is not None and qty > packaging.stock:
+                errors[pk] = f"Наличност: {packaging.stock} бр."
+        if errors:
+            raise InvalidCartUpdate(errors)
+        if not quantities:
+            return
+
+        self._ensure_id()
+        now = timezone.now()
+        with transaction.atomic():
+            lines = self._lines()
+            lines.filter(packaging_id__in=[pk for pk, qty in quantities.items() if not qty]).delete()
+            # one single-row UPDATE per changed line, one INSERT for the new ones
+            new = [
+                pk for pk, qty in quantities.items()
+                if qty and not lines.filter(packaging_id=pk).update(quantity=qty, updated_at=now)
+            ]
+            CartLine.objects.bulk_create(
+                [
+                    CartLine(cart_id=self._id, product_id=packagings[pk].product_id,
+                             packaging_id=pk, quantity=quantities[pk])
+                    for pk in new
+                ],
+                ignore_conflicts=True,  # a concurrent click added it meanwhile
+            )
+        self._changed()
+
+    def clear(self) -> None:
+        if self._id is not None:
+            self._lines().delete()
+            self._changed()
+        self._items = []
+
+    def replace(self, quantities: Dict[int, int]) -> None:
+        """Set the cart to {packaging_id: quantity} (benchmarks, tests)."""
+        self._ensure_id()
+        self._lines().delete()
+        products = dict(PackagingOption.objects.filter(pk__in=quantities).values_list("pk", "product_id"))
+        CartLine.objects.bulk_create([
+            CartLine(cart_id=self._id, product_id=products[pk], packaging_id=pk, quantity=qty)
+            for pk, qty in quantities.items() if pk in products
+        ])
+        self._changed()
+
+
+def _import_v1(cart_id, legacy) -> None:
+    """Move a v1 cart dict into CartLine; entries that do not parse or match are logged."""
+    lines, invalid = {}, []
+    for cart_key, qty in legacy.items() if isinstance(legacy, dict) else ():
+        try:
+            product_id, packaging_id = (int(part) for part in str(cart_key).split("_"))
+            qty = int(qty)
+        except (TypeError, ValueError):
+            invalid.append(cart_key)
             continue
-    return items, total
+        if qty > 0:
+            lines[(product_id, packaging_id)] = qty
+    valid = set(
+        PackagingOption.objects.filter(pk__in=[pk for _, pk in lines])
+        .values_list("product_id", "pk")
+    ) if lines else set()
+    invalid += [f"{p}_{pk}" for p, pk in lines if (p, pk) not in valid]
+    if invalid:
+        logger.warning("Dropped cart entries while upgrading cart %s: %s", cart_id, invalid)
+    CartLine.objects.bulk_create(
+        [
+            CartLine(cart_id=cart_id, product_id=product_id, packaging_id=packaging_id, quantity=qty)
+            for (product_id, packaging_id), qty in lines.items()
+            if (product_id, packaging_id) in valid
+        ],
+        ignore_conflicts=True,
+    )
+
 
+# Shortcuts for the views that only read
 
-def cart_is_empty(request) -> bool:
-    cart = get_session_cart(request)
-    return not any(True for _ in cart.items())
+def cart_items_and_total(request, fresh=False) -> Tuple[List[CartItem], Decimal]:
+    cart = Cart.of(request)
+    return cart.items(fresh), cart.total()
@@ -0,0 +1,106 @@
+# store/conditional.py
+"""
+Conditional GET: answer 304 Not Modified when the browser (or an htmx
+re-fetch) already has the current page.
+
+ETags are built from the database, not from per-process state: the
+newest `updated_at` and the row counts of products and packaging options
+(so deletions, which no timestamp can show, change it too). That is one
+aggregate query instead of a render; with a shared cache it is cached
+under the "catalog" tag, which every Product / PackagingOption change bumps.
+
+Pages that render the header cart add the cart to their ETag
+(`catalog_cart_etag`), so adding to the cart is never answered with a 304.
+"""
+import hashlib
+from functools import wraps
+
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.db.models import Count, Max
+from django.views.decorators.http import condition
+
+from .cachetags import is_shared, tagged_get_or_set
+from .caching import CATALOG_TAG
+from .cart_utils import Cart
+from .models import Product
+
+CATALOG_LAST_MODIFIED_TIMEOUT = 60 * 60 * 24
+
+
+def make_etag(*parts):
+    return hashlib.md5("|".join(map(str, parts)).encode()).hexdigest()
+
+
+def _catalog_state():
+    state = Product.objects.aggregate(
+        product=Max("updated_at"), packaging=Max("packaging_options__updated_at"),
+        products=Count("pk", distinct=True), packagings=Count("packaging_options", distinct=True),
+    )
+    newest = max(filter(None, (state["product"], state["packaging"])), default=None)
+    return newest, state["products"], state["packagings"]
+
+
+def catalog_last_modified(request=None):
+    """
+    (newest updated_at, product count, packaging count) of the catalog.
+    Kept on `request`, as the ETag and Last-Modified functions both ask.
+    """
+    state = getattr(request, "_catalog_state", None)
+    if state is None:
+        if is_shared():
+            state = tagged_get_or_set(
+                "store:catalog_state", _catalog_state, [CATALOG_TAG], CATALOG_LAST_MODIFIED_TIMEOUT,
+            )
+        else:
+            state = _catalog_state()
+        if request is not None:
+            request._catalog_state = state
+    return state
+
+
+def conditional_page(etag_func, last_modified_func=None, only_if=None):
+    """
+    Like django.views.decorators.http.condition, but skipped
+
+    - for anything but GET/HEAD,
+    - while a flash message is waiting (the page would be the cached copy
+      without it; add_to_cart redirects back to the product page),
+    - when `only_if(request)` is false (e.g. only for htmx partials).
+
+    `etag_func(request, *args, **kwargs)` returns the parts to hash (or
+    None for no ETag).
+    """
+    def etag(request, *args, **kwargs):
+        parts = etag_func(request, *args, **kwargs)
+        return None if parts is None else make_etag(*parts)
+
+    def decorator(view):
+        conditional_view = condition(etag_func=etag, last_modified_func=last_modified_func)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if (
+                request.method not in ("GET", "HEAD")
+                or CookieStorage.cookie_name in request.COOKIES
+                or (only_if is not None and not only_if(request))
+            ):
+                return view(request, *args, **kwargs)
+            return conditional_view(request, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def catalog_etag(request, *args, **kwargs):
+    return (*catalog_last_modified(request), request.get_full_path())
+
+
+def catalog_cart_etag(request, *args, **kwargs):
+    """catalog_etag plus the visitor's cart lines, for pages with the header cart."""
+    cart = Cart.of(request)
+    return (*catalog_etag(request), cart.id, sorted(cart.quantities().items()))
+
+
+def catalog_modified(request, *args, **kwargs):
+    return catalog_last_modified(request)[0]
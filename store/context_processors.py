@@ -1,30 +1,19 @@
-from store.models import Product, PackagingOption
+from functools import lru_cache
+
+from store.cart_utils import cart_items_and_total
 
-def cart_items_context(request):
-    cart = request.session.get('cart', {})
-    cart_items = []
-    total = 0
 
-    for cart_key, qty in cart.items():
-        try:
-            product_id, packaging_id = cart_key.split('_')
-            product = Product.objects.get(pk=product_id)
-            packaging = PackagingOption.objects.get(pk=packaging_id)
-            # Use packaging's current_price property for price
-            price = packaging.current_price
-            line_total = price * qty
-            total += line_total
-            cart_items.append({
-                'product': product,
-                'packaging': packaging,
-                'quantity': qty,
-                'line_total': line_total,
-                'price': price
-            })
-        except (Product.DoesNotExist, PackagingOption.DoesNotExist, ValueError):
-            continue
+def cart_items_context(request):
+    """
+    `cart_items` / `cart_total` for every template. Lazy: the template engine
+    calls them only when a template actually uses them, so pages that do not
+    show the cart never load the session or query the cart products.
+    """
+    @lru_cache(maxsize=None)
+    def cart():
+        return cart_items_and_total(request)
 
     return {
-        'cart_items': cart_items,
-        'cart_total': total
+        'cart_items': lambda: cart()[0],
+        'cart_total': lambda: cart()[1],
     }
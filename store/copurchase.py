@@ -0,0 +1,115 @@
+# store/copurchase.py
+"""
+"Купувано заедно с" – item-to-item recommendations from order history.
+
+Two products score one point for every counted order that contains both.
+The pair counting is a single self-join of OrderItem on the order
+(GROUP BY product, neighbour), so the database does the heavy lifting and
+nothing is done per order in Python.
+
+Only the best COPURCHASE_TOP_K neighbours of each product are kept in
+CoPurchase, so serving is one indexed lookup on (product, -score).
+
+Counted orders are paid card orders and cash-on-delivery orders that did
+not fail. `update_copurchases()` folds in only the orders that are not
+counted yet (Order.copurchase_counted) and is cheap enough for cron;
+`rebuild_copurchases()` recounts everything. Because the incremental path
+works on the trimmed table, a pair that was cut off below the top K starts
+again from zero – an occasional rebuild restores exact counts.
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+
+from .models import CoPurchase, Order, OrderItem
+
+
+def top_k():
+    return getattr(settings, "COPURCHASE_TOP_K", 12)
+
+
+def countable_orders():
+    return Order.objects.filter(
+        Q(payment_status="paid") | Q(payment_method="cash")
+    ).exclude(payment_status="failed")
+
+
+def count_pairs(orders):
+    """{(product_id, neighbour_id): number of `orders` containing both}."""
+    rows = (
+        OrderItem.objects.filter(order__in=orders)
+        .annotate(neighbour_id=F("order__order_items__product_id"))
+        .exclude(neighbour_id=F("product_id"))
+        .values("product_id", "neighbour_id")
+        .annotate(score=Count("order_id", distinct=True))
+        .order_by()
+    )
+    return {(r["product_id"], r["neighbour_id"]): r["score"] for r in rows}
+
+
+def _store(pairs, product_ids):
+    """Replace the neighbours of `product_ids` with the top K of `pairs`."""
+    by_product = defaultdict(list)
+    for (product_id, neighbour_id), score in pairs.items():
+        by_product[product_id].append((score, neighbour_id))
+
+    rows = []
+    for product_id, neighbours in by_product.items():
+        neighbours.sort(key=lambda n: (-n[0], n[1]))
+        rows.extend(
+            CoPurchase(product_id=product_id, neighbour_id=neighbour_id, score=score)
+            for score, neighbour_id in neighbours[:top_k()]
+        )
+    CoPurchase.objects.filter(product_id__in=product_ids).delete()
+    CoPurchase.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def rebuild_copurchases():
+    """Recount the whole order history. Returns the number of stored pairs."""
+    with transaction.atomic():
+        countable_orders().filter(copurchase_counted=False).update(copurchase_counted=True)
+        pairs = count_pairs(countable_orders().filter(copurchase_counted=True))
+        CoPurchase.objects.all().delete()
+        return _store(pairs, [])
+
+
+def update_copurchases():
+    """
+    Add the orders counted since the last run. Returns the number of orders
+    folded in.
+    """
+    with transaction.atomic():
+        new_orders = list(
+            countable_orders().select_for_update(skip_locked=True)
+            .filter(copurchase_counted=False).values_list("pk", flat=True)
+        )
+        if not new_orders:
+            return 0
+        pairs = count_pairs(new_orders)
+        touched = {product_id for product_id, _ in pairs}
+        for row in CoPurchase.objects.filter(product_id__in=touched):
+            key = (row.product_id, row.neighbour_id)
+            pairs[key] = pairs.get(key, 0) + row.score
+        _store(pairs, touched)
+        Order.objects.filter(pk__in=new_orders).update(copurchase_counted=True)
+    return len(new_orders)
+
+
+def bought_with(product_ids, k, exclude=()):
+    """
+    Ids of up to `k` products most often bought together with any of
+    `product_ids` (scores summed across them), best first.
+    """
+    if not product_ids:
+        return []
+    rows = (
+        CoPurchase.objects.filter(product_id__in=product_ids)
+        .exclude(neighbour_id__in=set(exclude) | set(product_ids))
+        .values("neighbour_id")
+        .annotate(total=Sum("score"))
+        .order_by("-total", "neighbour_id")[:k]
+    )
+    return [r["neighbour_id"] for r in rows]
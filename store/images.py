@@ -0,0 +1,151 @@
+# store/images.py
+"""
+Responsive image derivatives.
+
+For every uploaded image we keep the original and write resized WebP (and,
+when enabled, AVIF) copies next to it:
+
+    store/products/variants/sirene.3f9a1c0b7d2e.640w.webp
+
+The hash is taken from the original's bytes, so re-running the generator is
+idempotent and a replaced upload never reuses a stale cached URL.
+The list of generated files is stored on the model in a JSONField
+("manifest") so templates can emit srcset without touching the storage:
+
+    {"v": 2, "src": "<original name>", "hash": "3f9a1c0b7d2e",
+     "width": 1600, "height": 1200, "color": "#c8b428",
+     "lqip": "data:image/webp;base64,...",
+     "webp": [[320, "<name>"], [640, "<name>"], ...], "avif": [...]}
+
+width/height are the intrinsic size (for the <img> attributes, so the grid
+does not jump while loading), color is the dominant colour and lqip a tiny
+blurred preview inlined as the image background until the real one loads.
+Both are left out for images with transparency.
+"""
+import base64
+import hashlib
+import io
+import logging
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageFilter, ImageOps, features
+
+from .cachetags import invalidate_instance
+
+logger = logging.getLogger(__name__)
+
+# bump when the manifest layout changes so old rows are rebuilt
+MANIFEST_VERSION = 2
+
+DEFAULT_WIDTHS = (320, 640, 960, 1280)
+QUALITY = {"webp": 80, "avif": 55}
+LQIP_WIDTH = 16
+
+
+def variant_widths():
+    return tuple(getattr(settings, "IMAGE_VARIANT_WIDTHS", DEFAULT_WIDTHS))
+
+
+def variant_formats():
+    formats = ["webp"]
+    if getattr(settings, "IMAGE_VARIANT_AVIF", False) and features.check("avif"):
+        formats.insert(0, "avif")  # best first: <source> order matters
+    return formats
+
+
+def variant_name(original_name, digest, width, fmt):
+    folder, filename = os.path.split(original_name)
+    stem = os.path.splitext(filename)[0]
+    return f"{folder}/variants/{stem}.{digest}.{width}w.{fmt}"
+
+
+def placeholder(image):
+    """
+    Dominant colour ("#rrggbb") and a ~16px blurred WebP as a data: URI
+    (a few hundred bytes) for `image`.
+    """
+    small = image.convert("RGB")
+    small.thumbnail((64, 64))
+    palette = small.quantize(colors=5)
+    count, index = max(palette.getcolors())
+    r, g, b = palette.getpalette()[index * 3:index * 3 + 3]
+
+    height = max(1, round(image.height * LQIP_WIDTH / image.width))
+    tiny = small.resize((LQIP_WIDTH, height), Image.BILINEAR).filter(ImageFilter.GaussianBlur(1))
+    buf = io.BytesIO()
+    tiny.save(buf, format="WEBP", quality=40)
+    lqip = "data:image/webp;base64," + base64.b64encode(buf.getvalue()).decode("ascii")
+    return f"#{r:02x}{g:02x}{b:02x}", lqip
+
+
+def build_variants(fieldfile):
+    """
+    Write the derivatives for `fieldfile` (skipping files that already exist)
+    and return the manifest. Never upscales: widths above the original are
+    dropped, and an image narrower than the smallest width gets one variant
+    at its own width.
+    """
+    storage = fieldfile.storage
+    with storage.open(fieldfile.name, "rb") as fh:
+        raw = fh.read()
+    digest = hashlib.sha256(raw).hexdigest()[:12]
+
+    image = ImageOps.exif_transpose(Image.open(io.BytesIO(raw)))
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if image.has_transparency_data else "RGB")
+
+    widths = [w for w in variant_widths() if w < image.width] or [image.width]
+    if image.width not in widths and image.width < max(variant_widths()):
+        widths.append(image.width)
+
+    manifest = {
+        "v": MANIFEST_VERSION, "src": fieldfile.name, "hash": digest,
+        "width": image.width, "height": image.height,
+    }
+    if image.mode != "RGBA":
+        manifest["color"], manifest["lqip"] = placeholder(image)
+    for fmt in variant_formats():
+        manifest[fmt] = []
+        for width in sorted(widths):
+            name = variant_name(fieldfile.name, digest, width, fmt)
+            if not storage.exists(name):
+                height = round(image.height * width / image.width)
+                resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+                buf = io.BytesIO()
+                resized.save(buf, format=fmt.upper(), quality=QUALITY[fmt])
+                name = storage.save(name, ContentFile(buf.getvalue()))
+            manifest[fmt].append([width, name])
+    return manifest
+
+
+def refresh_variants(instance, field_name, manifest_field, force=False):
+    """
+    Regenerate `instance.<manifest_field>` when the image changed or the
+    manifest predates MANIFEST_VERSION (or always with force=True). Saves
+    through a queryset update so post_save receivers are not triggered again;
+    the cache tags of the instance are bumped instead, so cached pages drop
+    the old <img> markup. Returns True when the manifest was rewritten.
+    """
+    fieldfile = getattr(instance, field_name)
+    manifest = getattr(instance, manifest_field) or {}
+
+    if not fieldfile:
+        new_manifest = {}
+    elif not force and manifest.get("src") == fieldfile.name and manifest.get("v") == MANIFEST_VERSION:
+        return False
+    else:
+        try:
+            new_manifest = build_variants(fieldfile)
+        except (OSError, ValueError, Image.DecompressionBombError) as exc:
+            logger.warning("Image variants failed for %s #%s (%s): %s",
+                           type(instance).__name__, instance.pk, fieldfile.name, exc)
+            return False
+
+    if new_manifest == manifest:
+        return False
+    type(instance).objects.filter(pk=instance.pk).update(**{manifest_field: new_manifest})
+    setattr(instance, manifest_field, new_manifest)
+    invalidate_instance(instance)
+    return True
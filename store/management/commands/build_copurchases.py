@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from store.copurchase import rebuild_copurchases, update_copurchases
+
+
+class Command(BaseCommand):
+    help = (
+        "Update the \"bought together\" table from orders that are not counted yet. "
+        "Meant to run from cron (e.g. hourly); use --rebuild now and then to recount "
+        "the whole order history."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rebuild", action="store_true",
+            help="Recount all orders instead of only the new ones.",
+        )
+
+    def handle(self, *args, **options):
+        if options["rebuild"]:
+            stored = rebuild_copurchases()
+            self.stdout.write(f"Rebuilt co-purchase table: {stored} pair(s).")
+        else:
+            counted = update_copurchases()
+            self.stdout.write(f"Counted {counted} new order(s).")
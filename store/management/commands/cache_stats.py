@@ -0,0 +1,32 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from store.cachetags import cache_stats, reset_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Print cache hit / miss / stale counters per key prefix (all workers), "
+        "plus the evictions reported by Redis or Memcached."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--json", action="store_true", help="One JSON object, for monitoring.")
+        parser.add_argument("--reset", action="store_true", help="Zero the counters afterwards.")
+
+    def handle(self, *args, **options):
+        stats = cache_stats()
+        if options["json"]:
+            self.stdout.write(json.dumps(stats))
+        else:
+            self.stdout.write(f"{'prefix':<32}{'hit':>8}{'miss':>8}{'stale':>8}{'set':>8}{'ratio':>8}")
+            for name, row in stats["entries"].items():
+                ratio = "-" if row["hit_ratio"] is None else f"{row['hit_ratio']:.1%}"
+                self.stdout.write(
+                    f"{name:<32}{row['hit']:>8}{row['miss']:>8}{row['stale']:>8}{row['set']:>8}{ratio:>8}"
+                )
+            evictions = "n/a" if stats["evictions"] is None else stats["evictions"]
+            self.stdout.write(f"Evictions (cache server): {evictions}")
+        if options["reset"]:
+            reset_stats()
@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from store.sessions import clear_abandoned_carts, clear_expired_sessions
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete expired session rows and abandoned cart lines in small batches (unlike "
+        "clearsessions, which deletes them all in one statement). Meant to run from "
+        "cron, e.g. hourly."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="Rows per DELETE.")
+        parser.add_argument(
+            "--max-seconds", type=float, default=60,
+            help="Stop after this long; the next run continues.",
+        )
+
+    def handle(self, *args, **options):
+        if settings.SESSION_ENGINE.endswith("signed_cookies"):
+            self.stdout.write("Signed-cookie sessions keep no rows.")
+        else:
+            deleted = clear_expired_sessions(options["batch_size"], options["max_seconds"])
+            self.stdout.write(f"Deleted {deleted} expired session(s).")
+        deleted = clear_abandoned_carts(options["batch_size"], options["max_seconds"])
+        self.stdout.write(f"Deleted {deleted} abandoned cart line(s).")
@@ -0,0 +1,304 @@
+import random
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, time as dt_time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from sakarela.models import (
+    Product as SakarelaProduct,
+    Nutrition as SakarelaNutrition,
+    ProductCard,
+    Recipe,
+    RecipeIngredient,
+    RecipeStep,
+)
+from store.models import (
+    Brand,
+    CartLine,
+    Category,
+    CoPurchase,
+    Nutrition,
+    Order,
+    OrderItem,
+    PackagingOption,
+    Product,
+    SalesDay,
+    StockReservation,
+    Store,
+)
+
+# Row counts for --scale 1 (≈25k rows). --scale 40 gives ≈1M rows.
+BASE_COUNTS = {
+    "categories": 10,
+    "brands": 10,
+    "products": 1000,
+    "stores": 20,
+    "orders": 2000,
+}
+PACKAGING_WEIGHTS = (0.25, 0.5, 1.0, 2.5)  # kg, as entered in admin
+MARKETING_SHARE = 0.5  # fraction of store products with a sakarela product
+RECIPES_PER_PRODUCT = (1, 3)
+INGREDIENTS_PER_RECIPE = (3, 7)
+STEPS_PER_RECIPE = (2, 5)
+ITEMS_PER_ORDER = (1, 6)
+# orders are spread over the year before this date (not before "now", so the
+# same seed gives the same rows on any day)
+BASE_DATE = date(2025, 1, 1)
+
+WORDS = (
+    "кашкавал", "сирене", "краве", "овче", "козе", "мляко", "йогурт", "масло",
+    "извара", "зрял", "пушен", "класик", "традиция", "балкан", "сакар", "ямбол",
+    "домашен", "био", "селски", "планински",
+)
+BADGES = ("ОВЧЕ МЛЯКО", "БДС", "КОЗЕ МЛЯКО", "КРАВЕ МЛЯКО", "С ПОДПРАВКИ", "")
+CITIES = (("Ямбол", "8600"), ("Бургас", "8000"), ("София", "1000"), ("Пловдив", "4000"), ("Варна", "9000"))
+PRODUCT_IMAGE = "dummy_data_images/image_3.jpg"
+BADGE_IMAGE = "dummy_data_images/image_4.png"
+
+
+@contextmanager
+def _without_auto_now_add(model, field_name):
+    """Let bulk_create() keep explicit values for an auto_now_add field."""
+    field = model._meta.get_field(field_name)
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a deterministic synthetic dataset (catalog, marketing products, "
+        "recipes, stores, orders) with bulk_create. Replaces populate_db.py."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scale", type=float, default=1.0,
+                            help="Multiplier for the base row counts (1 ≈ 25k rows, 40 ≈ 1M rows).")
+        parser.add_argument("--seed", type=int, default=42,
+                            help="Random seed; the same seed and scale produce the same data.")
+        parser.add_argument("--batch-size", type=int, default=2000,
+                            help="Rows per INSERT / per generated chunk.")
+        parser.add_argument("--clear", action="store_true",
+                            help="Delete existing catalog, recipe, store, order and cart rows first.")
+        parser.add_argument("--base-date", type=date.fromisoformat, default=BASE_DATE,
+                            help="Orders are dated within the year before this day (YYYY-MM-DD).")
+
+    def handle(self, *args, **options):
+        scale = options["scale"]
+        if scale <= 0:
+            raise CommandError("--scale must be positive")
+        self.rng = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        self.counts = {k: max(1, int(v * scale)) for k, v in BASE_COUNTS.items()}
+        self.created = {}
+        self.base_time = datetime.combine(options["base_date"], dt_time(), tzinfo=dt_timezone.utc)
+
+        started = time.perf_counter()
+        if options["clear"]:
+            self._clear()
+
+        # names are unique: number them after the rows of an earlier run
+        first = Category.objects.count()
+        categories = self._bulk(Category, [
+            Category(name=f"{self._words(1).capitalize()} {i}")
+            for i in range(first, first + self.counts["categories"])
+        ])
+        first = Brand.objects.count()
+        brands = self._bulk(Brand, [
+            Brand(name=f"{self._words(1).capitalize()} {i}")
+            for i in range(first, first + self.counts["brands"])
+        ])
+        first = Store.objects.count()
+        self._bulk(Store, [self._store(i) for i in range(first, first + self.counts["stores"])])
+
+        packaging_pool = []
+        for chunk_start in range(0, self.counts["products"], self.batch_size):
+            chunk_size = min(self.batch_size, self.counts["products"] - chunk_start)
+            with transaction.atomic():
+                packaging_pool.extend(self._product_chunk(chunk_size, categories, brands))
+            self.stdout.write(f"  products: {chunk_start + chunk_size}/{self.counts['products']}")
+
+        for chunk_start in range(0, self.counts["orders"], self.batch_size):
+            chunk_size = min(self.batch_size, self.counts["orders"] - chunk_start)
+            with transaction.atomic():
+                self._order_chunk(chunk_size, packaging_pool)
+            self.stdout.write(f"  orders: {chunk_start + chunk_size}/{self.counts['orders']}")
+
+        # bulk_create skips the signals that keep the marketing read model in sync
+        ProductCard.rebuild()
+
+        elapsed = time.perf_counter() - started
+        total = sum(self.created.values())
+        for name, n in self.created.items():
+            self.stdout.write(f"{name:>20}: {n}")
+        self.stdout.write(self.style.SUCCESS(f"Created {total} rows in {elapsed:.1f}s"))
+
+    # ---- helpers ----
+
+    def _bulk(self, model, objs):
+        created = model.objects.bulk_create(objs, batch_size=self.batch_size)
+        name = model._meta.label
+        self.created[name] = self.created.get(name, 0) + len(created)
+        return created
+
+    def _words(self, n):
+        return " ".join(self.rng.choice(WORDS) for _ in range(n))
+
+    def _money(self, low, high):
+        return Decimal(self.rng.randint(int(low * 100), int(high * 100))) / 100
+
+    def _clear(self):
+        self.stdout.write("Deleting existing data...")
+        for model in (StockReservation, CartLine, SalesDay, CoPurchase, OrderItem, Order,
+                      RecipeStep, RecipeIngredient, Recipe, ProductCard, SakarelaNutrition,
+                      SakarelaProduct, PackagingOption, Nutrition, Product, Brand, Category, Store):
+            model.objects.all().delete()
+
+    def _store(self, i):
+        city, _ = self.rng.choice(CITIES)
+        return Store(
+            name=f"Магазин {self._words(1)} {i}",
+            city=city,
+            address=f"ул. {self._words(1).capitalize()} {self.rng.randint(1, 120)}",
+            working_hours="Пн-Нд: 8:00 - 21:00",
+            map_x_pct=self._money(5, 95),
+            map_y_pct=self._money(5, 95),
+        )
+
+    def _nutrition_fields(self):
+        kcal = self.rng.randint(60, 420)
+        return dict(
+            energy=f"{kcal}kcal / {int(kcal * 4.184)}kJ",
+            fat=self._money(0.1, 35),
+            saturated_fat=self._money(0.1, 20),
+            carbohydrates=self._money(0.1, 10),
+            sugars=self._money(0.1, 6),
+            protein=self._money(1, 30),
+            salt=self._money(0.1, 4),
+        )
+
+    def _product_chunk(self, size, categories, brands):
+        """Create `size` store products with everything hanging off them."""
+        products = self._bulk(Product, [
+            Product(
+                name=self._words(2).capitalize(),
+                image=PRODUCT_IMAGE,
+                price=self._money(4, 60),
+                description=self._words(30),
+                ingredients=self._words(5),
+                storage="При температура 0-4°C",
+                category=self.rng.choice(categories),
+                brand=self.rng.choice(brands),
+                badge=self.rng.choice(BADGES),
+            )
+            for _ in range(size)
+        ])
+
+        self._bulk(Nutrition, [Nutrition(product=p, **self._nutrition_fields()) for p in products])
+
+        packagings = []
+        for product in products:
+            n_options = self.rng.randint(1, len(PACKAGING_WEIGHTS))
+            for weight in PACKAGING_WEIGHTS[:n_options]:
+                price = self._money(3, 25) * Decimal(str(weight)) * 2
+                on_sale = self.rng.random() < 0.2
+                packagings.append(PackagingOption(
+                    product=product,
+                    weight=weight,
+                    price=price.quantize(Decimal("0.01")),
+                    sale_price=(price * Decimal("0.85")).quantize(Decimal("0.01")) if on_sale else None,
+                    is_on_sale=on_sale,
+                ))
+        packagings = self._bulk(PackagingOption, packagings)
+
+        marketing = self._bulk(SakarelaProduct, [
+            SakarelaProduct(
+                title=p.name,
+                description=self._words(40),
+                image=PRODUCT_IMAGE,
+                badge=BADGE_IMAGE,
+                type=self.rng.choice(SakarelaProduct.PRODUCT_TYPES)[0],
+                ingredients=p.ingredients,
+                storage=p.storage,
+                store_product=p,
+            )
+            for p in products if self.rng.random() < MARKETING_SHARE
+        ])
+        self._bulk(SakarelaNutrition, [
+            SakarelaNutrition(product=m, **self._nutrition_fields()) for m in marketing
+        ])
+
+        recipes = self._bulk(Recipe, [
+            Recipe(
+                product=m,
+                title=f"{self._words(3).capitalize()}",
+                image=PRODUCT_IMAGE,
+                short_description=self._words(20),
+                cook_time=self.rng.randint(10, 120),
+                servings=self.rng.randint(1, 8),
+                appliance=self.rng.choice(("Фурна", "Тиган", "Тенджера", "Без уред")),
+            )
+            for m in marketing
+            for _ in range(self.rng.randint(*RECIPES_PER_PRODUCT))
+        ])
+        self._bulk(RecipeIngredient, [
+            RecipeIngredient(recipe=r, product=self._words(1), amount=f"{self.rng.randint(1, 500)} г", order=i)
+            for r in recipes
+            for i in range(1, self.rng.randint(*INGREDIENTS_PER_RECIPE) + 1)
+        ])
+        self._bulk(RecipeStep, [
+            RecipeStep(recipe=r, step_name=f"Стъпка {i}", step_content=self._words(25), order=i)
+            for r in recipes
+            for i in range(1, self.rng.randint(*STEPS_PER_RECIPE) + 1)
+        ])
+        return packagings
+
+    def _order_chunk(self, size, packaging_pool):
+        """Create `size` orders with items; totals are computed here because
+        bulk_create() does not fire the OrderItem post_save signal."""
+        orders, lines = [], []
+        for _ in range(size):
+            city, post_code = self.rng.choice(CITIES)
+            picked = self.rng.sample(packaging_pool, min(len(packaging_pool), self.rng.randint(*ITEMS_PER_ORDER)))
+            order_lines = [(p, self.rng.randint(1, 4)) for p in picked]
+            total = sum((p.current_price * qty for p, qty in order_lines), Decimal("0.00"))
+            weight = sum((Decimal(str(p.weight)) * qty for p, qty in order_lines), Decimal("0.000"))
+            created_at = self.base_time - timedelta(minutes=self.rng.randint(0, 365 * 24 * 60))
+            orders.append(Order(
+                full_name=self._words(1).capitalize(),
+                last_name=self._words(1).capitalize(),
+                email=f"customer{self.rng.randint(1, 10 ** 6)}@example.com",
+                phone=f"08{self.rng.randint(10 ** 7, 10 ** 8 - 1)}",
+                country="България",
+                state=city,
+                city=city,
+                address1=f"ул. {self._words(1).capitalize()} {self.rng.randint(1, 120)}",
+                post_code=post_code,
+                payment_method=self.rng.choice(("card", "cash")),
+                payment_status=self.rng.choices(("paid", "pending", "failed"), weights=(8, 1, 1))[0],
+                total=total,
+                total_weight_kg=weight.quantize(Decimal("0.001")),
+                shipping_cost=self._money(5, 12),
+                created_at=created_at,
+            ))
+            lines.append(order_lines)
+
+        with _without_auto_now_add(Order, "created_at"):
+            orders = self._bulk(Order, orders)
+
+        self._bulk(OrderItem, [
+            OrderItem(
+                order=order,
+                product_id=packaging.product_id,
+                quantity=qty,
+                price=packaging.current_price,
+                unit_weight_g=Decimal(str(packaging.weight)),
+            )
+            for order, order_lines in zip(orders, lines)
+            for packaging, qty in order_lines
+        ])
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+
+from sakarela.models import Product as SakarelaProduct, ProductCard, Recipe
+from store.images import refresh_variants, variant_formats, variant_widths
+from store.models import Product, Store
+
+# (label, model, image field, manifest field)
+TARGETS = (
+    ("store.product", Product, "image", "image_variants"),
+    ("sakarela.product", SakarelaProduct, "image", "image_variants"),
+    ("sakarela.recipe", Recipe, "image", "image_variants"),
+    ("store.store", Store, "logo", "logo_variants"),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Backfill responsive WebP/AVIF variants for existing product, recipe "
+        "and store images. Images whose variants are already current are skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--force", action="store_true",
+                            help="Rebuild manifests even when they look current.")
+        parser.add_argument("--only", choices=[t[0] for t in TARGETS],
+                            help="Process a single model.")
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"Widths {', '.join(map(str, variant_widths()))}; formats {', '.join(variant_formats())}"
+        )
+        for label, model, field, manifest_field in TARGETS:
+            if options["only"] and options["only"] != label:
+                continue
+            updated = skipped = 0
+            qs = model.objects.exclude(**{field: ""}).only("pk", field, manifest_field)
+            for obj in qs.iterator(chunk_size=200):
+                if refresh_variants(obj, field, manifest_field, force=options["force"]):
+                    updated += 1
+                else:
+                    skipped += 1
+            self.stdout.write(f"{label}: {updated} updated, {skipped} unchanged/failed")
+            if label == "sakarela.product" and updated:
+                # manifests were written with queryset updates; copy them to the cards
+                ProductCard.rebuild()
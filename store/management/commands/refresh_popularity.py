@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from store.popularity import refresh_popularity
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the 7/30/365-day sales counters from the daily buckets and drop "
+        "buckets older than a year. Meant to run from cron once a day, after midnight."
+    )
+
+    def handle(self, *args, **options):
+        changed = refresh_popularity()
+        self.stdout.write(f"Updated sales counters for {changed} product(s).")
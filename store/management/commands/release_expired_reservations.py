@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from store.stock import release_expired_reservations
+
+
+class Command(BaseCommand):
+    help = (
+        "Return stock held by card orders whose myPOS payment never completed. "
+        "Meant to run from cron every few minutes."
+    )
+
+    def handle(self, *args, **options):
+        released = release_expired_reservations()
+        self.stdout.write(f"Released {released} expired reservation(s).")
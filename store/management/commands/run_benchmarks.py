@@ -0,0 +1,94 @@
+import json
+import platform
+import subprocess
+from datetime import datetime, timezone
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from store.benchmarks import build_cases, run_case
+from store.models import Order, PackagingOption, Product
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, cwd=settings.BASE_DIR, check=True,
+        ).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+class Command(BaseCommand):
+    help = (
+        "Time store_home, cart_items_and_total, order_info POST, "
+        "sign_params_in_post_order, econt_city_suggestions and a cart write per "
+        "session backend against the "
+        "current database and save the results as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=20, help="Timed runs per case.")
+        parser.add_argument("--warmup", type=int, default=2, help="Untimed runs per case.")
+        parser.add_argument("--only", default="", help="Build and run only cases whose name contains this text.")
+        parser.add_argument("--output", default="", help="JSON file to write (default: bench-<commit>.json).")
+        parser.add_argument("--compare", default="", help="Earlier results JSON to compare medians against.")
+
+    def handle(self, *args, **options):
+        if not PackagingOption.objects.exists():
+            self.stderr.write("No catalog data - run `manage.py generate_dataset` first.")
+            return
+
+        commit = _git_commit()
+        meta = {
+            "commit": commit,
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "db_vendor": connection.vendor,
+            "products": Product.objects.count(),
+            "packaging_options": PackagingOption.objects.count(),
+            "orders": Order.objects.count(),
+            "repeat": options["repeat"],
+        }
+
+        results = []
+        for name, params, setup in build_cases():
+            if options["only"] and options["only"] not in name:
+                continue
+            extra, stats = run_case(setup, options["repeat"], options["warmup"])
+            params = {**params, **extra}
+            results.append({"name": name, "params": params, **stats})
+            self.stdout.write(
+                f"{name:<28} {json.dumps(params, ensure_ascii=False):<34} "
+                f"median {stats['median_ms']:>9.2f} ms  p95 {stats['p95_ms']:>9.2f} ms  "
+                f"queries {stats['queries']}"
+            )
+
+        output = Path(options["output"] or f"bench-{commit}.json")
+        output.write_text(json.dumps({"meta": meta, "results": results}, ensure_ascii=False, indent=2))
+        self.stdout.write(self.style.SUCCESS(f"Saved {len(results)} results to {output}"))
+
+        if options["compare"]:
+            self._compare(Path(options["compare"]), results)
+
+    def _compare(self, path, results):
+        baseline = json.loads(path.read_text())
+        key = lambda r: (r["name"], json.dumps(r["params"], sort_keys=True))
+        before = {key(r): r for r in baseline["results"]}
+
+        self.stdout.write(f"\nCompared with {path} (commit {baseline['meta'].get('commit')}):")
+        for r in results:
+            old = before.get(key(r))
+            if not old or not old["median_ms"]:
+                continue
+            change = (r["median_ms"] - old["median_ms"]) / old["median_ms"] * 100
+            self.stdout.write(
+                f"{r['name']:<28} {json.dumps(r['params'], ensure_ascii=False):<34} "
+                f"{old['median_ms']:>9.2f} -> {r['median_ms']:>9.2f} ms ({change:+.1f}%)  "
+                f"queries {old['queries']} -> {r['queries']}"
+            )
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from store.cachetags import is_shared
+from store.warmup import warm_caches
+
+
+class Command(BaseCommand):
+    help = (
+        "Load the Econt city list, compile the templates and request the top catalog, "
+        "product and marketing pages so the shared cache is warm. Run after each deploy. "
+        "Does nothing with a per-process cache (locmem): this process is not a worker, "
+        "so warm the gunicorn master instead with --preload (deploy/gunicorn.conf.py)."
+    )
+
+    def handle(self, *args, **options):
+        if not is_shared():
+            self.stdout.write("Per-process cache: nothing to warm from here (use gunicorn --preload).")
+            return
+        warm_caches(log=self.stdout.write)
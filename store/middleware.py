@@ -0,0 +1,90 @@
+# store/middleware.py
+import json
+import logging
+import random
+import time
+
+from django.conf import settings
+from django.db import connection
+
+from .timing import RequestTimings, activate, deactivate, install_template_timer
+
+perflog = logging.getLogger("perf")
+
+
+class ServerTimingMiddleware:
+    """
+    Per-request instrumentation:
+      - SQL query count + time (connection.execute_wrapper)
+      - template render time ("tpl")
+      - outbound integrations wrapped with store.timing.timed()
+        ("econt", "mypos", "email")
+
+    Sampled requests get a `Server-Timing` header. Any request slower than
+    SLOW_REQUEST_THRESHOLD_MS is logged to the "perf" logger as one JSON line
+    (with the breakdown when the request was sampled).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, "SERVER_TIMING_ENABLED", True)
+        self.sample_rate = float(getattr(settings, "SERVER_TIMING_SAMPLE_RATE", 1.0))
+        self.slow_ms = float(getattr(settings, "SLOW_REQUEST_THRESHOLD_MS", 1000))
+        if self.enabled:
+            install_template_timer()
+
+    def _sampled(self) -> bool:
+        if self.sample_rate >= 1:
+            return True
+        return random.random() < self.sample_rate
+
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+
+        start = time.perf_counter()
+        timings = RequestTimings() if self._sampled() else None
+
+        if timings is None:
+            response = self.get_response(request)
+        else:
+            token = activate(timings)
+            try:
+                with connection.execute_wrapper(timings.sql_wrapper):
+                    response = self.get_response(request)
+            finally:
+                deactivate(token)
+
+        total_ms = (time.perf_counter() - start) * 1000
+
+        if timings is not None:
+            response["Server-Timing"] = self._header(timings, total_ms)
+
+        if total_ms >= self.slow_ms:
+            self._log_slow(request, response, timings, total_ms)
+
+        return response
+
+    @staticmethod
+    def _header(timings: RequestTimings, total_ms: float) -> str:
+        parts = [f'db;dur={timings.sql_ms:.1f};desc="{timings.sql_count} queries"']
+        for name, ms in timings.spans.items():
+            parts.append(f"{name};dur={ms:.1f}")
+        parts.append(f"total;dur={total_ms:.1f}")
+        return ", ".join(parts)
+
+    @staticmethod
+    def _log_slow(request, response, timings, total_ms: float) -> None:
+        match = getattr(request, "resolver_match", None)
+        record = {
+            "event": "slow_request",
+            "method": request.method,
+            "path": request.path,
+            "view": match.view_name if match else None,
+            "status": response.status_code,
+            "total_ms": round(total_ms, 2),
+            "sampled": timings is not None,
+        }
+        if timings is not None:
+            record.update(timings.as_dict())
+        perflog.warning(json.dumps(record, ensure_ascii=False))
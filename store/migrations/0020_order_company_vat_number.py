@@ -0,0 +1,24 @@
+# Generated by Django 5.1.1 on 2026-10-19 00:16
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0019_order_total_weight_kg_orderitem_unit_weight_g'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='company_vat_number',
+            field=models.CharField(blank=True, max_length=50, null=True, verbose_name='ДДС номер'),
+        ),
+        migrations.AlterField(
+            model_name='orderitem',
+            name='unit_weight_g',
+            field=models.DecimalField(decimal_places=3, default=Decimal('0.0'), help_text='Тегло на единица (килограми) за този артикул в поръчката.', max_digits=8, verbose_name='Unit weight (kg)'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.1.1 on 2026-10-19 00:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0020_order_company_vat_number'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='stock_reservations_expired',
+            field=models.BooleanField(default=False, help_text='Резервацията на наличност е освободена, преди картовото плащане да приключи.'),
+        ),
+        migrations.AddField(
+            model_name='packagingoption',
+            name='stock',
+            field=models.PositiveIntegerField(blank=True, help_text='наличност в бройки; оставете празно за неограничена', null=True),
+        ),
+        migrations.CreateModel(
+            name='StockReservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_reservations', to='store.order')),
+                ('packaging', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='store.packagingoption')),
+            ],
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.1.1 on 2026-10-19 00:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0022_product_image_variants_store_logo_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='copurchase_counted',
+            field=models.BooleanField(default=False, editable=False, help_text='Поръчката е включена в статистиката „купувано заедно“ (store/copurchase.py).'),
+        ),
+        migrations.CreateModel(
+            name='CoPurchase',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.PositiveIntegerField(help_text='брой поръчки с двата продукта')),
+                ('neighbour', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='store.product')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='copurchases', to='store.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product', '-score'], name='copurchase_product_score')],
+                'unique_together': {('product', 'neighbour')},
+            },
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.1.1 on 2026-10-19 00:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0023_copurchase'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('quantity', models.PositiveIntegerField(default=0)),
+                ('orders', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='sales_counted',
+            field=models.BooleanField(default=False, editable=False, help_text='Поръчката е добавена към броячите на продажбите (store/popularity.py).'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='sales_30d',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='sales_365d',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='sales_7d',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['-sales_30d', 'id'], name='product_popularity'),
+        ),
+        migrations.AddField(
+            model_name='salesday',
+            name='packaging',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sales_days', to='store.packagingoption'),
+        ),
+        migrations.AddField(
+            model_name='salesday',
+            name='product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_days', to='store.product'),
+        ),
+        migrations.AddIndex(
+            model_name='salesday',
+            index=models.Index(fields=['packaging', 'day'], name='salesday_packaging_day'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='salesday',
+            unique_together={('product', 'packaging', 'day')},
+        ),
+    ]
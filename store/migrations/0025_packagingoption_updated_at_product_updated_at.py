@@ -0,0 +1,23 @@
+# Generated by Django 5.1.1 on 2026-10-19 00:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0024_popularity_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='packagingoption',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.1 on 2026-10-19 00:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0025_packagingoption_updated_at_product_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CartLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cart_id', models.UUIDField()),
+                ('quantity', models.PositiveIntegerField(default=1)),
+                ('updated_at', models.DateTimeField(auto_now=True, db_index=True)),
+                ('packaging', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='store.packagingoption')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='store.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['cart_id', 'product'], name='cartline_cart_product')],
+                'constraints': [models.UniqueConstraint(fields=('cart_id', 'packaging'), name='cartline_unique_packaging')],
+            },
+        ),
+    ]
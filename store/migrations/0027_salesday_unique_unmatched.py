@@ -0,0 +1,34 @@
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_unmatched_buckets(apps, schema_editor):
+    # buckets without a packaging could repeat per (product, day): fold them into one
+    SalesDay = apps.get_model('store', 'SalesDay')
+    duplicates = (
+        SalesDay.objects.filter(packaging__isnull=True)
+        .values('product_id', 'day')
+        .annotate(n=Count('id'), keep=Min('id'), quantity=Sum('quantity'), orders=Sum('orders'))
+        .filter(n__gt=1)
+        .order_by()
+    )
+    for row in duplicates:
+        SalesDay.objects.filter(pk=row['keep']).update(quantity=row['quantity'], orders=row['orders'])
+        SalesDay.objects.filter(
+            product_id=row['product_id'], day=row['day'], packaging__isnull=True,
+        ).exclude(pk=row['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0026_cartline'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_unmatched_buckets, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='salesday',
+            constraint=models.UniqueConstraint(condition=models.Q(('packaging__isnull', True)), fields=('product', 'day'), name='salesday_unique_unmatched'),
+        ),
+    ]
@@ -3,11 +3,16 @@ import json
 from decimal import Decimal
 
 from django.db import models
-from django.db.models import F, Sum, ExpressionWrapper, DecimalField
-from django.db.models.signals import post_save, post_delete
+from django.db.models import F, Q, Sum, ExpressionWrapper, DecimalField
+from django.db.models.signals import post_save, post_delete, pre_delete
 from django.dispatch import receiver
 from django.core.validators import RegexValidator
 
+from .cachetags import invalidate_on_change
+from .caching import CATALOG_TAG, product_tag
+from .images import refresh_variants
+from .pricing import effective_price, in_eur
+
 
 class Store(models.Model):
     name = models.CharField(max_length=150)
@@ -15,6 +20,7 @@ class Store(models.Model):
     address = models.CharField(max_length=255, blank=True)
     working_hours = models.CharField(max_length=255, blank=True)
     logo = models.ImageField(upload_to="store_logos/", blank=True, null=True)
+    logo_variants = models.JSONField(default=dict, blank=True, editable=False)
 
     map_url = models.URLField("Линк към карта", blank=True)
 
@@ -49,6 +55,7 @@ class Brand(models.Model):
 class Product(models.Model):
     name = models.CharField(max_length=255)
     image = models.ImageField(upload_to='store/products/')
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     price = models.DecimalField(max_digits=10, decimal_places=2)
     sale_price = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
     is_on_sale = models.BooleanField(default=False)
@@ -73,12 +80,32 @@ class Product(models.Model):
     badge = models.CharField(max_length=100, blank=True, null=True,
                              help_text="Label/Badge for the product (e.g., 'ОВЧЕ МЛЯКО', 'БДС', 'КОЗЕ МЛЯКО', 'КРАВЕ МЛЯКО', 'С ПОДПРАВКИ')")
 
+    updated_at = models.DateTimeField(auto_now=True)
+
+    # rolling sales windows (pieces), maintained by store/popularity.py
+    sales_7d = models.PositiveIntegerField(default=0, editable=False)
+    sales_30d = models.PositiveIntegerField(default=0, editable=False)
+    sales_365d = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [models.Index(fields=['-sales_30d', 'id'], name='product_popularity')]
+
     def __str__(self):
         return self.name
 
 
 # store/models.py
 
+class PackagingOptionQuerySet(models.QuerySet):
+    def with_prices(self):
+        """effective_price / price_eur / effective_price_eur, see store/pricing.py."""
+        return self.alias(_effective_price=effective_price()).annotate(
+            effective_price=F('_effective_price'),
+            price_eur=in_eur(F('price')),
+            effective_price_eur=in_eur(F('_effective_price')),
+        )
+
+
 class PackagingOption(models.Model):
     product = models.ForeignKey(
         Product,
@@ -96,6 +123,13 @@ class PackagingOption(models.Model):
         default=False,
         help_text="Отбележете, за да активирате sale_price като текуща цена"
     )
+    stock = models.PositiveIntegerField(
+        blank=True, null=True,
+        help_text="наличност в бройки; оставете празно за неограничена"
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = PackagingOptionQuerySet.as_manager()
 
     class Meta:
         unique_together = ('product', 'weight')
@@ -113,6 +147,18 @@ class PackagingOption(models.Model):
             return self.sale_price
         return self.price
 
+    @property
+    def in_stock(self):
+        return self.stock is None or self.stock > 0
+
+
+def priced_packaging_options():
+    """
+    prefetch_related() of product.packaging_options with the price
+    annotations; the annotated queryset is built once, not per product.
+    """
+    return models.Prefetch('packaging_options', queryset=PackagingOption.objects.with_prices())
+
 
 class Nutrition(models.Model):
     product = models.OneToOneField(Product, on_delete=models.CASCADE, related_name='nutrition')
@@ -228,6 +274,18 @@ class Order(models.Model):
     delivery_tracking_number = models.CharField(max_length=100, blank=True, null=True)
     econt_shipment_num = models.CharField(max_length=100, blank=True, null=True)
     label_url = models.URLField(blank=True, null=True)
+    stock_reservations_expired = models.BooleanField(
+        default=False,
+        help_text="Резервацията на наличност е освободена, преди картовото плащане да приключи."
+    )
+    copurchase_counted = models.BooleanField(
+        default=False, editable=False,
+        help_text="Поръчката е включена в статистиката „купувано заедно“ (store/copurchase.py)."
+    )
+    sales_counted = models.BooleanField(
+        default=False, editable=False,
+        help_text="Поръчката е добавена към броячите на продажбите (store/popularity.py)."
+    )
 
     def update_total(self):
         agg = self.order_items.aggregate(
@@ -336,6 +394,124 @@ class OrderItem(models.Model):
         return f"{self.quantity} x {self.product.name}"
 
 
+class StockReservation(models.Model):
+    """
+    Stock held for a card order while the customer is on the myPOS page.
+    The quantity is already subtracted from PackagingOption.stock; the row
+    only records what to give back if the payment never completes
+    (see store/stock.py and `manage.py release_expired_reservations`).
+    """
+    order = models.ForeignKey(Order, related_name='stock_reservations', on_delete=models.CASCADE)
+    packaging = models.ForeignKey(PackagingOption, related_name='reservations', on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.quantity} x {self.packaging} (поръчка {self.order_id})"
+
+
+class CoPurchase(models.Model):
+    """
+    Top-K "bought together" neighbours per product, rebuilt from OrderItem
+    history by `manage.py build_copurchases` (see store/copurchase.py).
+    """
+    product = models.ForeignKey(Product, related_name='copurchases', on_delete=models.CASCADE)
+    neighbour = models.ForeignKey(Product, related_name='+', on_delete=models.CASCADE)
+    score = models.PositiveIntegerField(help_text="брой поръчки с двата продукта")
+
+    class Meta:
+        unique_together = ('product', 'neighbour')
+        indexes = [models.Index(fields=['product', '-score'], name='copurchase_product_score')]
+
+    def __str__(self):
+        return f"{self.product_id} -> {self.neighbour_id} ({self.score})"
+
+
+class SalesDay(models.Model):
+    """
+    Daily sales bucket per product and packaging; the rolling windows on
+    Product are summed from these (see store/popularity.py).
+    packaging is empty when an order line no longer matches an option; those
+    lines share one bucket per product and day (a plain unique_together lets
+    NULLs repeat, hence the conditional constraint).
+    """
+    day = models.DateField()
+    product = models.ForeignKey(Product, related_name='sales_days', on_delete=models.CASCADE)
+    packaging = models.ForeignKey(
+        PackagingOption, related_name='sales_days',
+        on_delete=models.SET_NULL, null=True, blank=True,
+    )
+    quantity = models.PositiveIntegerField(default=0)
+    orders = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('product', 'packaging', 'day')
+        constraints = [
+            models.UniqueConstraint(
+                fields=['product', 'day'], condition=Q(packaging__isnull=True),
+                name='salesday_unique_unmatched',
+            ),
+        ]
+        indexes = [models.Index(fields=['packaging', 'day'], name='salesday_packaging_day')]
+
+    def __str__(self):
+        return f"{self.day}: {self.quantity} x {self.product_id}/{self.packaging_id}"
+
+
+class CartLine(models.Model):
+    """
+    One line of a visitor's cart. `cart_id` is a random id kept in the
+    session, so the session itself is written once per cart, and clicks
+    change quantities with single-row F() updates (see store/cart_utils.py).
+    product is the packaging's product, stored so removing a product is one
+    indexed DELETE.
+    """
+    cart_id = models.UUIDField()
+    product = models.ForeignKey(Product, related_name='+', on_delete=models.CASCADE)
+    packaging = models.ForeignKey(PackagingOption, related_name='+', on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField(default=1)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['cart_id', 'packaging'], name='cartline_unique_packaging'),
+        ]
+        indexes = [models.Index(fields=['cart_id', 'product'], name='cartline_cart_product')]
+
+    def __str__(self):
+        return f"{self.quantity} x {self.packaging_id} ({self.cart_id})"
+
+
 @receiver([post_save, post_delete], sender=OrderItem)
 def _recalc_order_total_on_item_change(sender, instance, **kwargs):
     instance.order.update_total()
+
+
+@receiver(pre_delete, sender=PackagingOption)
+def _fold_packaging_sales(sender, instance, **kwargs):
+    # SET_NULL would give the product a second unmatched bucket for the day
+    # (salesday_unique_unmatched): add the sales to the existing one instead
+    for bucket in SalesDay.objects.filter(packaging=instance):
+        if SalesDay.objects.filter(product_id=bucket.product_id, day=bucket.day, packaging=None).update(
+            quantity=F('quantity') + bucket.quantity, orders=F('orders') + bucket.orders,
+        ):
+            bucket.delete()
+
+
+@receiver(post_save, sender=Product)
+def _product_image_variants(sender, instance, raw=False, **kwargs):
+    if not raw:
+        refresh_variants(instance, "image", "image_variants")
+
+
+@receiver(post_save, sender=Store)
+def _store_logo_variants(sender, instance, raw=False, **kwargs):
+    if not raw:
+        refresh_variants(instance, "logo", "logo_variants")
+
+
+# cache tags (store/caching.py): the weight modal and product page of the
+# product, and everything that lists the catalog
+invalidate_on_change(Product, lambda p: [CATALOG_TAG, product_tag(p.pk)])
+invalidate_on_change(PackagingOption, lambda o: [CATALOG_TAG, product_tag(o.product_id)])
@@ -0,0 +1,150 @@
+# store/popularity.py
+"""
+Sales counters for "най-продавани" sorting and best-seller badges.
+
+Every counted order adds its quantities to SalesDay – one row per
+(product, packaging, day) – when it becomes paid (cash-on-delivery orders
+when they are placed). The same call bumps the rolling windows kept on
+Product (sales_7d / sales_30d / sales_365d) with F() updates, so the grid
+can ORDER BY an indexed column without touching OrderItem.
+
+Bumping only ever adds, so sales older than a window are dropped by
+`manage.py refresh_popularity` (daily cron), which recomputes the windows
+from the buckets and prunes buckets older than a year.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q, Sum
+from django.utils import timezone
+
+from .caching import bump_catalog_version
+from .models import Order, PackagingOption, Product, SalesDay
+
+WINDOWS = {"sales_7d": 7, "sales_30d": 30, "sales_365d": 365}
+
+
+def bestseller_count():
+    return getattr(settings, "BESTSELLER_COUNT", 3)
+
+
+def _bump(day, lines):
+    """
+    Add {(product_id, packaging_id): quantity} to the buckets of `day`:
+    one UPDATE for the existing rows, one INSERT for the new ones.
+    """
+    existing = {
+        (b.product_id, b.packaging_id): b
+        for b in SalesDay.objects.select_for_update().filter(
+            day=day, product_id__in={product_id for product_id, _ in lines}
+        )
+    }
+    bumped, created = [], []
+    for (product_id, packaging_id), quantity in lines.items():
+        bucket = existing.get((product_id, packaging_id))
+        if bucket is None:
+            created.append(SalesDay(
+                day=day, product_id=product_id, packaging_id=packaging_id,
+                quantity=quantity, orders=1,
+            ))
+        else:
+            bucket.quantity = F("quantity") + quantity
+            bucket.orders = F("orders") + 1
+            bumped.append(bucket)
+    SalesDay.objects.bulk_update(bumped, ["quantity", "orders"])
+    if not created:
+        return
+    try:
+        with transaction.atomic():
+            SalesDay.objects.bulk_create(created)
+    except IntegrityError:
+        # a concurrent order created one of today's buckets first
+        _bump(day, {(b.product_id, b.packaging_id): b.quantity for b in created})
+
+
+def record_sales(order):
+    """
+    Add `order` to the sales counters. Idempotent: the payment callback and
+    the result page may both report the same payment, only the first call
+    (the one that flips Order.sales_counted) counts it.
+    A constant number of queries, whatever the size of the order.
+    """
+    with transaction.atomic():
+        if not Order.objects.filter(pk=order.pk, sales_counted=False).update(sales_counted=True):
+            return False
+
+        items = list(order.order_items.values_list("product_id", "unit_weight_g", "quantity"))
+        if not items:
+            return True
+        # OrderItem keeps the packaging weight (kg), not the packaging itself
+        packagings = {
+            (product_id, round(weight, 3)): pk
+            for pk, product_id, weight in PackagingOption.objects.filter(
+                product_id__in={i[0] for i in items}
+            ).values_list("pk", "product_id", "weight")
+        }
+        per_line, per_product = {}, {}
+        for product_id, weight, quantity in items:
+            key = (product_id, packagings.get((product_id, round(float(weight), 3))))
+            per_line[key] = per_line.get(key, 0) + quantity
+            per_product[product_id] = per_product.get(product_id, 0) + quantity
+
+        _bump(timezone.localdate(), per_line)
+        products, now = [], timezone.now()
+        for product_id, quantity in per_product.items():
+            product = Product(pk=product_id, updated_at=now)
+            for field in WINDOWS:
+                setattr(product, field, F(field) + quantity)
+            products.append(product)
+        # updated_at too: the product page ETags are built from it
+        Product.objects.bulk_update(products, [*WINDOWS, "updated_at"])
+        # rankings changed: related products are keyed on the version
+        transaction.on_commit(bump_catalog_version)
+    return True
+
+
+def refresh_popularity(today=None):
+    """
+    Recompute the rolling windows from SalesDay and drop buckets that fell
+    out of the longest window. Returns the number of products updated.
+    """
+    today = today or timezone.localdate()
+    since = {field: today - timedelta(days=days - 1) for field, days in WINDOWS.items()}
+
+    with transaction.atomic():
+        SalesDay.objects.filter(day__lt=min(since.values())).delete()
+        totals = (
+            SalesDay.objects.values("product_id")
+            .annotate(**{
+                field: Sum("quantity", filter=Q(day__gte=start), default=0)
+                for field, start in since.items()
+            })
+            .order_by()
+        )
+        fresh = {row.pop("product_id"): row for row in totals}
+
+        changed, now = [], timezone.now()
+        stale = Product.objects.filter(
+            Q(pk__in=fresh) | Q(sales_365d__gt=0)
+        ).only("pk", *WINDOWS)
+        for product in stale:
+            counts = fresh.get(product.pk, dict.fromkeys(WINDOWS, 0))
+            if any(getattr(product, f) != counts[f] for f in WINDOWS):
+                for field, value in counts.items():
+                    setattr(product, field, value)
+                product.updated_at = now
+                changed.append(product)
+        Product.objects.bulk_update(changed, [*WINDOWS, "updated_at"], batch_size=500)
+        if changed:
+            transaction.on_commit(bump_catalog_version)
+    return len(changed)
+
+
+def bestseller_ids():
+    """Top BESTSELLER_COUNT products of the last 30 days (index on sales_30d)."""
+    return set(
+        Product.objects.filter(sales_30d__gt=0)
+        .order_by("-sales_30d", "id")
+        .values_list("id", flat=True)[:bestseller_count()]
+    )
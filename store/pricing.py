@@ -0,0 +1,43 @@
+# store/pricing.py
+"""
+Prices in лв. and their euro equivalent at the fixed rate.
+
+Packaging options can come annotated from the database
+(PackagingOption.objects.with_prices(), or priced_packaging_options() as a
+prefetch of product.packaging_options):
+
+    effective_price       sale_price when on sale, else price
+    price_eur             price in €
+    effective_price_eur   effective_price in €
+
+so the templates print ready Decimals, and effective_price can be used in
+filter() / order_by(). `to_eur()` is the same conversion for amounts that
+do not come from a queryset (cart totals, order totals).
+"""
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db.models import Case, DecimalField, F, Value, When
+from django.db.models.functions import Cast, Round
+
+BGN_PER_EUR = Decimal("1.95583")
+CENT = Decimal("0.01")
+
+
+def to_eur(amount) -> Decimal:
+    return (Decimal(amount) / BGN_PER_EUR).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def _money():
+    return DecimalField(max_digits=10, decimal_places=2)
+
+
+def effective_price():
+    return Case(
+        When(is_on_sale=True, sale_price__isnull=False, then=F("sale_price")),
+        default=F("price"),
+        output_field=_money(),
+    )
+
+
+def in_eur(expression):
+    return Cast(Round(expression / Value(BGN_PER_EUR), 2), _money())
@@ -0,0 +1,111 @@
+# store/sessions.py
+"""
+Session storage tuned for cart traffic.
+
+Checkout steps and the first cart click write the session (the cart lines
+themselves are CartLine rows). With the default database backend each write
+is a synchronous UPDATE of django_session. SESSION_ENGINE picks the
+trade-off (see settings.py and `manage.py run_benchmarks --only session`):
+
+- django.contrib.sessions.backends.db            one UPDATE per change (default)
+- store.sessions                                 cached_db with write coalescing:
+  the cache copy is always current, the database copy is refreshed at most
+  every SESSION_DB_WRITE_INTERVAL seconds per session, so a burst of
+  writes costs one UPDATE. Needs a shared cache (Redis / Memcached); if the
+  cache loses an entry, up to that interval of changes falls back to the
+  older database copy.
+- django.contrib.sessions.backends.signed_cookies  no session rows; the
+  cart id and checkout form travel in the cookie (browsers cap cookies at
+  ~4 KB).
+
+Expired rows of the database backends, and cart lines nobody can reach
+any more, are removed in batches by `clear_expired_sessions()` /
+`clear_abandoned_carts()` (`manage.py clear_expired_sessions`, cron).
+"""
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+from django.contrib.sessions.models import Session
+from django.utils import timezone
+
+from .models import CartLine
+
+logger = logging.getLogger(__name__)
+
+
+def db_write_interval():
+    return getattr(settings, "SESSION_DB_WRITE_INTERVAL", 60)
+
+
+def _delete_in_batches(queryset, batch_size, max_seconds):
+    started = time.monotonic()
+    deleted = 0
+    while True:
+        pks = list(queryset.values_list("pk", flat=True)[:batch_size])
+        if not pks:
+            break
+        deleted += queryset.model.objects.filter(pk__in=pks).delete()[0]
+        if len(pks) < batch_size:
+            break
+        if max_seconds is not None and time.monotonic() - started >= max_seconds:
+            break
+    return deleted
+
+
+def clear_expired_sessions(batch_size=1000, max_seconds=None):
+    """
+    Delete expired session rows `batch_size` at a time (each batch is its own
+    short statement, so the table is never locked for long). Stops early after
+    `max_seconds`; the next run continues. Returns the number deleted.
+    """
+    return _delete_in_batches(
+        Session.objects.filter(expire_date__lt=timezone.now()), batch_size, max_seconds,
+    )
+
+
+def clear_abandoned_carts(batch_size=1000, max_seconds=None):
+    """
+    Delete cart lines untouched for longer than a session lives
+    (SESSION_COOKIE_AGE): no cookie can point at them any more.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.SESSION_COOKIE_AGE)
+    return _delete_in_batches(
+        CartLine.objects.filter(updated_at__lt=cutoff), batch_size, max_seconds,
+    )
+
+
+class SessionStore(CachedDBStore):
+    """cached_db that writes the database at most once per SESSION_DB_WRITE_INTERVAL."""
+
+    def _db_marker(self):
+        return self.cache_key + ":db"
+
+    def save(self, must_create=False):
+        interval = db_write_interval()
+        # new sessions always reach the database
+        if must_create or not interval or self.session_key is None:
+            super().save(must_create)
+            if interval:
+                self._cache.set(self._db_marker(), 1, interval)
+            return
+        try:
+            # add() only succeeds for the first write of an interval
+            if not self._cache.add(self._db_marker(), 1, interval):
+                self._cache.set(self.cache_key, self._session, self.get_expiry_age())
+                return
+        except Exception:
+            logger.exception("Session cache write failed, saving to the database")
+        super().save(must_create)
+
+    def delete(self, session_key=None):
+        key = session_key or self.session_key
+        super().delete(session_key)
+        if key:
+            self._cache.delete(self.cache_key_prefix + key + ":db")
+
+    @classmethod
+    def clear_expired(cls):
+        clear_expired_sessions()
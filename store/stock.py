@@ -0,0 +1,150 @@
+# store/stock.py
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .caching import bump_catalog_version, invalidate_weight_modal
+from .models import Order, PackagingOption, StockReservation
+
+stocklog = logging.getLogger("stock")
+
+
+class OutOfStock(Exception):
+    """Raised when a cart line asks for more than the packaging has left."""
+
+    def __init__(self, packaging):
+        self.packaging = packaging
+        super().__init__(f"Недостатъчна наличност за {packaging}")
+
+
+def reservation_ttl():
+    return timedelta(minutes=getattr(settings, "STOCK_RESERVATION_MINUTES", 30))
+
+
+def take_stock(order, items, reserve=False):
+    """
+    Decrement stock for every cart line of `order`.
+
+    Each line is one conditional UPDATE
+        ... SET stock = stock - qty WHERE id = %s AND stock >= qty
+    so concurrent checkouts never read-modify-write and only the touched
+    rows are locked. Lines are processed in packaging-id order so two
+    checkouts with overlapping carts lock rows in the same order.
+
+    Packaging options with stock=NULL are not tracked and are skipped.
+    Must be called inside transaction.atomic(): on OutOfStock the caller's
+    transaction is rolled back together with the earlier decrements.
+
+    With reserve=True (card payments) a StockReservation is recorded per
+    line so the quantity can be given back if the payment never completes.
+    """
+    packagings, wanted = {}, {}
+    for item in items:
+        packaging = item.packaging
+        if packaging.stock is None:
+            continue
+        packagings[packaging.pk] = packaging
+        wanted[packaging.pk] = wanted.get(packaging.pk, 0) + item.quantity
+
+    reservations = []
+    expires_at = timezone.now() + reservation_ttl()
+    for pk in sorted(wanted):
+        qty = wanted[pk]
+        updated = PackagingOption.objects.filter(
+            pk=pk, stock__gte=qty
+        ).update(stock=F("stock") - qty, updated_at=timezone.now())
+        if not updated:
+            raise OutOfStock(packagings[pk])
+        if reserve:
+            reservations.append(StockReservation(
+                order=order, packaging_id=pk, quantity=qty, expires_at=expires_at,
+            ))
+
+    if reservations:
+        StockReservation.objects.bulk_create(reservations)
+
+    # queryset updates skip post_save; refresh the "изчерпан" labels ourselves
+    if packagings:
+        product_ids = {p.product_id for p in packagings.values()}
+        transaction.on_commit(lambda: invalidate_weight_modal(*product_ids))
+        transaction.on_commit(bump_catalog_version)
+
+
+def _give_back(reservations):
+    for r in reservations:
+        PackagingOption.objects.filter(
+            pk=r.packaging_id, stock__isnull=False
+        ).update(stock=F("stock") + r.quantity, updated_at=timezone.now())
+    StockReservation.objects.filter(pk__in=[r.pk for r in reservations]).delete()
+    if reservations:
+        product_ids = set(
+            PackagingOption.objects.filter(pk__in={r.packaging_id for r in reservations})
+            .values_list("product_id", flat=True)
+        )
+        transaction.on_commit(lambda: invalidate_weight_modal(*product_ids))
+        transaction.on_commit(bump_catalog_version)
+
+
+def release_reservations(order):
+    """
+    Payment cancelled: return the reserved quantities to stock. The order is
+    flagged like an expired one, so a later payment of it (retry, back
+    button) is logged by confirm_reservations.
+    """
+    with transaction.atomic():
+        reservations = list(
+            StockReservation.objects.select_for_update(skip_locked=True).filter(order=order)
+        )
+        _give_back(reservations)
+        if reservations:
+            Order.objects.filter(pk=order.pk).update(stock_reservations_expired=True)
+            order.stock_reservations_expired = True
+    return len(reservations)
+
+
+def confirm_reservations(order):
+    """
+    Payment succeeded: the stock is already decremented, just drop the hold.
+    If the hold was released first (the sweeper, or a cancelled payment that
+    was retried) the goods went back on sale – log it so staff can check the
+    stock by hand.
+    """
+    deleted, _ = StockReservation.objects.filter(order=order).delete()
+    if deleted:
+        return
+    # the flag is set with a queryset update, so the instance we were
+    # handed may predate it
+    order.refresh_from_db(fields=["stock_reservations_expired"])
+    if order.stock_reservations_expired:
+        stocklog.warning(
+            "Order %s paid after its stock reservation was released; check stock manually.",
+            order.pk,
+        )
+
+
+def release_expired_reservations(now=None):
+    """
+    Give back stock held by card orders that were never paid.
+    Rows locked by a concurrent payment callback are skipped (SKIP LOCKED)
+    and picked up on the next run.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        reservations = list(
+            StockReservation.objects.select_for_update(skip_locked=True)
+            .filter(expires_at__lte=now)
+            .exclude(order__payment_status="paid")
+        )
+        _give_back(reservations)
+        order_ids = {r.order_id for r in reservations}
+        if order_ids:
+            Order.objects.filter(pk__in=order_ids).update(stock_reservations_expired=True)
+        released = len(reservations)
+    if released:
+        stocklog.info("Released %s expired stock reservations for orders %s",
+                      released, sorted(order_ids))
+    return released
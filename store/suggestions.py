@@ -0,0 +1,96 @@
+# store/suggestions.py
+"""
+"Може да харесаш още" without ORDER BY RANDOM().
+
+Candidate pools are built with one id-only query, shuffled once and kept in
+the cache for POOL_TIMEOUT (so they rotate periodically). A page then picks
+its suggestions with random.sample() over a few hundred ids and loads just
+those rows by primary key – the cost no longer depends on the catalog size.
+
+A pool looks like {"ids": [...rotation set...], "groups": {key: [...]}},
+where groups are the neighbours (same category / same product).
+"""
+import random
+from collections import defaultdict
+
+from .cachetags import tagged_get_or_set
+from .copurchase import bought_with
+from .models import Product
+
+POOL_TIMEOUT = 60 * 60
+POOL_SIZE = 300  # ids kept in the global rotation set
+GROUP_SIZE = 50  # ids kept per neighbour group
+
+PRODUCT_POOL_KEY = "suggest:products"
+
+
+def build_pool(rows):
+    """`rows` are (id, group_key) pairs; returns the shuffled, capped pool."""
+    rows = list(rows)
+    random.shuffle(rows)
+    groups = defaultdict(list)
+    for pk, group in rows:
+        if group is not None and len(groups[group]) < GROUP_SIZE:
+            groups[group].append(pk)
+    return {"ids": [pk for pk, _ in rows[:POOL_SIZE]], "groups": dict(groups)}
+
+
+def get_pool(key, rows_query):
+    # untagged: pools rotate on their timeout, new products join at the next build
+    return tagged_get_or_set(key, lambda: build_pool(rows_query()), timeout=POOL_TIMEOUT)
+
+
+def pick(pool, k, prefer_groups=(), exclude=()):
+    """
+    Up to `k` ids: neighbours from `prefer_groups` first, topped up from the
+    rotation set, never anything in `exclude`.
+    """
+    seen = set(exclude)
+    picked = []
+    preferred = [pk for g in prefer_groups for pk in pool["groups"].get(g, ())]
+    for candidates in (preferred, pool["ids"]):
+        candidates = [pk for pk in dict.fromkeys(candidates) if pk not in seen]
+        take = random.sample(candidates, min(k - len(picked), len(candidates)))
+        picked.extend(take)
+        seen.update(take)
+        if len(picked) >= k:
+            break
+    return picked
+
+
+def in_order(queryset, ids):
+    by_pk = queryset.in_bulk(ids)
+    return [by_pk[pk] for pk in ids if pk in by_pk]
+
+
+def _sellable_products():
+    return (
+        Product.objects.filter(packaging_options__isnull=False)
+        .order_by().values_list("id", "category_id").distinct()
+    )
+
+
+def suggest_products(k=6, exclude=(), categories=(), first=()):
+    """
+    Recommended store products (with packaging options): the ids in `first`
+    (e.g. co-purchase neighbours), then same-category neighbours of
+    `categories`, then random ones.
+    """
+    ids = [pk for pk in first if pk not in exclude][:k]
+    pool = get_pool(PRODUCT_POOL_KEY, _sellable_products)
+    ids += pick(pool, k - len(ids), categories, set(exclude) | set(ids))
+    return in_order(
+        Product.objects.select_related("category").prefetch_related("packaging_options"), ids
+    )
+
+
+def suggest_for_cart(cart_items, k=6):
+    """Products bought together with the cart first (store/copurchase.py)."""
+    in_cart = list(dict.fromkeys(item.product.pk for item in cart_items))
+    products = [item.product for item in cart_items]
+    return suggest_products(
+        k,
+        exclude=set(in_cart),
+        categories=list(dict.fromkeys(p.category_id for p in products if p.category_id)),
+        first=bought_with(in_cart, k),
+    )
@@ -1,11 +1,31 @@
+# store/templatetags/currency.py
+from decimal import Decimal, InvalidOperation
+
 from django import template
 
+from store import pricing
+
 register = template.Library()
 
 
 @register.filter
 def to_eur(value):
+    """
+    Сума в лв. -> "12.34 €" по фиксирания курс (Decimal, без float).
+    За опциите за грамаж ползвайте готовите анотации с `eur`.
+    """
+    try:
+        return eur(pricing.to_eur(value))
+    except (InvalidOperation, ValueError, TypeError):
+        return ""
+
+
+@register.filter
+def eur(value):
+    """Вече изчислена сума в € (напр. option.effective_price_eur) -> "12.34 €"."""
+    if value is None or value == "":
+        return ""
     try:
-        return "{:.2f} €".format(float(value) / 1.95583)
-    except (ValueError, TypeError):
+        return "{:.2f} €".format(Decimal(value))
+    except (InvalidOperation, ValueError, TypeError):
         return ""
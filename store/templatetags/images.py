@@ -0,0 +1,66 @@
+from django import template
+from django.utils.html import format_html, format_html_join
+
+register = template.Library()
+
+MIME = {"avif": "image/avif", "webp": "image/webp"}
+
+
+def _srcset(storage, entries):
+    return ", ".join(f"{storage.url(name)} {width}w" for width, name in entries)
+
+
+@register.filter
+def placeholder_style(variants):
+    """
+    Inline CSS painting the dominant colour + blurred preview behind an
+    image until it loads: <div style="{{ obj.image_variants|placeholder_style }}">
+    """
+    if not variants or not variants.get("color"):
+        return ""
+    style = f"background-color:{variants['color']}"
+    if variants.get("lqip"):
+        style += f";background-image:url({variants['lqip']});background-size:cover;background-position:center"
+    return style
+
+
+@register.simple_tag
+def responsive_image(image, variants=None, sizes="100vw", alt="", css_class="", loading="lazy"):
+    """
+    <img> (or <picture> when AVIF variants exist) with srcset/sizes built
+    from the model's variants manifest (see store/images.py). Falls back to
+    the original upload when the variants are missing or stale.
+
+        {% responsive_image product.image product.image_variants sizes="(max-width: 600px) 50vw, 300px" alt=product.name %}
+    """
+    if not image:
+        return ""
+
+    variants = variants or {}
+    if variants.get("src") != image.name:
+        variants = {}
+
+    storage = image.storage
+    webp = variants.get("webp") or []
+    img = format_html(
+        '<img src="{}"{} alt="{}"{}{}{} loading="{}" decoding="async">',
+        image.url,
+        format_html(' srcset="{}" sizes="{}"', _srcset(storage, webp), sizes) if webp else "",
+        alt,
+        format_html(' class="{}"', css_class) if css_class else "",
+        format_html(' width="{}" height="{}"', variants["width"], variants["height"])
+        if variants.get("width") else "",
+        format_html(' style="{}"', placeholder_style(variants)) if variants.get("color") else "",
+        loading,
+    )
+
+    extra = [fmt for fmt in ("avif",) if variants.get(fmt)]
+    if not extra:
+        return img
+
+    # display:contents keeps existing "wrapper > img" CSS working
+    sources = format_html_join(
+        "", '<source type="{}" srcset="{}" sizes="{}">',
+        ((MIME[fmt], _srcset(storage, variants[fmt]), sizes) for fmt in extra + ["webp"] if variants.get(fmt)),
+    )
+    return format_html('<picture style="display:contents">{}{}</picture>', sources, img)
@@ -1,11 +1,49 @@
-from django.test import TestCase
-from django.conf import settings
-from store.views import _generate_signature, SIGN_ORDER
-from store.utils import check_key_format, convert_key_to_pkcs8
-import os
+import io
+import json
 import logging
+import shutil
+import tempfile
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from store.benchmarks import build_cases, run_case
+from store.cachetags import bump_tags, cache_stats, reset_stats, tag_version, tagged_get, tagged_set
+from store.caching import CATALOG_TAG, product_tag, weight_modal_key
+from store.cart_utils import CART_VERSION, MAX_QUANTITY, Cart, CartItem
+from store.copurchase import bought_with, rebuild_copurchases, update_copurchases
+from store.images import refresh_variants
+from store.models import (
+    Brand, CartLine, Category, Nutrition, Order, OrderItem, PackagingOption, Product, SalesDay,
+    StockReservation, Store, priced_packaging_options,
+)
+from store.popularity import record_sales, refresh_popularity
+from store.pricing import to_eur
+from store.sessions import SessionStore as CoalescedSessionStore, clear_abandoned_carts, clear_expired_sessions
+from store.stock import confirm_reservations, release_expired_reservations, take_stock
+from store.suggestions import build_pool, pick, suggest_products
+from store.templatetags.images import responsive_image
+from store.timing import RequestTimings, activate, deactivate, timed
+from store.utils import check_key_format
+from store.views import SIGN_ORDER, _generate_signature
+from store.warmup import warm_caches, warm_urls
 
 logger = logging.getLogger(__name__)
+# seed_catalog() points at image files that do not exist in the test media root
+logging.getLogger("store.images").setLevel(logging.ERROR)
 
 class MyPOSKeyFormatTestCase(TestCase):
     def setUp(self):
@@ -89,3 +127,1084 @@ class MyPOSSignatureTestCase(TestCase):
         # Verify each parameter is present
         for param in SIGN_ORDER:
             self.assertIn(param, self.params, f"Missing required parameter: {param}")
+
+
+@override_settings(SERVER_TIMING_ENABLED=True, SERVER_TIMING_SAMPLE_RATE=1.0)
+class ServerTimingMiddlewareTestCase(TestCase):
+    def test_server_timing_header(self):
+        """Sampled requests carry db/tpl/total entries in Server-Timing"""
+        response = self.client.get(reverse('about'))
+        header = response.headers.get('Server-Timing', '')
+        self.assertIn('db;dur=', header)
+        self.assertIn('tpl;dur=', header)
+        self.assertIn('total;dur=', header)
+
+    def test_timed_records_span(self):
+        """timed() adds to the active collector and is a no-op without one"""
+        with timed('econt'):
+            pass
+
+        timings = RequestTimings()
+        token = activate(timings)
+        try:
+            with timed('econt'):
+                pass
+        finally:
+            deactivate(token)
+        self.assertEqual(timings.calls['econt'], 1)
+
+    @override_settings(SLOW_REQUEST_THRESHOLD_MS=0)
+    def test_slow_request_logged(self):
+        """Requests above the threshold are logged as JSON to the perf logger"""
+        with self.assertLogs('perf', level='WARNING') as logs:
+            self.client.get(reverse('about'))
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['event'], 'slow_request')
+        self.assertEqual(record['path'], reverse('about'))
+        self.assertIn('sql_count', record)
+
+
+# ---------------------------------------------------------------------------
+# Query-count regression suite
+# ---------------------------------------------------------------------------
+
+def seed_catalog(n_products, start=0):
+    """
+    Create `n_products` store products (3 packaging options + nutrition each),
+    each linked to a sakarela marketing product with 2 recipes.
+    `start` keeps names unique when the catalog is grown in several steps.
+    Returns the list of created store products.
+    """
+    from sakarela.models import Product as SakarelaProduct, Recipe, RecipeIngredient, RecipeStep
+
+    category, _ = Category.objects.get_or_create(name="Сирена")
+    brand, _ = Brand.objects.get_or_create(name="Сакарела")
+    created = []
+    for i in range(start, start + n_products):
+        product = Product.objects.create(
+            name=f"Продукт {i}",
+            image="dummy_data_images/image_3.jpg",
+            price=Decimal("10.00"),
+            description="...",
+            category=category,
+            brand=brand,
+            badge="БДС" if i % 2 else "",
+        )
+        Nutrition.objects.create(
+            product=product, energy="352kcal / 1462kJ", fat=1, saturated_fat=1,
+            carbohydrates=1, sugars=1, protein=1, salt=1,
+        )
+        for weight, price in ((0.25, "5.00"), (0.5, "9.50"), (1.0, "18.00")):
+            PackagingOption.objects.create(
+                product=product, weight=weight, price=Decimal(price),
+                sale_price=Decimal("4.50") if i % 3 == 0 else None, is_on_sale=i % 3 == 0,
+            )
+        main = SakarelaProduct.objects.create(
+            title=f"Сакарела {i}", description="...", image="dummy_data_images/image_3.jpg",
+            badge="dummy_data_images/image_4.png", type="sirene", ingredients="мляко",
+            storage="0-4°C", store_product=product,
+        )
+        for r in range(2):
+            recipe = Recipe.objects.create(
+                product=main, title=f"Рецепта {i}-{r}", image="dummy_data_images/image_3.jpg",
+                short_description="...", cook_time=20, appliance="фурна",
+            )
+            RecipeIngredient.objects.create(recipe=recipe, product="сирене", amount="200 г", order=1)
+            RecipeStep.objects.create(recipe=recipe, step_name="Стъпка 1", step_content="...", order=1)
+        created.append(product)
+    Store.objects.create(name=f"Магазин {start}", city="Ямбол")
+    return created
+
+
+def create_order(packagings, payment_method="card"):
+    order = Order.objects.create(
+        full_name="Иван", last_name="Иванов", email="ivan@example.com", phone="0888123456",
+        country="България", state="Ямбол", city="Ямбол", address1="ул. Първа 1",
+        post_code="8600", payment_method=payment_method, transaction_id=f"T{uuid.uuid4().hex[:16]}",
+        shipping_cost=Decimal("5.00"),
+    )
+    for packaging in packagings:
+        OrderItem.objects.create(
+            order=order, product=packaging.product, quantity=2,
+            price=packaging.current_price, unit_weight_g=Decimal(str(packaging.weight)),
+        )
+    return order
+
+
+ORDER_POST = {
+    "full_name": "Иван", "last_name": "Иванов", "email": "ivan@example.com",
+    "phone": "0888123456", "country": "България", "state": "Ямбол", "city": "Ямбол",
+    "address1": "ул. Първа 1", "post_code": "8600", "payment_method": "card",
+}
+
+
+def fill_cart(client, packagings, qty=1):
+    """Give the test client's session a cart with one line per packaging."""
+    request = RequestFactory().get("/")
+    request.session = client.session
+    Cart(request).replace({p.pk: qty for p in packagings})
+    request.session.save()
+
+
+class QueryCountTestMixin:
+    """
+    Measures the number of queries a request makes at a small and a large
+    size (catalog size or cart size). The count must stay under `max_queries`
+    and must not grow with the size.
+    """
+    small = 2
+    large = 8
+
+    def set_cart(self, packagings, qty=1):
+        fill_cart(self.client, packagings, qty)
+
+    def count_queries(self, method, url, data=None):
+        with CaptureQueriesContext(connection) as ctx:
+            response = getattr(self.client, method)(url, data or {})
+        self.assertLess(response.status_code, 500, f"{url} -> {response.status_code}")
+        return len(ctx.captured_queries)
+
+    def assertQueriesFlat(self, label, small_count, large_count, max_queries):
+        self.assertLessEqual(
+            large_count, max_queries,
+            f"{label}: {large_count} queries (limit {max_queries})",
+        )
+        self.assertEqual(
+            small_count, large_count,
+            f"{label}: query count grows with N ({small_count} -> {large_count})",
+        )
+
+
+@override_settings(SERVER_TIMING_ENABLED=False)
+class StoreCatalogQueryCountTestCase(QueryCountTestMixin, TestCase):
+    """Catalog pages must not issue per-product queries."""
+
+    def measure_catalog(self, url, max_queries, data=None, method="get"):
+        seed_catalog(self.small)
+        small_count = self.count_queries(method, url, data)
+        seed_catalog(self.large - self.small, start=self.small)
+        large_count = self.count_queries(method, url, data)
+        self.assertQueriesFlat(url, small_count, large_count, max_queries)
+
+    def test_store_home(self):
+        self.measure_catalog(reverse("store:store_home"), 7)
+
+    def test_store_home_filters(self):
+        url = reverse("store:store_home")
+        self.measure_catalog(url, 7, {"min_price": "1", "max_price": "50", "badge": "БДС"})
+
+    def test_store_home_htmx_partial(self):
+        self.client.defaults["HTTP_HX_REQUEST"] = "true"
+        self.measure_catalog(reverse("store:store_home"), 4, {"q": "Продукт"})
+
+    def test_store_product_detail(self):
+        products = seed_catalog(self.small)
+        url = reverse("store:product_detail", args=[products[0].pk])
+        small_count = self.count_queries("get", url)
+        seed_catalog(self.large - self.small, start=self.small)
+        large_count = self.count_queries("get", url)
+        self.assertQueriesFlat(url, small_count, large_count, 6)
+
+    def test_where_to_buy(self):
+        self.measure_catalog(reverse("store:where_to_buy"), 4)
+
+    def test_weight_modal_fragment(self):
+        cache.clear()
+        product = seed_catalog(1)[0]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("store:weight_modal", args=[product.pk]))
+        self.assertContains(response, f'id="weight-modal-{product.pk}"')
+        self.assertLessEqual(len(ctx.captured_queries), 2)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse("store:weight_modal", args=[product.pk]))
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+    def test_card_payment_page(self):
+        self.measure_catalog(reverse("store:card_payment"), 2)
+
+    @patch("store.views.econt_get_cities")
+    def test_econt_cities(self, get_cities):
+        get_cities.return_value = [{"name": "Ямбол", "nameEn": "Yambol", "postCode": "8600"}]
+        self.measure_catalog(reverse("store:econt_cities"), 2, {"q": "yam"})
+
+
+@override_settings(SERVER_TIMING_ENABLED=False)
+class StoreCartQueryCountTestCase(QueryCountTestMixin, TestCase):
+    """Cart and checkout pages must not issue per-line queries."""
+
+    def setUp(self):
+        # a few products stay out of the cart so there is something to recommend
+        products = seed_catalog(self.large + 3)
+        self.packagings = [p.packaging_options.all()[0] for p in products]
+
+    def measure_cart(self, method, url, max_queries, data=None):
+        self.set_cart(self.packagings[:self.small])
+        cache.clear()
+        small_count = self.count_queries(method, url, data)
+        self.set_cart(self.packagings[:self.large])
+        cache.clear()
+        large_count = self.count_queries(method, url, data)
+        self.assertQueriesFlat(url, small_count, large_count, max_queries)
+
+    def test_store_home_with_cart(self):
+        self.measure_cart("get", reverse("store:store_home"), 10)
+
+    def test_view_cart(self):
+        self.measure_cart("get", reverse("store:cart"), 7)
+
+    def test_marketing_page_with_cart(self):
+        self.measure_cart("get", reverse("about"), 4)
+
+    def test_add_to_cart(self):
+        packaging = self.packagings[0]
+        url = reverse("store:add_to_cart", args=[packaging.product_id])
+        self.measure_cart("post", url, 6, {"packaging_option": packaging.pk, "quantity": 1})
+
+    def test_update_cart_quantity(self):
+        packaging = self.packagings[0]
+        url = reverse("store:update_cart_quantity", args=[packaging.product_id, "increment"])
+        self.measure_cart("get", url, 6, {"packaging_id": packaging.pk})
+
+    def test_remove_from_cart(self):
+        packaging = self.packagings[-1]
+        url = reverse("store:remove_from_cart", args=[packaging.product_id])
+        self.measure_cart("get", url, 6, {"packaging_id": packaging.pk})
+
+    def test_batch_update(self):
+        data = {f"qty_{p.pk}": 2 for p in self.packagings[:self.small]}
+        self.measure_cart("post", reverse("store:update_cart"), 6, data)
+
+    def test_order_start(self):
+        self.measure_cart("post", reverse("store:order_start"), 6, ORDER_POST)
+
+    @patch("store.views.econt_shipping_preview_for_cart", return_value=Decimal("6.00"))
+    def test_order_info_preview(self, _preview):
+        self.measure_cart("get", reverse("store:order_info"), 5)
+
+    @patch("store.views.econt_shipping_preview_for_cart", return_value=Decimal("6.00"))
+    def test_order_info_recalc(self, _preview):
+        # switch the payment method between the two runs so both write the session
+        url = reverse("store:order_info_recalc")
+        self.set_cart(self.packagings[:self.small])
+        small_count = self.count_queries("post", url, {"payment_method": "card"})
+        self.set_cart(self.packagings[:self.large])
+        large_count = self.count_queries("post", url, {"payment_method": "cash"})
+        self.assertQueriesFlat(url, small_count, large_count, 6)
+        # the same method again leaves the session alone
+        self.assertLess(self.count_queries("post", url, {"payment_method": "cash"}), large_count)
+
+    @patch("store.views.econt_shipping_preview_for_cart", return_value=Decimal("6.00"))
+    def test_order_info_submit(self, _preview):
+        self.measure_cart("post", reverse("store:order_info"), 12, ORDER_POST)
+
+
+@override_settings(SERVER_TIMING_ENABLED=False)
+class StorePaymentQueryCountTestCase(QueryCountTestMixin, TestCase):
+    """Order/payment pages must not issue per-order-item queries."""
+
+    def setUp(self):
+        products = seed_catalog(self.large)
+        self.packagings = [p.packaging_options.all()[0] for p in products]
+        # today's sales buckets already exist, as they would after the first order
+        record_sales(create_order(self.packagings))
+
+    def measure_order(self, method, url_for, max_queries, data_for=lambda order: {}):
+        small_order = create_order(self.packagings[:self.small])
+        small_count = self.count_queries(method, url_for(small_order), data_for(small_order))
+        large_order = create_order(self.packagings[:self.large])
+        large_count = self.count_queries(method, url_for(large_order), data_for(large_order))
+        self.assertQueriesFlat(url_for(large_order), small_count, large_count, max_queries)
+
+    def test_order_summary(self):
+        self.measure_order("get", lambda o: reverse("store:order_summary", args=[o.pk]), 4)
+
+    def test_mypos_payment(self):
+        self.measure_order("get", lambda o: reverse("store:mypos_payment", args=[o.pk]), 10)
+
+    @patch("store.views.send_order_emails_with_tracking")
+    @patch("store.views.ensure_econt_label_json", return_value=("1", "", None))
+    def test_payment_callback(self, _label, _emails):
+        self.measure_order(
+            # 5 (incl. re-reading the reservation expiry) + a constant 7 for
+            # the sales counters (store/popularity.py)
+            "post", lambda o: reverse("store:payment_callback"), 12,
+            lambda o: {"IPCmethod": "IPCPurchaseNotify", "OrderID": o.transaction_id},
+        )
+
+    @patch("store.views.send_order_emails_with_tracking")
+    @patch("store.views.ensure_econt_label_json", return_value=("1", "", None))
+    def test_payment_result(self, _label, _emails):
+        self.measure_order(
+            "get", lambda o: reverse("store:payment_result"), 15,
+            lambda o: {"Status": "success", "OrderID": o.transaction_id},
+        )
+
+    def test_payment_cancel(self):
+        self.measure_order(
+            # 3 + releasing the stock reservations
+            "get", lambda o: reverse("store:payment_cancel"), 4,
+            lambda o: {"OrderID": o.transaction_id},
+        )
+
+
+@override_settings(SERVER_TIMING_ENABLED=False)
+@patch("store.views.ensure_econt_label_json", return_value=("1", "", None))
+@patch("store.views.send_order_emails_with_tracking")
+@patch("store.views.econt_shipping_preview_for_cart", return_value=Decimal("6.00"))
+class StockReservationTestCase(TestCase):
+    def setUp(self):
+        product = seed_catalog(1)[0]
+        self.packaging = product.packaging_options.all()[0]
+        self.packaging.stock = 5
+        self.packaging.save(update_fields=["stock"])
+
+    def checkout(self, qty):
+        fill_cart(self.client, [self.packaging], qty)
+        return self.client.post(reverse("store:order_info"), ORDER_POST)
+
+    def stock(self):
+        self.packaging.refresh_from_db(fields=["stock"])
+        return self.packaging.stock
+
+    def test_take_stock_without_reservation(self, *_mocks):
+        # cash on delivery: stock is taken for good, nothing to release later
+        order = create_order([])
+        take_stock(order, [CartItem(self.packaging, 2)])
+        self.assertEqual(self.stock(), 3)
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_oversell_is_rejected(self, *_mocks):
+        response = self.checkout(6)
+        self.assertRedirects(response, reverse("store:cart"), fetch_redirect_response=False)
+        self.assertEqual(self.stock(), 5)
+        self.assertFalse(Order.objects.exists())
+
+    def test_untracked_stock_is_not_touched(self, *_mocks):
+        self.packaging.stock = None
+        self.packaging.save(update_fields=["stock"])
+        self.checkout(50)
+        self.assertIsNone(self.stock())
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_paid_card_order_keeps_stock(self, *_mocks):
+        self.checkout(2)
+        order = Order.objects.get()
+        order.transaction_id = "T1"
+        order.save(update_fields=["transaction_id"])
+        self.assertEqual(StockReservation.objects.get().quantity, 2)
+        self.client.post(reverse("store:payment_callback"),
+                         {"IPCmethod": "IPCPurchaseNotify", "OrderID": order.transaction_id})
+        self.assertFalse(StockReservation.objects.exists())
+        self.assertEqual(release_expired_reservations(timezone.now() + timedelta(days=1)), 0)
+        self.assertEqual(self.stock(), 3)
+
+    def test_expired_card_reservation_is_released(self, *_mocks):
+        self.checkout(2)
+        self.assertEqual(release_expired_reservations(), 0)
+        self.assertEqual(self.stock(), 3)
+        self.assertEqual(release_expired_reservations(timezone.now() + timedelta(hours=1)), 1)
+        self.assertEqual(self.stock(), 5)
+        self.assertTrue(Order.objects.get().stock_reservations_expired)
+
+    def test_payment_after_cancel_is_logged(self, *_mocks):
+        self.checkout(2)
+        order = Order.objects.get()
+        order.transaction_id = "T1"
+        order.save(update_fields=["transaction_id"])
+        self.client.get(reverse("store:payment_cancel"), {"OrderID": "T1"})
+        self.assertTrue(Order.objects.get().stock_reservations_expired)
+        # the customer goes back and pays the same order
+        with self.assertLogs("stock", "WARNING"):
+            self.client.post(reverse("store:payment_callback"),
+                             {"IPCmethod": "IPCPurchaseNotify", "OrderID": "T1"})
+        self.assertEqual(self.stock(), 5)
+
+    @patch("store.cart_utils.is_shared", return_value=True)
+    def test_order_ignores_a_stale_priced_cart(self, *_mocks):
+        fill_cart(self.client, [self.packaging], 2)
+        self.client.get(reverse("store:cart"))  # priced cart cached
+        # changed by another worker, whose tag bumps this cache never saw
+        CartLine.objects.update(quantity=3)
+        PackagingOption.objects.filter(pk=self.packaging.pk).update(price=Decimal("7.77"), is_on_sale=False)
+        self.client.post(reverse("store:order_info"), ORDER_POST)
+        item = OrderItem.objects.get()
+        self.assertEqual((item.quantity, item.price), (3, Decimal("7.77")))
+        self.assertEqual(self.stock(), 2)
+
+    def test_cancelled_payment_releases_stock(self, *_mocks):
+        self.checkout(2)
+        order = Order.objects.get()
+        order.transaction_id = "T1"
+        order.save(update_fields=["transaction_id"])
+        self.client.get(reverse("store:payment_cancel"), {"OrderID": "T1"})
+        self.assertFalse(StockReservation.objects.exists())
+        self.assertEqual(self.stock(), 5)
+
+    def test_paid_after_expiry_is_logged_for_a_stale_order(self, *_mocks):
+        self.checkout(2)
+        order = Order.objects.get()  # loaded before the sweeper ran
+        release_expired_reservations(timezone.now() + timedelta(hours=1))
+        self.assertFalse(order.stock_reservations_expired)
+        with self.assertLogs("stock", "WARNING") as logs:
+            confirm_reservations(order)
+        self.assertIn(str(order.pk), logs.output[0])
+
+
+class ImageVariantsTestCase(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media_root, IMAGE_VARIANT_WIDTHS=(320, 640, 1280))
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def upload(self, width=800, height=600):
+        buf = io.BytesIO()
+        Image.new("RGB", (width, height), (200, 180, 40)).save(buf, format="JPEG")
+        return SimpleUploadedFile("sirene.jpg", buf.getvalue(), content_type="image/jpeg")
+
+    def test_variants_generated_on_upload(self):
+        product = Product.objects.create(name="Сирене", image=self.upload(), price=Decimal("5.00"), description="...")
+        product.refresh_from_db()
+        manifest = product.image_variants
+        self.assertEqual(manifest["src"], product.image.name)
+        self.assertEqual((manifest["width"], manifest["height"]), (800, 600))
+        self.assertRegex(manifest["color"], r"^#[0-9a-f]{6}$")
+        self.assertTrue(manifest["lqip"].startswith("data:image/webp;base64,"))
+        self.assertLess(len(manifest["lqip"]), 1000)
+        # never upscaled: 1280 is dropped, the original width is kept
+        self.assertEqual([w for w, _ in manifest["webp"]], [320, 640, 800])
+        for width, name in manifest["webp"]:
+            self.assertIn(f".{manifest['hash']}.{width}w.webp", name)
+            with product.image.storage.open(name) as fh:
+                self.assertEqual(Image.open(fh).width, width)
+
+    def test_responsive_image_tag(self):
+        product = Product.objects.create(name="Сирене", image=self.upload(), price=Decimal("5.00"), description="...")
+        html = responsive_image(product.image, product.image_variants, sizes="300px", alt="Сирене")
+        self.assertIn('sizes="300px"', html)
+        self.assertIn("640w", html)
+        self.assertIn('loading="lazy"', html)
+        self.assertIn('width="800" height="600"', html)
+        self.assertIn("background-image:url(data:image/webp;base64,", html)
+        # stale manifest -> plain original
+        html = responsive_image(product.image, {"src": "other.jpg", "webp": [[320, "x.webp"]]})
+        self.assertNotIn("srcset", html)
+
+    def test_backfill_invalidates_cached_pages(self):
+        product = Product.objects.create(name="Сирене", image=self.upload(), price=Decimal("5.00"), description="...")
+        Product.objects.filter(pk=product.pk).update(image_variants={})
+        product.refresh_from_db()
+        versions = tag_version(CATALOG_TAG), tag_version(product_tag(product.pk))
+        # the manifest is written with a queryset update, as in generate_image_variants
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(refresh_variants(product, "image", "image_variants"))
+        self.assertGreater(tag_version(CATALOG_TAG), versions[0])
+        self.assertGreater(tag_version(product_tag(product.pk)), versions[1])
+
+
+@override_settings(SERVER_TIMING_ENABLED=False)
+class WeightModalTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.product = seed_catalog(1)[0]
+
+    def test_grid_does_not_render_modals(self):
+        response = self.client.get(reverse("store:store_home"))
+        self.assertNotContains(response, "weight-options")
+
+    def test_fragment_is_invalidated_on_price_change(self):
+        url = reverse("store:weight_modal", args=[self.product.pk])
+        self.assertContains(self.client.get(url), "9.50 лв")
+        option = self.product.packaging_options.get(weight=0.5)
+        option.price = Decimal("11.20")
+        option.save()
+        response = self.client.get(url)
+        self.assertContains(response, "11.20 лв")
+        self.assertNotContains(response, "9.50 лв")
+
+
+class PricingTestCase(TestCase):
+    def setUp(self):
+        product = seed_catalog(1)[0]
+        self.regular, self.sale, _ = product.packaging_options.all()
+        self.sale.sale_price, self.sale.is_on_sale = Decimal("3.99"), True
+        self.sale.save()
+
+    def test_annotations_match_model_prices(self):
+        for option in PackagingOption.objects.with_prices().filter(pk__in=[self.regular.pk, self.sale.pk]):
+            self.assertEqual(option.effective_price, option.current_price)
+            self.assertEqual(option.price_eur, to_eur(option.price))
+            self.assertEqual(option.effective_price_eur, to_eur(option.current_price))
+        cheapest = PackagingOption.objects.with_prices().filter(effective_price__lt=5).order_by("effective_price").first()
+        self.assertEqual(cheapest, self.sale)
+
+    def test_prefetched_options_are_annotated(self):
+        product = Product.objects.prefetch_related(priced_packaging_options()).get(pk=self.sale.product_id)
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                [o.effective_price_eur for o in product.packaging_options.all()][1], Decimal("2.04"),
+            )
+
+    def test_currency_filters(self):
+        from store.templatetags.currency import eur, to_eur as to_eur_filter
+
+        self.assertEqual(to_eur_filter(Decimal("9.00")), "4.60 €")
+        self.assertEqual(to_eur_filter("abc"), "")
+        self.assertEqual(eur(Decimal("2.04000000")), "2.04 €")
+        self.assertEqual(eur(None), "")
+
+    def test_price_filter_ignores_bad_input(self):
+        response = self.client.get(reverse("store:store_home"), {"min_price": "NaN", "max_price": "4"})
+        self.assertEqual(response.status_code, 200)
+
+
+class CacheTagsTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        reset_stats()
+
+    def test_bump_makes_tagged_entries_stale(self):
+        tagged_set("test:a", "A", ["catalog", "product:1"])
+        tagged_set("test:b", "B", ["product:2"])
+        self.assertEqual(tagged_get("test:a", ["catalog", "product:1"]), "A")
+        bump_tags("product:1")
+        self.assertIsNone(tagged_get("test:a", ["catalog", "product:1"]))
+        self.assertEqual(tagged_get("test:b", ["product:2"]), "B")
+
+    def test_model_changes_bump_their_tags(self):
+        product = seed_catalog(2)[0]
+        tagged_set("test:product", "P", [product_tag(product.pk)])
+        tagged_set("test:other", "O", [product_tag(product.pk + 1)])
+        option = product.packaging_options.all()[0]
+        option.price = Decimal("1.10")
+        with self.captureOnCommitCallbacks(execute=True):
+            option.save()
+        self.assertIsNone(tagged_get("test:product", [product_tag(product.pk)]))
+        self.assertEqual(tagged_get("test:other", [product_tag(product.pk + 1)]), "O")
+
+    def test_counters(self):
+        tagged_get("test:a")
+        tagged_set("test:a", 1, ["catalog"])
+        tagged_get("test:a", ["catalog"])
+        tagged_get("test:a", ["catalog"])
+        bump_tags("catalog")
+        tagged_get("test:a", ["catalog"])
+        row = cache_stats()["entries"]["test:a"]
+        self.assertEqual((row["hit"], row["miss"], row["stale"], row["set"]), (2, 1, 1, 1))
+        self.assertEqual(row["hit_ratio"], 0.5)
+
+        out = io.StringIO()
+        call_command("cache_stats", "--json", "--reset", stdout=out)
+        self.assertIn("test:a", json.loads(out.getvalue())["entries"])
+        self.assertEqual(cache_stats()["entries"], {})
+
+
+class GenerateDatasetTestCase(TestCase):
+    def generate(self, *args):
+        call_command("generate_dataset", "--scale", "0.01", *args, stdout=io.StringIO())
+
+    def snapshot(self):
+        return (list(Category.objects.order_by("pk").values_list("name", flat=True)),
+                list(Order.objects.order_by("pk").values_list("created_at", "total")))
+
+    def test_second_run_adds_rows(self):
+        self.generate()
+        self.generate()
+        self.assertEqual(Category.objects.count(), 2 * 1)
+        self.assertEqual(Product.objects.count(), 2 * 10)
+
+    def test_same_seed_same_rows(self):
+        self.generate()
+        first = self.snapshot()
+        CartLine.objects.create(cart_id=uuid.uuid4(), product=Product.objects.first(),
+                                packaging=PackagingOption.objects.first(), quantity=1)
+        self.generate("--clear")
+        self.assertEqual(self.snapshot(), first)
+        self.assertFalse(CartLine.objects.exists())
+
+
+class BenchmarksTestCase(TestCase):
+    def test_cases_are_built_lazily_and_rolled_back(self):
+        seed_catalog(2)
+        with CaptureQueriesContext(connection) as ctx:
+            cases = build_cases()
+        self.assertEqual(len(ctx.captured_queries), 0)
+        setup = next(setup for name, params, setup in cases if name == "cart_click")
+        extra, stats = run_case(setup, repeat=2, warmup=1)
+        self.assertEqual(stats["queries"], 1)
+        self.assertFalse(CartLine.objects.exists())
+
+
+@override_settings(SERVER_TIMING_ENABLED=False)
+class WarmCachesTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.products = seed_catalog(3)
+
+    @patch("sakarela.caching.is_shared", new=lambda: True)
+    @patch("store.management.commands.warm_caches.is_shared", new=lambda: True)
+    @patch("store.warmup.econt_get_cities", return_value=[{"name": "Бургас"}])
+    def test_warm_caches(self, get_cities):
+        out = io.StringIO()
+        call_command("warm_caches", stdout=out)
+        get_cities.assert_called_once_with("BGR")
+        self.assertIn("templates:", out.getvalue())
+        self.assertNotIn("failed", out.getvalue())
+
+        product = self.products[0]
+        self.assertIsNotNone(tagged_get(weight_modal_key(product.pk), [product_tag(product.pk)]))
+        self.assertEqual(self.client.get(reverse("home"))["X-Page-Cache"], "hit")
+
+    @patch("store.management.commands.warm_caches.warm_caches")
+    def test_command_skips_a_per_process_cache(self, warm):
+        out = io.StringIO()
+        call_command("warm_caches", stdout=out)
+        warm.assert_not_called()
+        self.assertIn("Per-process cache", out.getvalue())
+
+    def test_failing_step_does_not_stop_the_others(self):
+        with patch("store.warmup.econt_get_cities", side_effect=ValueError("down")), \
+                self.assertLogs("store.warmup", "WARNING"):
+            report = warm_caches()
+        self.assertIsNone(report["econt_cities"][0])
+        self.assertEqual(report["pages"][0], len(warm_urls()))
+
+
+class SessionStorageTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_coalesced_writes(self):
+        session = CoalescedSessionStore()
+        session["cart"] = {"1_1": 1}
+        session.save()
+        self.assertTrue(Session.objects.filter(pk=session.session_key).exists())
+
+        with CaptureQueriesContext(connection) as ctx:
+            session = CoalescedSessionStore(session.session_key)
+            session["cart"] = {"1_1": 2}
+            session.save()
+        self.assertEqual(len(ctx.captured_queries), 0)
+        self.assertEqual(CoalescedSessionStore(session.session_key)["cart"], {"1_1": 2})
+        self.assertEqual(Session.objects.get(pk=session.session_key).get_decoded()["cart"], {"1_1": 1})
+
+        with override_settings(SESSION_DB_WRITE_INTERVAL=0):
+            session.save()
+        self.assertEqual(Session.objects.get(pk=session.session_key).get_decoded()["cart"], {"1_1": 2})
+
+    def test_clear_expired_sessions_in_batches(self):
+        past = timezone.now() - timedelta(days=1)
+        Session.objects.bulk_create(
+            [Session(session_key=f"expired{i}", session_data="", expire_date=past) for i in range(5)]
+            + [Session(session_key="live", session_data="", expire_date=timezone.now() + timedelta(days=1))]
+        )
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(clear_expired_sessions(batch_size=2), 5)
+        self.assertEqual(len([q for q in ctx.captured_queries if q["sql"].startswith("DELETE")]), 3)
+        self.assertEqual(list(Session.objects.values_list("pk", flat=True)), ["live"])
+
+
+class CartLineTestCase(TestCase):
+    def setUp(self):
+        products = seed_catalog(2)
+        self.a, self.b = products[0].packaging_options.all()[:2]
+        self.c = products[1].packaging_options.all()[0]
+
+    def lines(self):
+        return dict(CartLine.objects.values_list("packaging_id", "quantity"))
+
+    def add(self, packaging, quantity=1):
+        return self.client.post(
+            reverse("store:add_to_cart", args=[packaging.product_id]),
+            {"packaging_option": packaging.pk, "quantity": quantity},
+        )
+
+    def test_add_update_remove(self):
+        self.add(self.a, 2)
+        self.add(self.a)
+        self.add(self.b)
+        self.add(self.c)
+        self.assertEqual(self.lines(), {self.a.pk: 3, self.b.pk: 1, self.c.pk: 1})
+
+        decrement = reverse("store:update_cart_quantity", args=[self.b.product_id, "decrement"])
+        self.client.get(decrement, {"packaging_id": self.b.pk})
+        self.assertNotIn(self.b.pk, self.lines())
+
+        self.client.get(reverse("store:remove_from_cart", args=[self.a.product_id]))
+        self.assertEqual(self.lines(), {self.c.pk: 1})
+
+    def test_header_badge_counts_cart_lines(self):
+        self.add(self.a, 2)
+        self.add(self.b)
+        self.add(self.c)
+        badge = '<span class="cart-count">3</span>'
+        self.assertContains(self.client.get(reverse("store:mini_cart")), badge, html=True)
+        self.assertContains(self.client.get(reverse("store:product_detail", args=[self.a.product_id])),
+                            badge, html=True)
+
+    def test_packaging_of_another_product_is_rejected(self):
+        self.client.post(
+            reverse("store:add_to_cart", args=[self.a.product_id]),
+            {"packaging_option": self.c.pk, "quantity": 1},
+        )
+        self.assertEqual(self.lines(), {})
+
+    def test_concurrent_clicks_are_not_lost(self):
+        self.add(self.a)
+        # two requests of the same browser that loaded the session before either wrote
+        requests = []
+        for _ in range(2):
+            request = RequestFactory().post("/")
+            request.session = self.client.session
+            requests.append(request)
+        for request in requests:
+            Cart.of(request).add(self.a, 1)
+        self.assertEqual(self.lines(), {self.a.pk: 3})
+
+    def cart(self):
+        request = RequestFactory().get("/")
+        request.session = self.client.session
+        return Cart.of(request)
+
+    def test_v1_session_cart_is_upgraded(self):
+        session = self.client.session
+        session["cart"] = {
+            f"{self.a.product_id}_{self.a.pk}": 2,
+            f"{self.c.product_id}_{self.a.pk}": 1,  # packaging of another product
+            "broken": 1,
+        }
+        session.save()
+        with self.assertLogs("store.cart_utils", "WARNING"):
+            response = self.client.get(reverse("store:cart"))
+        self.assertEqual([i.quantity for i in response.context["cart_items"]], [2])
+        self.assertEqual(self.client.session["cart"]["v"], CART_VERSION)
+        self.assertEqual(self.lines(), {self.a.pk: 2})
+
+    def test_unversioned_cart_id_is_upgraded(self):
+        self.add(self.a)
+        session = self.client.session
+        cart_id = session.pop("cart")["id"]
+        session["cart_id"] = cart_id
+        session.save()
+        self.assertEqual(self.cart().quantities(), {self.a.pk: 1})
+        self.client.get(reverse("store:cart"))
+        self.assertNotIn("cart_id", self.client.session)
+        self.assertEqual(self.client.session["cart"], {"v": CART_VERSION, "id": cart_id})
+
+    def test_typed_items_are_loaded_once(self):
+        self.add(self.a, 2)
+        self.add(self.c)
+        cart = self.cart()
+        with self.assertNumQueries(1):
+            items = cart.items()
+            self.assertEqual([(i.packaging, i.product, i.quantity) for i in items],
+                             [(self.a, self.a.product, 2), (self.c, self.c.product, 1)])
+            self.assertEqual(cart.total(), sum(i.price * i.quantity for i in items))
+            self.assertEqual(cart.quantities(), {self.a.pk: 2, self.c.pk: 1})
+            self.assertFalse(cart.is_empty())
+        cart.change(self.a.pk, -1)
+        self.assertEqual(cart.items()[0].quantity, 1)
+
+    @patch("store.cart_utils.is_shared", return_value=True)
+    def test_priced_cart_is_reused_until_cart_or_catalog_changes(self, _shared):
+        self.add(self.a, 2)
+        self.assertEqual(self.cart().total(), 2 * self.a.current_price)
+        cart = self.cart()  # a later request of the same visitor
+        with self.assertNumQueries(0):
+            self.assertEqual(cart.total(), 2 * self.a.current_price)
+
+        self.add(self.a)
+        self.assertEqual(self.cart().total(), 3 * self.a.current_price)
+
+        self.a.sale_price, self.a.is_on_sale = Decimal("1.00"), True
+        self.a.save()
+        self.assertEqual(self.cart().total(), Decimal("3.00"))
+
+    def test_priced_cart_is_not_kept_in_a_per_process_cache(self):
+        # another worker would never see this worker's cart / catalog bumps
+        self.add(self.a, 2)
+        self.cart().items()
+        cart = self.cart()
+        with self.assertNumQueries(1):
+            self.assertEqual(cart.total(), 2 * self.a.current_price)
+
+    def update(self, data, htmx=True):
+        headers = {"HX-Request": "true"} if htmx else {}
+        return self.client.post(reverse("store:update_cart"), data, headers=headers)
+
+    def test_batch_update_applies_every_line(self):
+        self.add(self.a)
+        self.add(self.b)
+        response = self.update({f"qty_{self.a.pk}": 4, f"qty_{self.b.pk}": 0, f"qty_{self.c.pk}": 2})
+        self.assertEqual(self.lines(), {self.a.pk: 4, self.c.pk: 2})
+        total = 4 * self.a.current_price + 2 * self.c.current_price
+        self.assertEqual(response.context["cart_total"], total)
+        self.assertContains(response, 'id="cart-total" hx-swap-oob="true"')
+
+        # a plain form POST lands back on the cart page
+        response = self.update({f"qty_{self.a.pk}": 1}, htmx=False)
+        self.assertRedirects(response, reverse("store:cart"), fetch_redirect_response=False)
+        self.assertEqual(self.lines(), {self.a.pk: 1, self.c.pk: 2})
+
+    def test_batch_update_over_stock_changes_nothing(self):
+        self.add(self.a)
+        self.c.stock = 1
+        self.c.save()
+        response = self.update({f"qty_{self.a.pk}": 3, f"qty_{self.c.pk}": 2})
+        self.assertEqual(self.lines(), {self.a.pk: 1})
+        self.assertContains(response, "Наличност: 1")
+
+        response = self.update({f"qty_{self.a.pk}": "-1"})
+        self.assertEqual(self.lines(), {self.a.pk: 1})
+        self.assertContains(response, "Невалидно количество", status_code=400)
+
+    def test_batch_update_rejects_non_decimal_digits(self):
+        self.add(self.a)
+        response = self.update({f"qty_{self.a.pk}": "²"})
+        self.assertContains(response, "Невалидно количество", status_code=400)
+        self.assertEqual(self.update({f"qty_{self.a.pk}": "²"}, htmx=False).status_code, 400)
+        self.assertEqual(self.lines(), {self.a.pk: 1})
+
+    def test_batch_update_clamps_huge_quantities(self):
+        self.add(self.a)
+        self.update({f"qty_{self.a.pk}": "9" * 30})
+        self.assertEqual(self.lines(), {self.a.pk: MAX_QUANTITY})
+
+    def test_batch_update_emptying_the_cart_reloads_it(self):
+        self.add(self.a)
+        response = self.update({f"qty_{self.a.pk}": 0})
+        self.assertEqual(response["HX-Redirect"], reverse("store:cart"))
+        self.assertEqual(self.lines(), {})
+
+    def test_abandoned_carts_are_cleared(self):
+        self.add(self.a)
+        CartLine.objects.update(updated_at=timezone.now() - timedelta(seconds=settings.SESSION_COOKIE_AGE + 1))
+        self.add(self.c)
+        self.assertEqual(clear_abandoned_carts(), 1)
+        self.assertEqual(self.lines(), {self.c.pk: 1})
+
+
+class SuggestionsTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_pick_prefers_group_and_honours_exclude(self):
+        pool = build_pool([(1, "a"), (2, "a"), (3, "a"), (4, "b"), (5, "b"), (6, None)])
+        for _ in range(20):
+            picked = pick(pool, 3, prefer_groups=["a"], exclude={1})
+            self.assertEqual(set(picked[:2]), {2, 3})
+            self.assertNotIn(1, picked)
+            self.assertEqual(len(set(picked)), 3)
+
+    def test_pick_with_small_pool(self):
+        pool = build_pool([(1, None), (2, None)])
+        self.assertEqual(sorted(pick(pool, 6, exclude={2})), [1])
+
+    def test_no_order_by_random(self):
+        products = seed_catalog(4)
+        with CaptureQueriesContext(connection) as ctx:
+            suggested = suggest_products(6, exclude={products[0].pk})
+        self.assertEqual({p.pk for p in suggested}, {p.pk for p in products[1:]})
+        self.assertFalse(any("RANDOM" in q["sql"].upper() for q in ctx.captured_queries))
+        # pool is cached: only the pk lookup (+ packaging prefetch) next time
+        with CaptureQueriesContext(connection) as ctx:
+            suggest_products(6)
+        self.assertEqual(len(ctx.captured_queries), 2)
+
+
+class CoPurchaseTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        products = seed_catalog(4)
+        self.a, self.b, self.c, self.d = [p.packaging_options.all()[0] for p in products]
+
+    def paid_order(self, *packagings, status="paid"):
+        order = create_order(packagings)
+        Order.objects.filter(pk=order.pk).update(payment_status=status)
+        return order
+
+    def test_rebuild_ranks_neighbours(self):
+        self.paid_order(self.a, self.b)
+        self.paid_order(self.a, self.b, self.c)
+        self.paid_order(self.a, self.c, self.d, status="failed")
+        create_order([self.a, self.d])  # unpaid card order
+        rebuild_copurchases()
+        self.assertEqual(bought_with([self.a.product_id], 5), [self.b.product_id, self.c.product_id])
+        self.assertEqual(bought_with([self.c.product_id], 5, exclude={self.a.product_id}),
+                         [self.b.product_id])
+
+    @override_settings(COPURCHASE_TOP_K=1)
+    def test_incremental_update(self):
+        self.paid_order(self.a, self.b)
+        self.assertEqual(update_copurchases(), 1)
+        self.assertEqual(update_copurchases(), 0)
+        self.paid_order(self.a, self.c)
+        self.paid_order(self.a, self.c)
+        create_order([self.a, self.d], payment_method="cash")
+        self.assertEqual(update_copurchases(), 3)
+        self.assertEqual(bought_with([self.a.product_id], 5), [self.c.product_id])
+
+    def test_cart_shows_bought_together_first(self):
+        for _ in range(2):
+            self.paid_order(self.a, self.d)
+        rebuild_copurchases()
+        fill_cart(self.client, [self.a])
+        response = self.client.get(reverse("store:cart"))
+        self.assertEqual(response.context["recommended_products"][0].pk, self.d.product_id)
+        response = self.client.get(reverse("store:product_detail", args=[self.a.product_id]))
+        self.assertEqual(response.context["related_products"][0].pk, self.d.product_id)
+
+
+@override_settings(SERVER_TIMING_ENABLED=False, BESTSELLER_COUNT=1)
+class PopularityTestCase(TestCase):
+    def setUp(self):
+        products = seed_catalog(3)
+        self.a, self.b, self.c = [p.packaging_options.all()[1] for p in products]
+
+    def sales(self, packaging):
+        product = Product.objects.get(pk=packaging.product_id)
+        return product.sales_7d, product.sales_30d, product.sales_365d
+
+    def test_record_sales_is_idempotent(self):
+        order = create_order([self.a, self.b, self.a])
+        self.assertTrue(record_sales(order))
+        self.assertFalse(record_sales(order))
+        self.assertEqual(self.sales(self.a), (4, 4, 4))
+        bucket = SalesDay.objects.get(product_id=self.a.product_id)
+        self.assertEqual((bucket.packaging_id, bucket.quantity, bucket.orders), (self.a.pk, 4, 1))
+        record_sales(create_order([self.a]))
+        bucket.refresh_from_db()
+        self.assertEqual((bucket.quantity, bucket.orders), (6, 2))
+
+    def test_refresh_drops_old_sales(self):
+        record_sales(create_order([self.a]))
+        SalesDay.objects.create(day=timezone.localdate() - timedelta(days=20),
+                                product_id=self.a.product_id, packaging=self.a, quantity=5, orders=1)
+        SalesDay.objects.create(day=timezone.localdate() - timedelta(days=400),
+                                product_id=self.a.product_id, packaging=self.a, quantity=9, orders=1)
+        refresh_popularity()
+        self.assertEqual(self.sales(self.a), (2, 7, 7))
+        self.assertEqual(SalesDay.objects.count(), 2)
+        refresh_popularity(timezone.localdate() + timedelta(days=366))
+        self.assertEqual(self.sales(self.a), (0, 0, 0))
+        self.assertFalse(SalesDay.objects.exists())
+
+    def test_unmatched_lines_share_one_bucket(self):
+        record_sales(create_order([self.a]))
+        for _ in range(2):
+            order = create_order([])
+            OrderItem.objects.create(order=order, product=self.a.product, quantity=2,
+                                     price=Decimal("1.00"), unit_weight_g=Decimal("99"))
+            record_sales(order)
+        bucket = SalesDay.objects.get(packaging=None)
+        self.assertEqual((bucket.quantity, bucket.orders), (4, 2))
+
+        # a deleted packaging's sales are added to it, not set to NULL beside it
+        self.a.delete()
+        bucket = SalesDay.objects.get(product_id=self.a.product_id)
+        self.assertEqual((bucket.packaging_id, bucket.quantity, bucket.orders), (None, 6, 3))
+
+    def test_store_home_sorts_by_popularity(self):
+        record_sales(create_order([self.c]))
+        record_sales(create_order([self.c, self.b]))
+        response = self.client.get(reverse("store:store_home"), {"sort": "popular"})
+        ids = [p.pk for p in response.context["products"]]
+        self.assertEqual(ids[:2], [self.c.product_id, self.b.product_id])
+        self.assertContains(response, "badge-bestseller", count=1)
+
+
+@override_settings(SERVER_TIMING_ENABLED=False)
+class ProductDetailTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.products = seed_catalog(11)
+        self.url = reverse("store:product_detail", args=[self.products[0].pk])
+
+    def test_related_are_capped_and_ranked_by_popularity(self):
+        record_sales(create_order([self.products[9].packaging_options.all()[0]]))
+        related = self.client.get(self.url).context["related_products"]
+        self.assertEqual(len(related), 8)
+        self.assertEqual(related[0].pk, self.products[9].pk)
+        self.assertNotIn(self.products[0].pk, [p.pk for p in related])
+
+    def test_related_are_cached_per_catalog_version(self):
+        self.client.get(self.url)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(self.url)
+        # ETag state (per-process cache: from the DB) + product + packaging options
+        self.assertEqual(len(ctx.captured_queries), 3)
+
+        option = self.products[1].packaging_options.all()[0]
+        option.price = Decimal("3.30")
+        option.save()
+        self.assertContains(self.client.get(self.url), "3.30 ЛВ")
+
+
+@override_settings(SERVER_TIMING_ENABLED=False)
+class ConditionalGetTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.products = seed_catalog(3)
+
+    def revalidate(self, url, headers=None):
+        headers = headers or {}
+        first = self.client.get(url, headers=headers)
+        self.assertEqual(first.status_code, 200)
+        self.assertIn("ETag", first)
+        return self.client.get(url, headers={**headers, "If-None-Match": first["ETag"]})
+
+    def test_product_detail_not_modified(self):
+        url = reverse("store:product_detail", args=[self.products[0].pk])
+        self.assertEqual(self.revalidate(url).status_code, 304)
+
+    def test_price_change_is_modified(self):
+        url = reverse("store:product_detail", args=[self.products[0].pk])
+        etag = self.client.get(url)["ETag"]
+        option = self.products[0].packaging_options.all()[0]
+        option.price = Decimal("4.40")
+        option.save()
+        response = self.client.get(url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "4.40 ЛВ")
+
+    def test_cart_change_is_modified(self):
+        product = self.products[0]
+        url = reverse("store:product_detail", args=[product.pk])
+        etag = self.client.get(url)["ETag"]
+        self.client.post(reverse("store:add_to_cart", args=[product.pk]),
+                         {"packaging_option": product.packaging_options.all()[0].pk, "quantity": 2})
+        self.client.get(url)  # the flash message is shown (and consumed) once
+        response = self.client.get(url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("Last-Modified", response)
+
+    def test_etag_does_not_depend_on_worker_cache(self):
+        # another worker's cache never saw this page: the ETag must still match
+        url = reverse("store:product_detail", args=[self.products[0].pk])
+        etag = self.client.get(url)["ETag"]
+        cache.clear()
+        self.assertEqual(self.client.get(url, headers={"If-None-Match": etag}).status_code, 304)
+
+    def test_deleted_product_is_modified(self):
+        url = reverse("store:store_home")
+        headers = {"HX-Request": "true"}
+        etag = self.client.get(url, headers=headers)["ETag"]
+        self.products[2].delete()
+        response = self.client.get(url, headers={**headers, "If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+
+    def test_store_home_partial_only(self):
+        url = reverse("store:store_home")
+        self.assertEqual(self.revalidate(url, {"HX-Request": "true"}).status_code, 304)
+        self.assertNotIn("ETag", self.client.get(url))
+
+    def test_econt_cities_not_modified(self):
+        cities = [{"name": "Бургас", "nameEn": "Burgas", "postCode": "8000"}]
+        with patch("store.views.econt_get_cities", return_value=cities), \
+                patch("store.views.econt_cities_loaded_at", return_value=1700000000.0):
+            url = reverse("store:econt_cities") + "?q=bur"
+            self.assertEqual(self.revalidate(url).status_code, 304)
+            other = self.client.get(reverse("store:econt_cities") + "?q=sof",
+                                    headers={"If-None-Match": self.client.get(url)["ETag"]})
+            self.assertEqual(other.status_code, 200)
@@ -0,0 +1,101 @@
+# store/timing.py
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Collector for the request currently being handled (None when the request
+# is not sampled, so every helper below is a cheap no-op).
+_current_timings = ContextVar("request_timings", default=None)
+
+
+class RequestTimings:
+    """
+    Per-request accumulator for SQL, template and outbound-call timings.
+    All durations are in milliseconds.
+    """
+
+    def __init__(self):
+        self.sql_count = 0
+        self.sql_ms = 0.0
+        self.spans = defaultdict(float)
+        self.calls = defaultdict(int)
+
+    def add(self, name: str, ms: float) -> None:
+        self.spans[name] += ms
+        self.calls[name] += 1
+
+    def sql_wrapper(self, execute, sql, params, many, context):
+        """
+        connection.execute_wrapper() hook: counts every query and its duration.
+        """
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_count += 1
+            self.sql_ms += (time.perf_counter() - start) * 1000
+
+    def as_dict(self) -> dict:
+        return {
+            "sql_count": self.sql_count,
+            "sql_ms": round(self.sql_ms, 2),
+            **{f"{name}_ms": round(ms, 2) for name, ms in self.spans.items()},
+            **{f"{name}_calls": n for name, n in self.calls.items()},
+        }
+
+
+def current_timings():
+    return _current_timings.get()
+
+
+def activate(timings):
+    """Start collecting into `timings`; returns a token for deactivate()."""
+    return _current_timings.set(timings)
+
+
+def deactivate(token) -> None:
+    _current_timings.reset(token)
+
+
+@contextmanager
+def timed(name: str):
+    """
+    Record the wall time of the wrapped block under `name`
+    (e.g. "econt", "mypos", "email", "tpl") for the current request.
+    """
+    timings = _current_timings.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, (time.perf_counter() - start) * 1000)
+
+
+_template_timer_installed = False
+
+
+def install_template_timer() -> None:
+    """
+    Wrap Django template rendering once per process so that full template
+    renders (render(), render_to_string()) are reported as the "tpl" span.
+    Nested {% include %} renders go through the engine internals and are
+    therefore not double counted.
+    """
+    global _template_timer_installed
+    if _template_timer_installed:
+        return
+
+    from django.template.backends.django import Template as DjangoTemplate
+
+    original_render = DjangoTemplate.render
+
+    def render(self, context=None, request=None):
+        with timed("tpl"):
+            return original_render(self, context, request)
+
+    DjangoTemplate.render = render
+    _template_timer_installed = True
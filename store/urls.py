@@ -8,12 +8,15 @@ app_name = 'store'
 urlpatterns = [
     path('', views.store_home, name='store_home'),
     path('product/<int:pk>/', views.product_detail, name='product_detail'),
+    path('product/<int:product_id>/weight-modal/', views.weight_modal, name='weight_modal'),
 
     path('where-to-buy/', views.where_to_buy, name='where_to_buy'),
 
     path('cart/', views.view_cart, name='cart'),
+    path('cart/mini/', views.mini_cart, name='mini_cart'),
     path('cart/add/<int:product_id>/', views.add_to_cart, name='add_to_cart'),
     path('cart/remove/<int:product_id>/', views.remove_from_cart, name='remove_from_cart'),
+    path('cart/update/', views.update_cart, name='update_cart'),
     path('cart/update/<int:product_id>/<str:action>/', views.update_cart_quantity, name='update_cart_quantity'),
 
     path('payment/initiate/<int:order_id>/', views.mypos_payment, name='mypos_payment'),
@@ -11,6 +11,8 @@ from requests.auth import HTTPBasicAuth
 import logging, json as _json
 from datetime import date, timedelta
 
+from .timing import timed
+
 logger = logging.getLogger(__name__)
 
 econtlog = logging.getLogger("econt")
@@ -32,7 +34,8 @@ def econt_shipping_preview_for_cart(*, items, cart_total, city, post_code, payme
     Preview shipping price for the current cart WITHOUT creating a shipment.
 
     Uses the same LabelService.createLabel.json endpoint as real labels,
-    but with mode="calculate".
+    but with mode="calculate". `items` have .quantity and .weight_kg
+    (cart_utils.CartItem, or the order lines of _econt_items_from_order).
     """
     from decimal import Decimal
 
@@ -42,19 +45,8 @@ def econt_shipping_preview_for_cart(*, items, cart_total, city, post_code, payme
 
     # 1) Calculate total shipment weight in kg from the cart
     total_weight = Decimal("0.0")
-    for row in items:
-        qty = Decimal(str(row.get("quantity", 0) or 0))
-
-        w = Decimal("0.0")
-        pack = row.get("packaging")
-        if pack is not None and getattr(pack, "weight", None) is not None:
-            w = Decimal(str(pack.weight))
-        elif "weight_kg" in row:
-            w = Decimal(str(row["weight_kg"]))
-        elif "weight" in row:
-            w = Decimal(str(row["weight"]))
-
-        total_weight += w * qty
+    for item in items:
+        total_weight += item.weight_kg * item.quantity
 
     # Don’t send zero weight
     if total_weight <= 0:
@@ -147,13 +139,14 @@ def econt_shipping_preview_for_cart(*, items, cart_total, city, post_code, payme
     )
 
     try:
-        resp = requests.post(
-            url,
-            json=payload,
-            auth=HTTPBasicAuth(settings.ECONT_USER, settings.ECONT_PASS),
-            headers={"Content-Type": "application/json; charset=utf-8"},
-            timeout=30,
-        )
+        with timed("econt"):
+            resp = requests.post(
+                url,
+                json=payload,
+                auth=HTTPBasicAuth(settings.ECONT_USER, settings.ECONT_PASS),
+                headers={"Content-Type": "application/json; charset=utf-8"},
+                timeout=30,
+            )
 
         econtlog.info(
             "ECONT PREVIEW ◀ %s | status=%s text=%s",
@@ -190,6 +183,11 @@ def econt_shipping_preview_for_cart(*, items, cart_total, city, post_code, payme
         return Decimal("0.00")
 
 
+def econt_cities_loaded_at():
+    """When this process last loaded the Econt city list (None if never)."""
+    return _ECONT_CITIES_CACHE.get("timestamp") if _ECONT_CITIES_CACHE.get("cities") else None
+
+
 def econt_get_cities(country_code: str = "BGR"):
     """
     Load list of cities from Econt NomenclaturesService.getCities.json.
@@ -216,13 +214,14 @@ def econt_get_cities(country_code: str = "BGR"):
 
     econtlog.info("ECONT CITIES ▶ POST %s | payload=%s", url, payload)
 
-    resp = requests.post(
-        url,
-        json=payload,
-        auth=HTTPBasicAuth(settings.ECONT_USER, settings.ECONT_PASS),
-        headers={"Content-Type": "application/json; charset=utf-8"},
-        timeout=30,
-    )
+    with timed("econt"):
+        resp = requests.post(
+            url,
+            json=payload,
+            auth=HTTPBasicAuth(settings.ECONT_USER, settings.ECONT_PASS),
+            headers={"Content-Type": "application/json; charset=utf-8"},
+            timeout=30,
+        )
     econtlog.info("ECONT CITIES ◀ %s | status=%s text=%s", url, resp.status_code, (resp.text or "")[:2000])
 
     resp.raise_for_status()
@@ -343,13 +342,14 @@ def econt_calculate_price(*,
         url, _json.dumps(payload, ensure_ascii=False)
     )
 
-    resp = requests.post(
-        url,
-        json=payload,
-        auth=HTTPBasicAuth(settings.ECONT_USER, settings.ECONT_PASS),
-        headers={"Content-Type": "application/json; charset=utf-8"},
-        timeout=30,
-    )
+    with timed("econt"):
+        resp = requests.post(
+            url,
+            json=payload,
+            auth=HTTPBasicAuth(settings.ECONT_USER, settings.ECONT_PASS),
+            headers={"Content-Type": "application/json; charset=utf-8"},
+            timeout=30,
+        )
 
     econtlog.info(
         "ECONT PRICE ◀ %s | status=%s text=%s",
@@ -637,13 +637,14 @@ def ensure_econt_label_json(order):
         _json.dumps(payload, ensure_ascii=False),
     )
 
-    resp = requests.post(
-        url,
-        json=payload,
-        auth=HTTPBasicAuth(settings.ECONT_USER, settings.ECONT_PASS),
-        headers={"Content-Type": "application/json; charset=utf-8"},
-        timeout=30,
-    )
+    with timed("econt"):
+        resp = requests.post(
+            url,
+            json=payload,
+            auth=HTTPBasicAuth(settings.ECONT_USER, settings.ECONT_PASS),
+            headers={"Content-Type": "application/json; charset=utf-8"},
+            timeout=30,
+        )
 
     econtlog.info(
         "RESP %s | status=%s text=%s",
@@ -761,7 +762,8 @@ def send_order_emails_with_tracking(order):
             [admin_email],
         )
         msg_admin.attach_alternative(html_body_admin, "text/html")
-        msg_admin.send(fail_silently=False)
+        with timed("email"):
+            msg_admin.send(fail_silently=False)
 
     # --------- CUSTOMER EMAIL ----------
     if order.email:
@@ -783,4 +785,5 @@ def send_order_emails_with_tracking(order):
             [order.email],
         )
         msg_cust.attach_alternative(html_body_cust, "text/html")
-        msg_cust.send(fail_silently=False)
+        with timed("email"):
+            msg_cust.send(fail_silently=False)
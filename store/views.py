@@ -3,25 +3,28 @@ import base64
 import uuid
 import logging
 from collections import OrderedDict
-from decimal import Decimal
+from decimal import Decimal, InvalidOperation
+from types import SimpleNamespace
 
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives import serialization
 from cryptography.hazmat.primitives.asymmetric import padding
 from django.conf import settings
 from django.contrib import messages
-from django.db.models import Prefetch
+from django.db.models import Case, Prefetch, Q, When
 from django.http import HttpResponse, JsonResponse, HttpResponseBadRequest
+from django.utils.cache import patch_cache_control
 from django.shortcuts import redirect, get_object_or_404
 from django.shortcuts import render
 from django.template.loader import render_to_string
 from django.urls import reverse, NoReverseMatch
 from django.views.decorators.csrf import csrf_exempt
-from .cart_utils import cart_items_and_total, get_session_cart, set_session_cart, cart_is_empty
+from .cart_utils import MAX_QUANTITY, Cart, InvalidCartUpdate, cart_items_and_total
 from django.db import transaction
 from django.views.decorators.csrf import ensure_csrf_cookie
 from django.template import TemplateDoesNotExist
 from django.views.decorators.http import require_GET, require_http_methods, require_POST
+from django.views.decorators.vary import vary_on_headers
 from django.utils import timezone
 import json
 
@@ -30,14 +33,26 @@ from zeep.transports import Transport
 from requests.auth import HTTPBasicAuth
 import requests
 
-from store.models import Product, Order, OrderItem, Category, Brand, PackagingOption, Store
+from store.models import Product, Order, OrderItem, Category, Brand, PackagingOption, Store, priced_packaging_options
+from .caching import (
+    CATALOG_TAG, RELATED_PRODUCTS_TIMEOUT, WEIGHT_MODAL_TIMEOUT,
+    product_tag, related_products_key, weight_modal_key,
+)
+from .cachetags import tagged_get, tagged_set
+from .conditional import catalog_cart_etag, catalog_etag, catalog_modified, conditional_page
+from .copurchase import bought_with
+from .popularity import bestseller_ids, record_sales
 from .forms import OrderForm
+from .stock import OutOfStock, confirm_reservations, release_reservations, take_stock
+from .suggestions import suggest_for_cart
+from .timing import timed
 from .utils import (
     handle_econt_response,
     ensure_econt_label_json,
     econtlog,
     get_econt_delivery_price_for_order,
     econt_get_cities,
+    econt_cities_loaded_at,
     econt_shipping_preview_for_cart, COD_VALUES, send_order_emails_with_tracking,
 )
 
@@ -54,6 +69,9 @@ SUCCESS_CODES = {"0", "00", "000", "200"}
 FAIL_VALUES = {"failed", "failure", "declined", "denied", "error"}
 FAIL_CODES = {"05", "51", "54", "57", "62", "65"}
 
+RELATED_PRODUCTS = 8  # cards under product_detail
+RELATED_BOUGHT_WITH = 4  # of which co-purchase neighbours shown first
+
 
 def _econt_items_from_order(order):
     """
@@ -68,12 +86,12 @@ def _econt_items_from_order(order):
         except Exception:
             weight_kg = Decimal("0")
 
-        items.append({
-            "product": oi.product,
-            "quantity": oi.quantity,
-            "price": oi.price,
-            "weight_kg": weight_kg,
-        })
+        items.append(SimpleNamespace(
+            product=oi.product,
+            quantity=oi.quantity,
+            price=oi.price,
+            weight_kg=weight_kg,
+        ))
 
     # Use already saved order.total if present, otherwise sum items
     cart_total = order.total or sum(
@@ -84,6 +102,23 @@ def _econt_items_from_order(order):
     return items, cart_total
 
 
+def _decimal_param(value):
+    """Price filter from the query string; None when missing or not a number."""
+    try:
+        value = Decimal(value) if value else None
+    except InvalidOperation:
+        return None
+    return value if value is not None and value.is_finite() else None
+
+
+def _econt_cities_etag(request):
+    loaded_at = econt_cities_loaded_at()
+    if loaded_at is None:
+        return None
+    return loaded_at, (request.GET.get("q") or "").strip().lower()
+
+
+@conditional_page(_econt_cities_etag)
 def econt_city_suggestions(request):
     """
     Return small list of cities for autocomplete.
@@ -166,10 +201,12 @@ def _extract_status_blob(data):
 
 
 @ensure_csrf_cookie
+@vary_on_headers('HX-Request')
+@conditional_page(catalog_etag, catalog_modified, only_if=lambda request: request.headers.get('HX-Request'))
 def store_home(request):
     query = request.GET.get('q', '')
-    min_price = request.GET.get('min_price')
-    max_price = request.GET.get('max_price')
+    min_price = _decimal_param(request.GET.get('min_price'))
+    max_price = _decimal_param(request.GET.get('max_price'))
     selected_weight = float(request.GET.get('weight', '1.00'))
 
     all_categories = Category.objects.order_by('name')
@@ -189,7 +226,12 @@ def store_home(request):
     base_qs = Product.objects.filter(id__in=product_ids)
 
     # Prefetch all packaging options for each product
-    base_qs = base_qs.prefetch_related('packaging_options')
+    base_qs = base_qs.prefetch_related(priced_packaging_options())
+
+    # "Най-продавани": indexed rolling counter (store/popularity.py)
+    sort = request.GET.get('sort', '')
+    if sort == 'popular':
+        base_qs = base_qs.order_by('-sales_30d', 'id')
 
     # Apply search and category/brand filtering
     if query:
@@ -204,13 +246,15 @@ def store_home(request):
     # Filter by price for the smallest packaging option
     filtered_products = []
     for product in base_qs:
-        packaging = product.packaging_options.all().order_by('weight').first()
+        # packaging_options are prefetched and already ordered by weight
+        packaging = next(iter(product.packaging_options.all()), None)
         if not packaging:
             continue
-        price = packaging.current_price
-        if min_price and float(price) < float(min_price):
+        # effective_price: annotated by priced_packaging_options() (store/pricing.py)
+        price = packaging.effective_price
+        if min_price is not None and price < min_price:
             continue
-        if max_price and float(price) > float(max_price):
+        if max_price is not None and price > max_price:
             continue
         product.selected_packaging = packaging
         filtered_products.append(product)
@@ -220,11 +264,10 @@ def store_home(request):
     if base_qs.exists():
         for product in base_qs:
             # Get the smallest packaging option (lowest weight)
-            packaging = product.packaging_options.all().order_by('weight').first()
+            packaging = next(iter(product.packaging_options.all()), None)
             if not packaging:
                 continue
-            price = packaging.current_price
-            prices.append(float(price))
+            prices.append(float(packaging.effective_price))
     if prices:
         max_effective_price = max(prices)
         min_effective_price = min(prices)
@@ -271,13 +314,15 @@ def store_home(request):
         'cart_total': cart_total,
         'all_weights': all_weights,
         'selected_weight': selected_weight,
+        'sort': sort,
+        'bestseller_ids': bestseller_ids(),
     }
     if request.headers.get('HX-Request'):
         # If the search bar is used (q param present), update only the product grid
         if 'q' in request.GET:
             return render(request, 'store/partials/product_grid.html', context)
         # If a filter is changed, update both sidebar and product grid (OOB swap)
-        if any(param in request.GET for param in ['min_price', 'max_price', 'category', 'brand', 'badge']):
+        if any(param in request.GET for param in ['min_price', 'max_price', 'category', 'brand', 'badge', 'sort']):
             sidebar_html = render_to_string('store/partials/sidebar.html', context, request=request)
             product_grid_html = render_to_string('store/partials/product_grid.html', context, request=request)
             return HttpResponse(sidebar_html + product_grid_html)
@@ -286,27 +331,67 @@ def store_home(request):
     return render(request, 'store/store_home.html', context)
 
 
-def product_detail(request, pk):
-    # Fetch the requested product
-    product = get_object_or_404(Product, pk=pk)
+@require_GET
+def weight_modal(request, product_id):
+    """
+    One product's "ИЗБЕРИ ГРАМАЖ" modal, loaded by openWeightModal() on the
+    first click so the product grid does not render a modal per card.
+    Cached per product, tagged with it (store/caching.py).
+    """
+    key, tags = weight_modal_key(product_id), [product_tag(product_id)]
+    html = tagged_get(key, tags)
+    if html is None:
+        product = get_object_or_404(Product.objects.prefetch_related(priced_packaging_options()), pk=product_id)
+        html = render_to_string('store/partials/weight_modal.html', {'product': product})
+        tagged_set(key, html, tags, WEIGHT_MODAL_TIMEOUT)
 
-    # Get packaging options ordered by weight
-    packaging_options = product.packaging_options.all().order_by('weight')
+    response = HttpResponse(html)
+    patch_cache_control(response, public=True, max_age=60)
+    return response
 
-    # Get default packaging option (smallest weight)
-    default_option = packaging_options.first() if packaging_options.exists() else None
 
-    # Determine related products (same category, excluding the current one)
-    related_products = Product.objects.filter(
-        category=product.category
-    ).exclude(
-        pk=product.pk
+def _related_products(product):
+    """
+    Up to RELATED_PRODUCTS cards for product_detail: most often bought
+    together first (store/copurchase.py), then the same category by sales
+    over the last 30 days. Cached with their packaging options, tagged with
+    the catalog (store/caching.py).
+    """
+    key = related_products_key(product.pk)
+    related = tagged_get(key, [CATALOG_TAG])
+    if related is None:
+        bought_together = bought_with([product.pk], RELATED_BOUGHT_WITH)
+        rank = {pk: i for i, pk in enumerate(bought_together)}
+        related = sorted(
+            Product.objects.filter(
+                Q(category_id=product.category_id) | Q(pk__in=bought_together)
+            ).exclude(
+                pk=product.pk
+            ).order_by(
+                Case(When(pk__in=bought_together, then=0), default=1), '-sales_30d', 'id'
+            ).prefetch_related(priced_packaging_options())[:RELATED_PRODUCTS],
+            key=lambda p: rank.get(p.pk, len(rank)),
+        )
+        tagged_set(key, related, [CATALOG_TAG], RELATED_PRODUCTS_TIMEOUT)
+    return related
+
+
+# no Last-Modified: it cannot show a cart change, and would answer a bare
+# If-Modified-Since with a 304 after add_to_cart
+@conditional_page(catalog_cart_etag)
+def product_detail(request, pk):
+    # One fetch for the product, its nutrition and (ordered) packaging options
+    product = get_object_or_404(
+        Product.objects.select_related('nutrition').prefetch_related(priced_packaging_options()), pk=pk
     )
+    packaging_options = list(product.packaging_options.all())
+
+    # Default packaging option: the smallest weight
+    default_option = packaging_options[0] if packaging_options else None
 
-    # Pass both product and related items into the template context
     context = {
         'product': product,
-        'related_products': related_products,
+        'related_products': _related_products(product),
         'packaging_options': packaging_options,
         'default_option': default_option,
     }
@@ -316,53 +401,101 @@ def product_detail(request, pk):
 
 def add_to_cart(request, product_id):
     if request.method == 'POST':
-        product_id = str(product_id)
-        packaging_id = str(request.POST.get('packaging_option'))
+        packaging_id = request.POST.get('packaging_option', '')
+        packaging = PackagingOption.objects.filter(
+            pk=packaging_id, product_id=product_id,
+        ).first() if packaging_id.isdecimal() else None
         quantity = int(request.POST.get('quantity', 1))
-        cart = request.session.get('cart', {})
-        cart_key = f"{product_id}_{packaging_id}"
-        if cart_key in cart:
-            cart[cart_key] += quantity
+        if packaging is None or quantity < 1:
+            messages.error(request, "Невалиден грамаж или количество.")
         else:
-            cart[cart_key] = quantity
-        request.session['cart'] = cart
-
-        messages.success(request, "Продуктът беше добавен в количката!")
+            Cart.of(request).add(packaging, quantity)
+            messages.success(request, "Продуктът беше добавен в количката!")
 
     return redirect(request.META.get('HTTP_REFERER', 'store:store_home'))
 
 
 def remove_from_cart(request, product_id):
-    packaging_id = request.GET.get('packaging_id')
-    cart = request.session.get('cart', {})
-    if packaging_id:
-        cart_key = f"{product_id}_{packaging_id}"
-        if cart_key in cart:
-            del cart[cart_key]
-    else:
-        # Remove all packaging options for this product
-        keys_to_remove = [k for k in cart if k.startswith(f"{product_id}_")]
-        for k in keys_to_remove:
-            del cart[k]
-    request.session['cart'] = cart
+    # without packaging_id: every packaging option of the product
+    packaging_id = request.GET.get('packaging_id', '')
+    Cart.of(request).remove(product_id, int(packaging_id) if packaging_id.isdecimal() else None)
     return redirect(request.META.get('HTTP_REFERER', 'store:store_home'))
 
 
 def update_cart_quantity(request, product_id, action):
-    packaging_id = request.GET.get('packaging_id')
-    cart = request.session.get('cart', {})
-    cart_key = f"{product_id}_{packaging_id}"
-    if cart_key in cart:
-        if action == 'increment':
-            cart[cart_key] += 1
-        elif action == 'decrement' and cart[cart_key] > 1:
-            cart[cart_key] -= 1
-        elif action == 'decrement' and cart[cart_key] <= 1:
-            del cart[cart_key]
-    request.session['cart'] = cart
+    packaging_id = request.GET.get('packaging_id', '')
+    if packaging_id.isdecimal() and action in ('increment', 'decrement'):
+        Cart.of(request).change(int(packaging_id), 1 if action == 'increment' else -1)
     return redirect(request.META.get('HTTP_REFERER', 'store:store_home'))
 
 
+@require_POST
+def update_cart(request):
+    """
+    Batch quantity change from the cart page: every `qty_<packaging_id>`
+    field is applied in one transaction (0 removes the line; quantities
+    above MAX_QUANTITY are clamped to it). If any line is over stock,
+    nothing changes and the errors are shown; if any value is not a number,
+    nothing changes and the response is a 400.
+
+    htmx gets the cart lines form back with the total swapped out-of-band,
+    a plain form POST is redirected to the cart.
+    """
+    quantities, cart_errors = {}, []
+    for key, value in request.POST.items():
+        if not key.startswith('qty_'):
+            continue
+        packaging_id, value = key[4:], value.strip()
+        # isdecimal(): isdigit() also accepts "²", which int() rejects
+        if packaging_id.isdecimal() and value.isdecimal():
+            quantities[int(packaging_id)] = min(int(value), MAX_QUANTITY)
+        else:
+            cart_errors.append(f"Невалидно количество: {value or '-'}")
+
+    cart = Cart.of(request)
+    status = 400 if cart_errors else 200
+    if not cart_errors:
+        try:
+            cart.set_quantities(quantities)
+        except InvalidCartUpdate as exc:
+            names = {item.packaging.pk: f"{item.product.name} ({item.packaging.weight} кг)" for item in cart.items()}
+            cart_errors = [f"{names.get(pk, pk)}: {message}" for pk, message in exc.errors.items()]
+
+    if not request.headers.get('HX-Request'):
+        if status == 400:
+            return HttpResponseBadRequest("; ".join(cart_errors))
+        for error in cart_errors:
+            messages.error(request, error)
+        return redirect('store:cart')
+    if cart.is_empty():
+        response = HttpResponse()
+        response['HX-Redirect'] = reverse('store:cart')
+        return response
+    return render(request, 'store/partials/cart_lines.html', {
+        'cart_items': cart.items(),
+        'cart_total': cart.total(),
+        'cart_errors': cart_errors,
+        'max_quantity': MAX_QUANTITY,
+        'oob': True,
+    }, status=status)
+
+
+@require_GET
+def mini_cart(request):
+    """
+    Header cart of the marketing pages (templates/partials/mini_cart.html),
+    fetched by htmx after load so those pages carry nothing per visitor and
+    can be served from the page cache (sakarela/caching.py).
+    """
+    cart_items, cart_total = cart_items_and_total(request)
+    response = render(request, 'partials/mini_cart.html', {
+        'cart_items': cart_items,
+        'cart_total': cart_total,
+    })
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
 # Old view
 # def view_cart(request):
 #     cart = request.session.get('cart', {})
@@ -394,10 +527,8 @@ def update_cart_quantity(request, product_id, action):
 def view_cart(request):
     cart_items, cart_total = cart_items_and_total(request)
 
-    # Recommended products (unchanged logic)
-    recommended_products = Product.objects.filter(
-        packaging_options__isnull=False
-    ).prefetch_related('packaging_options').distinct().order_by('?')[:6]
+    # Recommended products: same categories as the cart first (store/suggestions.py)
+    recommended_products = suggest_for_cart(cart_items)
 
     order_form = OrderForm()
 
@@ -406,6 +537,7 @@ def view_cart(request):
         'cart_total': cart_total,
         'recommended_products': recommended_products,
         'form': order_form,
+        'max_quantity': MAX_QUANTITY,
     })
 
 
@@ -465,9 +597,7 @@ def order_start(request):
     if not form.is_valid():
         # If something is wrong (missing name, city, etc.), show errors back on the cart page.
         cart_items, cart_total = cart_items_and_total(request)
-        recommended_products = Product.objects.filter(
-            packaging_options__isnull=False
-        ).prefetch_related('packaging_options').distinct().order_by('?')[:6]
+        recommended_products = suggest_for_cart(cart_items)
 
         return render(request, "store/cart.html", {
             "cart_items": cart_items,
@@ -492,7 +622,9 @@ def order_info_recalc(request):
     Recalculates Econt shipping + grand total when the user switches
     payment method, *before* the Order is created.
     """
-    if cart_is_empty(request):
+    # Cart items + subtotal, from the DB: this is the amount to be charged
+    items, cart_total = cart_items_and_total(request, fresh=True)
+    if not items:
         return JsonResponse({"error": "empty_cart"}, status=400)
 
     payment_method = (request.POST.get("payment_method") or "").strip()
@@ -504,9 +636,6 @@ def order_info_recalc(request):
     city = initial_data.get("city") or ""
     post_code = initial_data.get("post_code") or ""
 
-    # Cart items + subtotal:
-    items, cart_total = cart_items_and_total(request)
-
     try:
         shipping_cost = econt_shipping_preview_for_cart(
             items=items,
@@ -526,9 +655,11 @@ def order_info_recalc(request):
 
     grand_total = (cart_total + shipping_cost).quantize(Decimal("0.01"))
 
-    # Optionally keep payment_method in session so a refresh keeps it:
-    initial_data["payment_method"] = payment_method
-    request.session["order_form_data"] = initial_data
+    # Optionally keep payment_method in session so a refresh keeps it
+    # (only when it changed: every assignment is a session write)
+    if initial_data.get("payment_method") != payment_method:
+        initial_data["payment_method"] = payment_method
+        request.session["order_form_data"] = initial_data
 
     return JsonResponse({
         "shipping": float(shipping_cost),
@@ -549,9 +680,11 @@ def order_info(request):
 
     # ---------- FINAL SUBMIT (create order) ----------
     if request.method == 'POST':
-        if cart_is_empty(request):
+        # lines and prices re-read from the DB (not the priced-cart cache):
+        # they become the OrderItem snapshot and the stock taken below
+        if not Cart.of(request).items(fresh=True):
             messages.error(request, "Количката е празна. Моля, добавете продукти.")
-            return redirect('store:view_cart')
+            return redirect('store:cart')
 
         form = OrderForm(request.POST)
         if not form.is_valid():
@@ -578,73 +711,76 @@ def order_info(request):
             )
 
         # 1) DB work in a transaction
-        with transaction.atomic():
-            order = form.save()
-
-            # 1a) Snapshot cart into OrderItem rows
-            items, _total = cart_items_and_total(request)
-            for row in items:
-                unit_weight_kg = Decimal("0.0")
-
-                if "weight_kg" in row:
-                    unit_weight_kg = Decimal(str(row["weight_kg"]))
-                elif "weight" in row:
-                    unit_weight_kg = Decimal(str(row["weight"]))
-                elif "packaging" in row and isinstance(row["packaging"], PackagingOption):
-                    unit_weight_kg = Decimal(str(row["packaging"].weight))
-                elif "packaging_id" in row:
-                    try:
-                        pack = PackagingOption.objects.get(pk=row["packaging_id"])
-                        unit_weight_kg = Decimal(str(pack.weight))
-                    except PackagingOption.DoesNotExist:
-                        unit_weight_kg = Decimal("0.0")
-
-                OrderItem.objects.create(
-                    order=order,
-                    product=row["product"],
-                    quantity=row["quantity"],
-                    price=row["price"],
-                    # NOTE: field name is unit_weight_g, but we store kg there:
-                    unit_weight_g=unit_weight_kg,
-                )
+        items, _total = cart_items_and_total(request)
+        pm = (str(form.cleaned_data.get("payment_method")) or "").strip().lower()
+        try:
+            with transaction.atomic():
+                order = form.save()
+
+                # 1a) Take stock with conditional UPDATEs; card orders keep a
+                #     reservation until myPOS confirms (or the sweeper releases it)
+                take_stock(order, items, reserve=pm not in COD_VALUES)
+
+                # 1b) Snapshot cart into OrderItem rows (one INSERT; bulk_create
+                #     skips the per-item post_save total recalculation)
+                order_items = []
+                for item in items:
+                    order_items.append(OrderItem(
+                        order=order,
+                        product=item.product,
+                        quantity=item.quantity,
+                        price=item.price,
+                        # NOTE: field name is unit_weight_g, but we store kg there:
+                        unit_weight_g=item.weight_kg,
+                    ))
+                OrderItem.objects.bulk_create(order_items)
+
+                # 1c) recalc total AFTER items are created
+                order.update_total()
+        except OutOfStock as exc:
+            messages.error(
+                request,
+                f"Няма достатъчна наличност за {exc.packaging.product.name} "
+                f"({exc.packaging.weight} кг). Моля, намалете количеството."
+            )
+            return redirect('store:cart')
 
-            # 1b) recalc total AFTER items are created
-            order.update_total()
+        # 2) Econt – REAL shipping calculation using the same logic
+        #    as the preview (LabelService.calculate). Done after commit so
+        #    the stock rows are not locked for the duration of the HTTP call.
+        try:
+            items, cart_total = _econt_items_from_order(order)
 
-            # 2) Econt – REAL shipping calculation using the same logic
-            #    as the preview (LabelService.calculate).
-            try:
-                items, cart_total = _econt_items_from_order(order)
-
-                shipping_cost = econt_shipping_preview_for_cart(
-                    items=items,
-                    cart_total=cart_total,
-                    city=order.city or "",
-                    post_code=order.post_code or "",
-                    payment_method=order.payment_method or "",
-                )
-                if shipping_cost is None:
-                    shipping_cost = Decimal("0.00")
+            shipping_cost = econt_shipping_preview_for_cart(
+                items=items,
+                cart_total=cart_total,
+                city=order.city or "",
+                post_code=order.post_code or "",
+                payment_method=order.payment_method or "",
+            )
+            if shipping_cost is None:
+                shipping_cost = Decimal("0.00")
 
-                shipping_cost = Decimal(str(shipping_cost)).quantize(Decimal("0.01"))
-                order.shipping_cost = shipping_cost
+            shipping_cost = Decimal(str(shipping_cost)).quantize(Decimal("0.01"))
+            order.shipping_cost = shipping_cost
+            order.save(update_fields=["shipping_cost"])
+        except Exception as exc:
+            econtlog.error(
+                "Failed to calculate Econt delivery price for order %s: %s",
+                order.pk, exc
+            )
+            # fallback: keep shipping 0 but do NOT break checkout
+            if order.shipping_cost is None:
+                order.shipping_cost = Decimal("0.00")
                 order.save(update_fields=["shipping_cost"])
-            except Exception as exc:
-                econtlog.error(
-                    "Failed to calculate Econt delivery price for order %s: %s",
-                    order.pk, exc
-                )
-                # fallback: keep shipping 0 but do NOT break checkout
-                if order.shipping_cost is None:
-                    order.shipping_cost = Decimal("0.00")
-                    order.save(update_fields=["shipping_cost"])
 
         # 3) Decide payment type
         pm = (str(order.payment_method) or "").strip().lower()
         is_cod = pm in COD_VALUES
 
-        # 4) COD → create label now
+        # 4) COD → count the sale and create label now
         if is_cod:
+            record_sales(order)
             try:
                 sn, url, _raw = ensure_econt_label_json(order)
                 if sn:
@@ -663,24 +799,23 @@ def order_info(request):
                 )
 
             # clear cart and show summary
-            set_session_cart(request, {})
+            Cart.of(request).clear()
             return redirect('store:order_summary', pk=order.pk)
 
         # 5) Card (myPOS) – unchanged
         return redirect('store:mypos_payment', order_id=order.pk)
 
     # ---------- PREVIEW STEP (JUST SHOW PRICE, NO ORDER) ----------
-    if cart_is_empty(request):
+    # 1) Cart totals (from the DB, as the order will be)
+    items, cart_total = cart_items_and_total(request, fresh=True)
+    if not items:
         messages.info(request, "Количката е празна.")
         return redirect('store:store_home')
 
-    # 1) Prefill form from session (data posted from cart step)
+    # 2) Prefill form from session (data posted from cart step)
     initial_data = request.session.get("order_form_data") or {}
     form = OrderForm(initial=initial_data)
 
-    # 2) Cart totals
-    items, cart_total = cart_items_and_total(request)
-
     # 3) Shipping preview via the NEW helper
     shipping_cost = econt_shipping_preview_for_cart(
         items=items,
@@ -953,9 +1088,10 @@ def mypos_payment(request, order_id):
             params[f'Amount_{idx}'] = f"{shipping_float:.2f}"
 
         # 6) Sign
-        with open(settings.MYPOS_PRIVATE_KEY_PATH, "rb") as fh:
-            pk_bytes = fh.read()
-        params["Signature"] = sign_params_in_post_order(params, pk_bytes)
+        with timed("mypos"):
+            with open(settings.MYPOS_PRIVATE_KEY_PATH, "rb") as fh:
+                pk_bytes = fh.read()
+            params["Signature"] = sign_params_in_post_order(params, pk_bytes)
 
         # 7) Debug log (unchanged)
         paylog = logging.getLogger("payments")
@@ -1072,6 +1208,8 @@ def payment_callback(request):
                 "myPOS CALLBACK: order %s marked PAID via %s (Amount=%s %s)",
                 order.pk, ipc_method, data.get("Amount"), data.get("Currency")
             )
+            confirm_reservations(order)
+            record_sales(order)
 
             # 2) Create Econt label (for non-COD)
             try:
@@ -1135,6 +1273,8 @@ def _mark_order_paid_and_create_label(order, logger_source="result"):
         "myPOS %s: order %s marked as PAID (prev=%s)",
         logger_source, order.pk, prev
     )
+    confirm_reservations(order)
+    record_sales(order)
 
     # ---- Econt label only for CARD payments ----
     try:
@@ -1190,7 +1330,7 @@ def _mark_order_paid_and_create_label(order, logger_source="result"):
 #     paid_by_server = bool(order and getattr(order, "payment_status", "") == "paid")
 #
 #     if success_by_gateway and paid_by_server:
-#         set_session_cart(request, {})
+#         clear_cart(request)
 #         msg = "Плащането е успешно!"
 #         success_flag = True
 #     elif success_by_gateway and not paid_by_server:
@@ -1231,7 +1371,7 @@ def _mark_order_paid_and_create_label(order, logger_source="result"):
 #
 #     # Clear cart only when we are 100% sure it's paid
 #     if success_flag:
-#         set_session_cart(request, {})
+#         clear_cart(request)
 #
 #     context = {
 #         "status": raw_status or "",  # keep as-is for template display
@@ -1278,7 +1418,7 @@ def _mark_order_paid_and_create_label(order, logger_source="result"):
 #
 #     # Only clear cart when confirmed paid in DB
 #     if success_flag:
-#         set_session_cart(request, {})
+#         clear_cart(request)
 #
 #     context = {
 #         "status": raw_status or "",
@@ -1326,6 +1466,10 @@ def payment_cancel(request):
         order.status = "CANCELLED"
         order.save(update_fields=["status"])
 
+    # the reserved stock goes back on sale now, not when the sweeper runs
+    if order.payment_status != "paid":
+        release_reservations(order)
+
     ctx = {
         "cancelled": True,
         "order_id": order.transaction_id,
@@ -1395,6 +1539,7 @@ def payment_result(request):
         order.payment_status = "cancelled"
         order.save(update_fields=["payment_status"])
         paid_by_server = False
+        release_reservations(order)
 
     # --- If gateway says SUCCESS and our DB is still not paid, mark it paid now ---
     if order and not paid_by_server and is_success and not is_cancel and not is_fail:
@@ -1410,6 +1555,8 @@ def payment_result(request):
 
         order.save(update_fields=fields)
         paid_by_server = True
+        confirm_reservations(order)
+        record_sales(order)
 
         # After successful CARD payment create Econt label once
         try:
@@ -1470,7 +1617,7 @@ def payment_result(request):
 
     # Clear cart only when DB says paid
     if success:
-        set_session_cart(request, {})
+        Cart.of(request).clear()
 
     ctx = {
         "status": raw_status or (resp_code or ""),
@@ -1556,7 +1703,7 @@ def payment_result(request):
 
 def where_to_buy(request):
     stores = Store.objects.filter(show_on_map=True).only(
-        "id", "name", "city", "address", "logo", "map_x_pct", "map_y_pct",
+        "id", "name", "city", "address", "working_hours", "map_url", "logo", "logo_variants", "map_x_pct", "map_y_pct",
     )
     brands = Store.objects.filter(show_on_map=True).order_by().values_list("name", flat=True).distinct()
     return render(request, "store/where_to_buy.html", {"stores": stores, "brands": brands})
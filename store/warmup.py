@@ -0,0 +1,109 @@
+# store/warmup.py
+"""
+Post-deploy cache warming (`manage.py warm_caches`, deploy/gunicorn.conf.py).
+
+After a restart the first shoppers would otherwise pay for everything at
+once: the Econt city list, compiling every template, the catalog queries,
+the cached fragments (weight modals, related products, marketing pages).
+`warm_caches()` does that work up front:
+
+- loads the Econt nomenclature (in-process cache in store/utils.py),
+- compiles every template (kept by the cached template loader),
+- requests the top grid variants, the best-selling product pages with
+  their weight modals, and the marketing pages through the full
+  middleware stack, which fills the shared caches.
+
+Run in the gunicorn master with --preload, everything in-process (locmem
+cache, compiled templates, city list) is inherited by the forked workers.
+Run as a command, only the shared cache (Redis / Memcached / database) and
+the database's own buffers benefit, so the command does nothing when the
+cache is per-process (store.cachetags.is_shared).
+"""
+import logging
+import os
+import time
+
+from django.conf import settings
+from django.template import TemplateDoesNotExist, TemplateSyntaxError, engines
+from django.template.utils import get_app_template_dirs
+from django.test import Client
+from django.urls import reverse
+
+from .models import Category, Product
+from .utils import econt_get_cities
+
+logger = logging.getLogger(__name__)
+
+WARM_PRODUCTS = 20  # best sellers whose pages are requested
+
+
+def compile_templates():
+    """Load every .html template once; returns how many compiled."""
+    compiled = 0
+    for backend in engines.all():
+        dirs = list(backend.dirs)
+        if backend.app_dirs:
+            dirs += get_app_template_dirs(backend.app_dirname)
+        for root in dirs:
+            for path, _, files in os.walk(root):
+                for name in files:
+                    if not name.endswith(".html"):
+                        continue
+                    template = os.path.relpath(os.path.join(path, name), root).replace(os.sep, "/")
+                    try:
+                        backend.get_template(template)
+                        compiled += 1
+                    except (TemplateDoesNotExist, TemplateSyntaxError) as exc:
+                        logger.warning("Template %s not compiled: %s", template, exc)
+    return compiled
+
+
+def _host():
+    hosts = [h for h in settings.ALLOWED_HOSTS if h != "*" and not h.startswith(".")]
+    return hosts[0] if hosts else "localhost"
+
+
+def warm_urls():
+    """Catalog grid variants, best-seller pages and their weight modals, marketing pages."""
+    from sakarela.prerender import page_urls
+
+    store = reverse("store:store_home")
+    urls = [store, f"{store}?sort=popular"]
+    urls += [f"{store}?category={pk}" for pk in Category.objects.values_list("pk", flat=True)]
+    for pk in Product.objects.order_by("-sales_30d", "id").values_list("pk", flat=True)[:WARM_PRODUCTS]:
+        urls += [reverse("store:product_detail", args=[pk]), reverse("store:weight_modal", args=[pk])]
+    return urls + page_urls()
+
+
+def warm_caches(log=None):
+    """Run every warming step; returns {step: (count, ms)}."""
+    log = log or (lambda message: None)
+    report = {}
+
+    def step(name, func):
+        start = time.perf_counter()
+        try:
+            count = func()
+        except Exception as exc:
+            # warming is best effort: a failing step only means a colder start
+            logger.warning("Cache warming step %s failed: %s", name, exc)
+            count = None
+        report[name] = (count, round((time.perf_counter() - start) * 1000))
+        log(f"{name}: {count if count is not None else 'failed'} in {report[name][1]} ms")
+
+    step("econt_cities", lambda: len(econt_get_cities("BGR")))
+    step("templates", compile_templates)
+    step("pages", _request_pages)
+    return report
+
+
+def _request_pages():
+    client = Client(HTTP_HOST=_host(), raise_request_exception=False)
+    warmed = 0
+    for url in warm_urls():
+        response = client.get(url, secure=True)
+        if response.status_code == 200:
+            warmed += 1
+        else:
+            logger.warning("Cache warming: %s -> %s", url, response.status_code)
+    return warmed